@@ -0,0 +1,88 @@
+"""Measure ``exchange_rates`` write throughput.
+
+Compares :func:`src.lib.fx.upsert_rates` against the previous per-row
+select-then-write loop on a fresh SQLite database (or ``DATABASE_URL``).
+
+Run from ``portfolio-api``::
+
+    python -m benchmarks.fx_upsert --rows 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+from src.lib.fx import upsert_rates
+from src.models.portfolio import ExchangeRate
+from src.models.user import db
+
+QUOTES = ("SEK", "EUR", "GBP", "NOK", "DKK", "JPY", "CHF", "CAD", "AUD", "PLN")
+
+
+def create_app(uri: str) -> Flask:
+    app = Flask("bench-fx-upsert")
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def make_rows(count: int, rate: float):
+    days = count // len(QUOTES) + 1
+    rows = (
+        {"base": "USD", "quote": quote, "date": date(2000, 1, 1) + timedelta(days=i), "rate": rate}
+        for i in range(days)
+        for quote in QUOTES
+    )
+    return [row for _, row in zip(range(count), rows)]
+
+
+def per_row(rows) -> None:
+    for row in rows:
+        rec = ExchangeRate.query.filter_by(
+            base=row["base"], quote=row["quote"], date=row["date"]
+        ).first()
+        if rec:
+            rec.rate = row["rate"]
+        else:
+            db.session.add(ExchangeRate(**row))
+    db.session.commit()
+
+
+def bulk(rows) -> None:
+    upsert_rates(rows)
+    db.session.commit()
+
+
+def timed(label: str, func, rows) -> None:
+    start = time.perf_counter()
+    func(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {len(rows):>8} rows {elapsed:8.3f}s {len(rows) / elapsed:>12,.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    for label, func in (("per-row", per_row), ("upsert_rates", bulk)):
+        with tempfile.TemporaryDirectory() as tmp:
+            uri = os.environ.get("DATABASE_URL") or f"sqlite:///{tmp}/bench.db"
+            app = create_app(uri)
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                timed(f"{label} insert", func, make_rows(args.rows, 1.0))
+                timed(f"{label} update", func, make_rows(args.rows, 2.0))
+                db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Measure ``/history`` computation time.
+
+Compares :func:`src.services.history.value_history` against the previous
+day-by-day loop on a synthetic portfolio (10k transactions over 50 stocks by
+default) valued over a ``MAX``-sized range, daily and sampled per week,
+per month and down to 500 points. Neither side touches the
+database; both get the same in-memory transactions. Each timing is the best
+of ``--repeat`` runs.
+
+Run from ``portfolio-api``::
+
+    python -m benchmarks.history --transactions 10000 --stocks 50 --days 20000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+from src.models.portfolio import Stock, Transaction
+from src.services.history import lttb, sample_days, to_points, value_history
+from src.services.holdings import fee_to_ccy, trade_value_base
+from src.services.price_history import CloseSeries
+
+
+def create_app() -> Flask:
+    app = Flask("bench-history")
+    app.config["PORTFOLIO_BASE_CCY"] = "USD"
+    return app
+
+
+def make_portfolio(count: int, stock_count: int, days: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days - 1)
+    stocks = {
+        i: Stock(id=i, symbol=f"S{i}", current_price=rng.uniform(5, 500))
+        for i in range(1, stock_count + 1)
+    }
+    transactions = sorted(
+        (
+            Transaction(
+                stock_id=rng.randint(1, stock_count),
+                transaction_type="buy" if rng.random() < 0.7 else "sell",
+                quantity=rng.randint(1, 100),
+                price_per_share=rng.uniform(5, 500),
+                currency="USD",
+                fee_amount=1.0,
+                transaction_date=start + timedelta(days=rng.randrange(days)),
+            )
+            for _ in range(count)
+        ),
+        key=lambda t: t.transaction_date,
+    )
+    closes = {
+        stock.symbol: CloseSeries(
+            [start + timedelta(days=d) for d in range(0, days, 7)],
+            [rng.uniform(5, 500) for _ in range(0, days, 7)],
+        )
+        for stock in stocks.values()
+    }
+    return start, stocks, transactions, closes
+
+
+def day_loop(transactions, stocks, start, end, base_currency):
+    """The previous ``/history`` implementation, valued at current prices."""
+    history = []
+    holdings = {sid: 0 for sid in stocks}
+    contributions = 0.0
+
+    idx = 0
+    current = start
+    while current <= end:
+        while idx < len(transactions) and transactions[idx].transaction_date <= current:
+            t = transactions[idx]
+            fee_base = fee_to_ccy(t, base_currency, base_currency)
+            trade_base = trade_value_base(t)
+            if t.transaction_type == 'buy':
+                holdings[t.stock_id] = holdings.get(t.stock_id, 0) + t.quantity
+                contributions += trade_base + fee_base
+            else:
+                holdings[t.stock_id] = holdings.get(t.stock_id, 0) - t.quantity
+                contributions -= trade_base - fee_base
+            idx += 1
+
+        market_value = 0.0
+        for sid, qty in holdings.items():
+            if qty:
+                price = stocks[sid].current_price or 0
+                market_value += qty * price
+
+        history.append({
+            'date': current.isoformat(),
+            'market_value_only': round(market_value - contributions, 2),
+            'with_contributions': round(market_value, 2)
+        })
+
+        current += timedelta(days=1)
+    return history
+
+
+def timed(label: str, func, days: int, repeat: int = 1):
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    print(f"{label:<28} {days:>8} days {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--stocks", type=int, default=50)
+    parser.add_argument("--days", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start, stocks, transactions, closes = make_portfolio(args.transactions, args.stocks, args.days)
+    end = date.today()
+    with create_app().app_context():
+        loop, loop_s = timed(
+            "day loop (current price)",
+            lambda: day_loop(transactions, stocks, start, end, "USD"),
+            args.days,
+            args.repeat,
+        )
+        vector, vector_s = timed(
+            "value_history (current price)",
+            lambda: to_points(value_history(transactions, stocks, start, end, "USD", {})),
+            args.days,
+            args.repeat,
+        )
+        timed(
+            "value_history (daily closes)",
+            lambda: to_points(value_history(transactions, stocks, start, end, "USD", closes)),
+            args.days,
+            args.repeat,
+        )
+        for granularity in ("week", "month"):
+            days = sample_days(start, end, granularity)
+            timed(
+                f"value_history ({granularity})",
+                lambda: to_points(value_history(transactions, stocks, start, end, "USD", closes, days)),
+                len(days),
+                args.repeat,
+            )
+        timed(
+            "value_history + lttb(500)",
+            lambda: to_points(lttb(value_history(transactions, stocks, start, end, "USD", closes), 500)),
+            500,
+            args.repeat,
+        )
+
+    worst = max(
+        abs(a[key] - b[key])
+        for a, b in zip(loop, vector)
+        for key in ("market_value_only", "with_contributions")
+    )
+    print(f"speedup {loop_s / vector_s:.1f}x, largest difference {worst:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""add positions table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'positions',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('stock_id', sa.Integer, sa.ForeignKey('stock.id'), nullable=False),
+        sa.Column('quantity', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('total_bought', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('total_sold', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('buy_cost', sa.Float, nullable=False, server_default='0'),
+        sa.Column('cost_basis', sa.Float, nullable=False, server_default='0'),
+        sa.Column('cost_orig', sa.Float, nullable=False, server_default='0'),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.Column('fees', sa.Float, nullable=False, server_default='0'),
+        sa.Column('contributions', sa.Float, nullable=False, server_default='0'),
+        sa.Column('stale', sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.Column('updated_at', sa.DateTime, nullable=True),
+        sa.UniqueConstraint('stock_id', name='uix_positions_stock'),
+    )
+
+
+def downgrade():
+    op.drop_table('positions')
@@ -0,0 +1,48 @@
+"""add lot ledger tables"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'lots',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('stock_id', sa.Integer, sa.ForeignKey('stock.id'), nullable=False),
+        sa.Column('transaction_id', sa.Integer, sa.ForeignKey('transaction.id'), nullable=False),
+        sa.Column('acquired_on', sa.Date, nullable=False),
+        sa.Column('quantity', sa.Integer, nullable=False),
+        sa.Column('remaining', sa.Float, nullable=False),
+        sa.Column('unit_cost', sa.Float, nullable=False),
+        sa.Column('unit_cost_orig', sa.Float, nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.UniqueConstraint('transaction_id', name='uix_lots_transaction'),
+    )
+    op.create_index('ix_lots_stock_id', 'lots', ['stock_id'])
+    op.create_table(
+        'lot_matches',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('stock_id', sa.Integer, sa.ForeignKey('stock.id'), nullable=False),
+        sa.Column('sell_transaction_id', sa.Integer, sa.ForeignKey('transaction.id'), nullable=False),
+        sa.Column('lot_id', sa.Integer, sa.ForeignKey('lots.id'), nullable=False),
+        sa.Column('quantity', sa.Float, nullable=False),
+        sa.Column('cost', sa.Float, nullable=False),
+        sa.Column('proceeds', sa.Float, nullable=False),
+    )
+    op.create_index('ix_lot_matches_stock_id', 'lot_matches', ['stock_id'])
+    op.add_column('positions', sa.Column('realized_gain', sa.Float, nullable=False, server_default='0'))
+    op.add_column('transaction', sa.Column('lot_selection', sa.JSON, nullable=True))
+
+
+def downgrade():
+    op.drop_column('transaction', 'lot_selection')
+    op.drop_column('positions', 'realized_gain')
+    op.drop_index('ix_lot_matches_stock_id', table_name='lot_matches')
+    op.drop_table('lot_matches')
+    op.drop_index('ix_lots_stock_id', table_name='lots')
+    op.drop_table('lots')
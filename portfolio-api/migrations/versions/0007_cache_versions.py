@@ -0,0 +1,22 @@
+"""add cache_versions table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table = op.create_table(
+        'cache_versions',
+        sa.Column('name', sa.String(length=32), primary_key=True),
+        sa.Column('version', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.bulk_insert(table, [{'name': 'fx', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('cache_versions')
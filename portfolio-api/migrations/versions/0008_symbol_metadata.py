@@ -0,0 +1,27 @@
+"""add symbol_metadata table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'symbol_metadata',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('name', sa.String(length=128), nullable=True),
+        sa.Column('exchange', sa.String(length=32), nullable=True),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.Column('source', sa.String(length=32), nullable=True),
+        sa.Column('checked_at', sa.DateTime, nullable=False),
+        sa.UniqueConstraint('symbol', name='uq_symbol_metadata_symbol'),
+    )
+
+
+def downgrade():
+    op.drop_table('symbol_metadata')
@@ -0,0 +1,25 @@
+"""index price_cache by symbol and time, add daily bar columns"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_price_cache_symbol_fetched_at', 'price_cache', ['symbol', 'fetched_at'])
+    op.add_column('price_cache', sa.Column('open', sa.Float, nullable=True))
+    op.add_column('price_cache', sa.Column('high', sa.Float, nullable=True))
+    op.add_column('price_cache', sa.Column('low', sa.Float, nullable=True))
+    op.add_column('price_cache', sa.Column('samples', sa.Integer, nullable=True))
+
+
+def downgrade():
+    op.drop_column('price_cache', 'samples')
+    op.drop_column('price_cache', 'low')
+    op.drop_column('price_cache', 'high')
+    op.drop_column('price_cache', 'open')
+    op.drop_index('ix_price_cache_symbol_fetched_at', table_name='price_cache')
@@ -0,0 +1,25 @@
+"""add price_history table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'price_history',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('close', sa.Float, nullable=False),
+        sa.Column('source', sa.String(length=32), nullable=True),
+        sa.UniqueConstraint('symbol', 'date', name='uix_price_history'),
+    )
+
+
+def downgrade():
+    op.drop_table('price_history')
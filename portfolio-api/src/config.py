@@ -20,3 +20,7 @@ if _supported:
     SUPPORTED_CCY = [c.strip().upper() for c in _supported.split(",") if c.strip()]
 else:
     SUPPORTED_CCY = ["USD", "EUR", "GBP", "SEK", "PLN", "JPY"]
+
+# Cost-basis method used by the lot ledger: fifo, lifo, average or specific.
+# Changing it requires rebuilding positions (``python -m src.tasks.rebuild_positions``).
+COST_BASIS_METHOD = os.environ.get("COST_BASIS_METHOD", "fifo").lower()
@@ -1,5 +1,6 @@
 import os
-import requests
+
+from src.lib import http_client
 
 class ApiClient:
     """Simple wrapper for making API requests."""
@@ -7,12 +8,15 @@ class ApiClient:
         self.base_url = base_url or os.environ.get("DATA_API_BASE_URL", "")
         self.api_key = api_key or os.environ.get("DATA_API_KEY")
 
-    def call_api(self, path, query=None):
-        """Call the remote API and return JSON response."""
+    def call_api(self, path, query=None, retries=None):
+        """Call the remote API and return JSON response.
+
+        ``retries`` overrides ``HTTP_RETRIES``; pass 0 on interactive paths.
+        """
         url = self.base_url.rstrip("/") + "/" + path.lstrip("/")
         headers = {}
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
-        resp = requests.get(url, params=query, headers=headers, timeout=10)
+        resp = http_client.get(url, params=query, headers=headers, retries=retries)
         resp.raise_for_status()
         return resp.json()
@@ -0,0 +1,139 @@
+"""Shared Alpha Vantage request budget.
+
+The API key allows ``AV_REQUESTS_PER_MINUTE`` and ``AV_REQUESTS_PER_DAY``
+calls. Both limits are token buckets stored in a small SQLite file
+(``AV_QUOTA_DB``) and updated under ``BEGIN IMMEDIATE``, so every worker
+process draws from the same budget.
+
+Callers ask :func:`acquire` before each request and skip Alpha Vantage when
+it returns ``False`` (quotes fall back to Stooq, company names to Yahoo).
+Background work (scheduled refreshes, backfills) runs inside
+:func:`background` and leaves ``AV_BACKGROUND_RESERVE`` of each bucket to
+interactive requests.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from src import settings
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+priority: ContextVar[str] = ContextVar("av_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background():
+    """Mark Alpha Vantage calls made inside the block as background work."""
+    token = priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+class SharedQuota:
+    """Per-minute and per-day token buckets persisted in SQLite."""
+
+    def __init__(self, path: str, per_minute: float, per_day: float, reserve: float = 0.0) -> None:
+        self.path = str(path)
+        self.limits = {"minute": (float(per_minute), 60.0), "day": (float(per_day), 86400.0)}
+        self.reserve = reserve
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        if not self._ready:
+            with self._init_lock:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS av_quota ("
+                    "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+                )
+                self._ready = True
+        return conn
+
+    def _levels(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        rows = dict(
+            (name, (tokens, updated))
+            for name, tokens, updated in conn.execute("SELECT name, tokens, updated FROM av_quota")
+        )
+        levels = {}
+        for name, (capacity, period) in self.limits.items():
+            tokens, updated = rows.get(name, (capacity, now))
+            levels[name] = min(capacity, tokens + (now - updated) * capacity / period)
+        return levels
+
+    def _save(self, conn: sqlite3.Connection, levels: Dict[str, float], now: float) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO av_quota (name, tokens, updated) VALUES (?, ?, ?)",
+            [(name, tokens, now) for name, tokens in levels.items()],
+        )
+
+    def acquire(self, level: Optional[str] = None) -> bool:
+        """Take one request from both buckets; ``False`` when over budget."""
+        level = level or priority.get()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._levels(conn, now)
+            for name, tokens in levels.items():
+                needed = 1.0
+                if level == BACKGROUND:
+                    needed += self.limits[name][0] * self.reserve
+                if tokens < needed:
+                    conn.execute("ROLLBACK")
+                    return False
+            self._save(conn, {name: tokens - 1.0 for name, tokens in levels.items()}, now)
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def exhaust(self, name: str = "minute") -> None:
+        """Empty a bucket after the provider reported the limit as reached."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._levels(conn, now)
+            levels[name] = 0.0
+            self._save(conn, levels, now)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def remaining(self) -> Dict[str, float]:
+        conn = self._connect()
+        try:
+            return {name: round(tokens, 2) for name, tokens in self._levels(conn, time.time()).items()}
+        finally:
+            conn.close()
+
+
+quota = SharedQuota(
+    settings.AV_QUOTA_DB,
+    settings.AV_REQUESTS_PER_MINUTE,
+    settings.AV_REQUESTS_PER_DAY,
+    settings.AV_BACKGROUND_RESERVE,
+)
+
+
+def acquire() -> bool:
+    return quota.acquire()
+
+
+def exhaust(data: dict) -> None:
+    """Drain the bucket matching a throttling message in ``data``."""
+    if "Note" in data:
+        quota.exhaust("minute")
+    elif "Information" in data:
+        quota.exhaust("day")
@@ -1,15 +1,21 @@
-from datetime import date as date_cls
-from typing import Union
+from datetime import date as date_cls, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import os
 
-import requests
 from flask import current_app
+from sqlalchemy import or_, select
 from werkzeug.exceptions import BadGateway
 
+from src import settings
 from src.config import PORTFOLIO_BASE_CCY
 
 from src.models.portfolio import ExchangeRate
 from src.models.user import db
+from src.lib import av_quota, fx_cache, http_client
+
+
+# Calendar days covered by an FX_DAILY ``compact`` response (100 trading days).
+COMPACT_DAYS = 140
 
 
 class UnsupportedCurrency(Exception):
@@ -30,10 +36,41 @@ def _norm(code: str) -> str:
 validate_currency_code = _norm
 
 
+def is_business_day(dt: date_cls) -> bool:
+    return dt.weekday() < 5
+
+
+def previous_business_day(dt: date_cls) -> date_cls:
+    dt -= timedelta(days=1)
+    while not is_business_day(dt):
+        dt -= timedelta(days=1)
+    return dt
+
+
+def as_of_rate(from_ccy: str, to_ccy: str, dt: date_cls, force: bool = False) -> Optional[float]:
+    """Return the latest stored rate on or before ``dt``.
+
+    Without ``force`` this only answers for non-trading days: weekends, and
+    weekdays the provider skipped inside a range downloaded as one series
+    (holidays). Other weekdays without a row may simply not have been
+    fetched yet. Rates older than ``FX_MAX_STALENESS_DAYS`` are ignored.
+    """
+    index = fx_cache.series(from_ccy, to_ccy)
+    if not (force or not is_business_day(dt) or index.covers(dt)):
+        return None
+    found = index.on_or_before(dt)
+    if found is None or (dt - found[0]).days > settings.FX_MAX_STALENESS_DAYS:
+        return None
+    return found[1]
+
+
 def get_fx_rate(from_ccy: str, to_ccy: str, dt: Union[str, date_cls]) -> float:
     """Return FX rate from ``from_ccy`` to ``to_ccy`` for ``dt``.
 
-    Checks local cache first and falls back to AlphaVantage FX_DAILY.
+    Checks local cache first and falls back to AlphaVantage FX_DAILY, storing
+    the whole downloaded series so nearby dates need no further calls.
+    Weekends and holidays resolve to the latest earlier rate (see
+    :func:`as_of_rate`).
     """
     if isinstance(dt, str):
         dt = date_cls.fromisoformat(dt)
@@ -44,40 +81,173 @@ def get_fx_rate(from_ccy: str, to_ccy: str, dt: Union[str, date_cls]) -> float:
     if from_ccy == to_ccy:
         return 1.0
 
-    rate = ExchangeRate.query.filter_by(base=from_ccy, quote=to_ccy, date=dt).first()
-    if rate:
-        return rate.rate
+    cached = fx_cache.lookup(from_ccy, to_ccy, dt)
+    if cached is not None:
+        return cached
+    cached = as_of_rate(from_ccy, to_ccy, dt)
+    if cached is not None:
+        return cached
+
+    series = download_fx_daily(from_ccy, to_ccy, full=(date_cls.today() - dt).days > COMPACT_DAYS)
+    if dt in series:
+        return series[dt]
+    rate = as_of_rate(from_ccy, to_ccy, dt, force=True)
+    if rate is None:
+        raise FxDownloadError("no rate for date")
+    return rate
+
+
+def download_fx_daily(from_ccy: str, to_ccy: str, full: bool = False) -> Dict[date_cls, float]:
+    """Download the AlphaVantage FX_DAILY series and store every point.
+
+    ``full`` requests the complete history instead of the latest ~100
+    trading days. Returns the downloaded ``{date: close}`` series.
+    """
+    from_ccy = _norm(from_ccy)
+    to_ccy = _norm(to_ccy)
 
     api_key = os.environ.get("ALPHAVANTAGE_API_KEY")
     if not api_key:
         raise FxDownloadError("missing API key")
+    if not av_quota.acquire():
+        raise FxDownloadError("quota exceeded")
 
     params = {
         "function": "FX_DAILY",
         "from_symbol": from_ccy,
         "to_symbol": to_ccy,
-        "outputsize": "compact",
+        "outputsize": "full" if full else "compact",
         "apikey": api_key,
     }
     try:
-        resp = requests.get("https://www.alphavantage.co/query", params=params, timeout=10)
+        # One attempt per acquired unit of the Alpha Vantage budget.
+        resp = http_client.get(
+            "https://www.alphavantage.co/query", params=params, timeout=30, retries=0
+        )
         data = resp.json()
-        if "Note" in data:
+        if "Note" in data or "Information" in data:
+            av_quota.exhaust(data)
             raise FxDownloadError("quota exceeded")
         if "Error Message" in data:
             raise FxDownloadError("invalid pair")
-        series = data["Time Series FX (Daily)"]
-        fx = float(series[dt.isoformat()]["4. close"])
+        series = {
+            date_cls.fromisoformat(day): float(point["4. close"])
+            for day, point in data["Time Series FX (Daily)"].items()
+        }
     except FxDownloadError:
         raise
     except Exception as exc:
         current_app.logger.exception("FX fetch failed: %s", exc)
         raise FxDownloadError("unreachable") from exc
 
-    db.session.add(ExchangeRate(base=from_ccy, quote=to_ccy, date=dt, rate=fx))
+    store_series(from_ccy, to_ccy, series)
+    return series
+
+
+def store_series(base: str, quote: str, series: Dict[date_cls, float]) -> int:
+    """Upsert a contiguous ``{date: rate}`` series for ``base``/``quote`` and commit.
+
+    Returns the number of rows inserted or changed.
+    """
+    written = upsert_rates(
+        {"base": base, "quote": quote, "date": dt, "rate": rate} for dt, rate in series.items()
+    )
     db.session.commit()
+    fx_cache.cover(base, quote, series)
+    return written
+
+
+def upsert_rates(rows: Iterable[dict]) -> int:
+    """Insert or update ``exchange_rates`` rows in bulk.
+
+    ``rows`` are dicts with ``base``, ``quote``, ``date``, ``rate`` and an
+    optional ``source``. SQLite and PostgreSQL write the set with
+    one ``INSERT ... ON CONFLICT DO UPDATE`` that skips unchanged rows, after
+    a select of the ids already stored; other databases fall back to one
+    select per pair plus a bulk insert. The shared cache version is bumped when an
+    existing rate changed. Returns the number of rows inserted or changed;
+    the caller commits.
+    """
+    by_key = {}
+    for row in rows:
+        row = {"source": None, **row}
+        by_key[(row["base"], row["quote"], row["date"])] = row
+    if not by_key:
+        return 0
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return _upsert_rates_fallback(list(by_key.values()))
+
+    table = ExchangeRate.__table__
+    values = list(by_key.values())
+    dates = [dt for _, _, dt in by_key]
+    # Ids of rows that may already exist, to tell updates from inserts below.
+    existing = set(db.session.execute(
+        select(table.c.id).where(
+            table.c.base.in_({b for b, _, _ in by_key}),
+            table.c.quote.in_({q for _, q, _ in by_key}),
+            table.c.date.between(min(dates), max(dates)),
+        )
+    ).scalars())
+    # One executemany with RETURNING: compiled once, sent in multi-row pages,
+    # and reports exactly which rows were inserted or changed.
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["base", "quote", "date"],
+        set_={"rate": stmt.excluded.rate, "source": stmt.excluded.source},
+        where=or_(
+            table.c.rate.is_distinct_from(stmt.excluded.rate),
+            table.c.source.is_distinct_from(stmt.excluded.source),
+        ),
+    )
+    written = db.session.execute(stmt.returning(table.c.id), values).scalars().all()
+    changed = sum(1 for row_id in written if row_id in existing)
+
+    for (base, quote, dt), row in by_key.items():
+        fx_cache.store(base, quote, dt, row["rate"])
+    if changed:
+        fx_cache.bump_version()
+    return len(written)
+
+
+def _upsert_rates_fallback(rows: List[dict]) -> int:
+    pairs: Dict[Tuple[str, str], List[dict]] = {}
+    for row in rows:
+        pairs.setdefault((row["base"], row["quote"]), []).append(row)
 
-    return fx
+    new_rows = []
+    written = 0
+    for (base, quote), items in pairs.items():
+        dates = [row["date"] for row in items]
+        existing = {
+            rec.date: rec
+            for rec in ExchangeRate.query.filter(
+                ExchangeRate.base == base,
+                ExchangeRate.quote == quote,
+                ExchangeRate.date.between(min(dates), max(dates)),
+            )
+        }
+        for row in items:
+            rec = existing.get(row["date"])
+            if rec is None:
+                new_rows.append(row)
+            elif (rec.rate, rec.source) != (row["rate"], row["source"]):
+                rec.rate = row["rate"]
+                rec.source = row["source"]
+                fx_cache.store(base, quote, row["date"], row["rate"], replaced=True)
+            else:
+                continue
+            written += 1
+    if new_rows:
+        db.session.bulk_insert_mappings(ExchangeRate, new_rows)
+        for row in new_rows:
+            fx_cache.store(row["base"], row["quote"], row["date"], row["rate"])
+    return written
 
 
 def to_base(value: float, ccy: str, dt: Union[str, date_cls]) -> float:
@@ -0,0 +1,230 @@
+"""Process-wide LRU cache in front of ``exchange_rates`` lookups.
+
+Historical rates only change through ``/api/fx/override`` or when a download
+overwrites an existing row. Writers invalidate the affected key locally and
+bump a version stamp in the ``cache_versions`` table; every worker compares
+that stamp once per app context (i.e. once per request) and drops its cache
+when another worker has changed a rate.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from datetime import date as date_cls
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import g, has_app_context
+
+from src import settings
+from src.models.portfolio import CacheVersion, ExchangeRate
+from src.models.user import db
+
+RateKey = Tuple[str, str, date_cls]
+Pair = Tuple[str, str]
+
+VERSION_NAME = "fx"
+
+
+class SeriesIndex:
+    """Sorted dates and rates of one currency pair for as-of lookups.
+
+    ``spans`` are the ranges this process downloaded as one contiguous
+    series; a weekday missing inside a span is a day the provider skipped.
+    """
+
+    def __init__(self, points: Iterable[Tuple[date_cls, float]]) -> None:
+        self.dates: List[date_cls] = []
+        self.rates: Dict[date_cls, float] = {}
+        self.spans: List[Tuple[date_cls, date_cls]] = []
+        for dt, rate in sorted(points):
+            self.dates.append(dt)
+            self.rates[dt] = rate
+
+    def add(self, dt: date_cls, rate: float) -> None:
+        if dt not in self.rates:
+            insort(self.dates, dt)
+        self.rates[dt] = rate
+
+    def on_or_before(self, dt: date_cls) -> Optional[Tuple[date_cls, float]]:
+        i = bisect_right(self.dates, dt)
+        if not i:
+            return None
+        found = self.dates[i - 1]
+        return found, self.rates[found]
+
+    def cover(self, first: date_cls, last: date_cls) -> None:
+        self.spans.append((first, last))
+
+    def covers(self, dt: date_cls) -> bool:
+        return any(first <= dt <= last for first, last in self.spans)
+
+
+class RateCache:
+    """Thread-safe bounded LRU of ``(base, quote, date) -> rate``.
+
+    Also holds a :class:`SeriesIndex` per pair, loaded on first as-of lookup.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[RateKey, float]" = OrderedDict()
+        self._series: Dict[Pair, SeriesIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: RateKey) -> Optional[float]:
+        with self._lock:
+            rate = self._data.get(key)
+            if rate is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return rate
+
+    def put(self, key: RateKey, rate: float) -> None:
+        with self._lock:
+            self._data[key] = rate
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            index = self._series.get(key[:2])
+            if index is not None:
+                index.add(key[2], rate)
+
+    def invalidate(self, key: RateKey) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._series.pop(key[:2], None)
+
+    def series(self, pair: Pair) -> Optional[SeriesIndex]:
+        with self._lock:
+            return self._series.get(pair)
+
+    def set_series(self, pair: Pair, index: SeriesIndex) -> None:
+        with self._lock:
+            self._series[pair] = index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._series.clear()
+            self.version = None
+
+    def reset(self) -> None:
+        """Clear entries and counters."""
+        self.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "series": len(self._series),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": self.version,
+            }
+
+
+cache = RateCache(settings.FX_CACHE_SIZE)
+
+
+def sync_version() -> None:
+    """Drop the cache when another worker bumped the version stamp.
+
+    The stamp is read at most once per app context.
+    """
+    if has_app_context():
+        if g.get("fx_cache_synced"):
+            return
+        g.fx_cache_synced = True
+    version = (
+        db.session.query(CacheVersion.version).filter_by(name=VERSION_NAME).scalar() or 0
+    )
+    if cache.version != version:
+        cache.clear()
+        cache.version = version
+
+
+def bump_version() -> None:
+    """Increment the shared version stamp; committed with the caller's write."""
+    updated = CacheVersion.query.filter_by(name=VERSION_NAME).update(
+        {CacheVersion.version: CacheVersion.version + 1}
+    )
+    if not updated:
+        db.session.add(CacheVersion(name=VERSION_NAME, version=1))
+
+
+def lookup(base: str, quote: str, dt: date_cls) -> Optional[float]:
+    """Return the stored rate for ``base``/``quote`` on ``dt`` or ``None``."""
+    sync_version()
+    key = (base, quote, dt)
+    rate = cache.get(key)
+    if rate is not None:
+        return rate
+    rec = ExchangeRate.query.filter_by(base=base, quote=quote, date=dt).first()
+    if rec is None:
+        return None
+    cache.put(key, rec.rate)
+    return rec.rate
+
+
+def lookup_many(keys: Iterable[RateKey]) -> Tuple[Dict[RateKey, float], set]:
+    """Split ``keys`` into cached rates and keys that must be queried."""
+    sync_version()
+    found: Dict[RateKey, float] = {}
+    missing = set()
+    for key in keys:
+        rate = cache.get(key)
+        if rate is None:
+            missing.add(key)
+        else:
+            found[key] = rate
+    return found, missing
+
+
+def store(base: str, quote: str, dt: date_cls, rate: float, replaced: bool = False) -> None:
+    """Record a rate just written to ``exchange_rates``.
+
+    ``replaced`` marks an overwrite of an existing row, which other workers
+    may have cached, so the shared version stamp is bumped.
+    """
+    key = (base, quote, dt)
+    if replaced:
+        cache.invalidate(key)
+        bump_version()
+    cache.put(key, rate)
+
+
+def series(base: str, quote: str) -> SeriesIndex:
+    """Return the date index of ``base``/``quote``, loading it with one query."""
+    sync_version()
+    pair = (base, quote)
+    index = cache.series(pair)
+    if index is None:
+        rows = db.session.query(ExchangeRate.date, ExchangeRate.rate).filter_by(
+            base=base, quote=quote
+        )
+        index = SeriesIndex(rows)
+        cache.set_series(pair, index)
+    return index
+
+
+def cover(base: str, quote: str, dates: Iterable[date_cls]) -> None:
+    """Record that ``dates`` of ``base``/``quote`` came from one series download.
+
+    Every weekday between the first and last of them without a rate is a
+    provider holiday. Spans are kept in memory only and dropped with the
+    series index.
+    """
+    dates = list(dates)
+    if dates:
+        series(base, quote).cover(min(dates), max(dates))
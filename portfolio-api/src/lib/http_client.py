@@ -0,0 +1,160 @@
+"""Pooled HTTP sessions for outbound provider calls.
+
+Every provider host gets one ``requests.Session`` whose connection pool
+(``HTTP_POOL_SIZE`` connections) is kept alive between calls, so repeated
+quote and FX lookups skip the TCP and TLS handshakes. :func:`get` applies
+the default connect and read timeouts, retries connection errors and
+``RETRY_STATUSES`` with jittered exponential backoff, and records latency
+per host (see :func:`stats`).
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import settings
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HostStats:
+    """Request, error and retry counts plus a latency window for one host."""
+
+    def __init__(self, window: int = 512) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.max_seconds = 0.0
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._latencies.append(seconds)
+
+    def retried(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            result = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "max_ms": round(self.max_seconds * 1000, 1),
+            }
+        if latencies:
+            result.update(
+                avg_ms=round(sum(latencies) / len(latencies) * 1000, 1),
+                p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+                p95_ms=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            )
+        return result
+
+
+_sessions: Dict[str, requests.Session] = {}
+_stats: Dict[str, HostStats] = {}
+_lock = threading.Lock()
+
+
+def session(host: str) -> requests.Session:
+    """Return the pooled session for ``host``, creating it once."""
+    with _lock:
+        found = _sessions.get(host)
+        if found is None:
+            found = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=settings.HTTP_POOL_SIZE, max_retries=0
+            )
+            found.mount("http://", adapter)
+            found.mount("https://", adapter)
+            _sessions[host] = found
+            _stats[host] = HostStats()
+        return found
+
+
+def backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry ``attempt`` (0-based), with full jitter.
+
+    A numeric ``Retry-After`` header raises the delay, capped at
+    ``HTTP_BACKOFF_MAX``.
+    """
+    delay = random.uniform(0, min(settings.HTTP_BACKOFF_MAX, settings.HTTP_BACKOFF * 2 ** attempt))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), settings.HTTP_BACKOFF_MAX))
+    return delay
+
+
+def get(
+    url: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    timeout: Optional[Timeout] = None,
+    retries: Optional[int] = None,
+) -> requests.Response:
+    """GET ``url`` through the host's pooled session.
+
+    ``timeout`` is a read timeout or a ``(connect, read)`` tuple and defaults
+    to ``HTTP_CONNECT_TIMEOUT``/``HTTP_READ_TIMEOUT``. The final response is
+    returned even when its status is an error; connection errors and
+    timeouts are raised once ``retries`` (default ``HTTP_RETRIES``) are used.
+    """
+    host = urlparse(url).netloc
+    client = session(host)
+    host_stats = _stats[host]
+    if timeout is None:
+        timeout = settings.HTTP_READ_TIMEOUT
+    if not isinstance(timeout, tuple):
+        timeout = (settings.HTTP_CONNECT_TIMEOUT, timeout)
+    retries = settings.HTTP_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            resp = client.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            host_stats.record(time.perf_counter() - start, ok=False)
+            if attempt == retries:
+                raise
+        else:
+            host_stats.record(time.perf_counter() - start, ok=resp.status_code < 400)
+            if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                return resp
+            retry_after = resp.headers.get("Retry-After")
+            resp.close()
+        host_stats.retried()
+        time.sleep(backoff(attempt, retry_after))
+    raise AssertionError("unreachable")
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    """Per-host request counts and latency of this process."""
+    with _lock:
+        hosts = dict(_stats)
+    return {host: host_stats.to_dict() for host, host_stats in sorted(hosts.items())}
+
+
+def reset() -> None:
+    """Close every session and drop the metrics."""
+    with _lock:
+        for client in _sessions.values():
+            client.close()
+        _sessions.clear()
+        _stats.clear()
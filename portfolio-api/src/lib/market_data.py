@@ -1,49 +1,99 @@
 import os
-import requests
+
+from src.data_api import ApiClient
+from src.lib import av_quota, http_client
 
 
 _API_URL = "https://www.alphavantage.co/query"
 
 
-def _fetch_av_overview(symbol: str, api_key: str) -> str | None:
-    """Return company name using Alpha Vantage OVERVIEW."""
+def _metadata(name, exchange=None, currency=None, source=None) -> dict | None:
+    if not name:
+        return None
+    return {
+        "name": name,
+        "exchange": exchange or None,
+        "currency": (currency or "").upper() or None,
+        "source": source,
+    }
+
+
+def _fetch_av_overview(symbol: str, api_key: str) -> dict | None:
+    """Return company details using Alpha Vantage OVERVIEW."""
+    if not av_quota.acquire():
+        return None
     try:
-        resp = requests.get(
+        resp = http_client.get(
             _API_URL,
             params={"function": "OVERVIEW", "symbol": symbol, "apikey": api_key},
-            timeout=10,
+            retries=0,
         )
         resp.raise_for_status()
         data = resp.json()
-        return data.get("Name") or None
+        av_quota.exhaust(data)
+        return _metadata(data.get("Name"), data.get("Exchange"), data.get("Currency"), "alphavantage")
+    except Exception:
+        return None
+
+
+def _fetch_data_api(symbol: str) -> dict | None:
+    """Return company details from the data API's Yahoo chart metadata."""
+    try:
+        data = ApiClient().call_api(
+            "YahooFinance/get_stock_chart",
+            query={"symbol": symbol, "interval": "1d", "range": "1d"},
+        )
+        meta = data["chart"]["result"][0].get("meta", {})
     except Exception:
         return None
+    return _metadata(
+        meta.get("longName") or meta.get("shortName"),
+        meta.get("exchangeName"),
+        meta.get("currency"),
+        "data_api",
+    )
 
 
-def _fetch_yahoo_company(symbol: str) -> str | None:
-    """Return company name using Yahoo Finance quoteSummary."""
+def _fetch_yahoo_company(symbol: str) -> dict | None:
+    """Return company details using Yahoo Finance quoteSummary."""
     url = f"https://query1.finance.yahoo.com/v10/finance/quoteSummary/{symbol}"
     try:
-        resp = requests.get(url, params={"modules": "price"}, timeout=10)
+        resp = http_client.get(url, params={"modules": "price"}, retries=0)
         resp.raise_for_status()
         data = resp.json()
         result = data.get("quoteSummary", {}).get("result")
         if result:
             price_info = result[0].get("price", {})
-            return price_info.get("longName") or price_info.get("shortName")
+            return _metadata(
+                price_info.get("longName") or price_info.get("shortName"),
+                price_info.get("exchangeName"),
+                price_info.get("currency"),
+                "yahoo",
+            )
     except Exception:
         return None
     return None
 
 
-def get_company_name(ticker: str) -> str | None:
-    """Return company name for ticker symbol using Alpha Vantage or Yahoo."""
+def fetch_metadata(ticker: str) -> dict | None:
+    """Return ``name``, ``exchange``, ``currency`` and ``source`` for a ticker.
+
+    Tries Alpha Vantage (when configured), the data API and Yahoo in turn.
+    Best effort: requests are not retried and ``None`` means no provider
+    knew the symbol. Request handlers should read the stored result from
+    ``services.symbol_metadata`` instead of calling this.
+    """
     symbol = ticker.upper()
     api_key = os.environ.get("ALPHAVANTAGE_API_KEY")
 
     if api_key:
-        name = _fetch_av_overview(symbol, api_key)
-        if name:
-            return name
+        found = _fetch_av_overview(symbol, api_key)
+        if found:
+            return found
+
+    return _fetch_data_api(symbol) or _fetch_yahoo_company(symbol)
 
-    return _fetch_yahoo_company(symbol)
+
+def get_company_name(ticker: str) -> str | None:
+    """Return company name for ticker symbol (see :func:`fetch_metadata`)."""
+    return (fetch_metadata(ticker) or {}).get("name")
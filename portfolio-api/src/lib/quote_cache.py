@@ -0,0 +1,329 @@
+"""Short-lived cache of latest quotes, shareable between worker processes.
+
+``QUOTE_CACHE_URL`` picks the backend:
+
+``memory``
+    in-process LRU (default); each worker has its own copy.
+``sqlite:///path/to/file.db``
+    a SQLite file shared by every process on the host.
+``redis://host:port/db``
+    any server speaking the Redis protocol (RESP); entries expire through
+    ``PX`` and size is bounded by the server's eviction policy.
+
+Entries older than ``QUOTE_CACHE_TTL`` seconds are misses. A cached ``None``
+price records that no provider had a quote. Every backend counts hits and
+misses per process. A backend that fails (Redis unreachable, SQLite file
+locked) is logged and treated as a miss or a skipped write, so quotes are
+still fetched from the providers.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class CachedQuote(NamedTuple):
+    price: Optional[float]
+    fetched_at: float
+
+
+class QuoteCache(ABC):
+    """Base class: TTL handling, hit/miss counters and backend errors."""
+
+    backend = "base"
+
+    def __init__(self, ttl: float, maxsize: Optional[int] = None) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._counter_lock = threading.Lock()
+
+    @abstractmethod
+    def _load(self, symbol: str) -> Optional[CachedQuote]:
+        """Return the stored entry of ``symbol``, expired or not."""
+
+    @abstractmethod
+    def _store(self, symbol: str, entry: CachedQuote) -> None:
+        """Store ``entry`` under ``symbol``."""
+
+    @abstractmethod
+    def _clear(self) -> None:
+        """Drop every entry."""
+
+    def _size(self) -> Optional[int]:
+        return None
+
+    def _failed(self, action: str, symbol: str, exc: Exception) -> None:
+        logger.warning("quote cache %s %s failed for %s: %s", self.backend, action, symbol, exc)
+        with self._counter_lock:
+            self.errors += 1
+
+    def get(self, symbol: str) -> Optional[CachedQuote]:
+        try:
+            entry = self._load(symbol)
+        except BACKEND_ERRORS as exc:
+            self._failed("read", symbol, exc)
+            entry = None
+        if entry is not None and time.time() - entry.fetched_at >= self.ttl:
+            entry = None
+        with self._counter_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, symbol: str, price: Optional[float], fetched_at: Optional[float] = None) -> None:
+        try:
+            self._store(symbol, CachedQuote(price, fetched_at or time.time()))
+        except BACKEND_ERRORS as exc:
+            self._failed("write", symbol, exc)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        self._clear()
+        with self._counter_lock:
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+
+    def stats(self) -> Dict[str, object]:
+        try:
+            size = self._size()
+        except BACKEND_ERRORS as exc:
+            self._failed("size", "*", exc)
+            size = None
+        return {
+            "backend": self.backend,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+class MemoryQuoteCache(QuoteCache):
+    backend = "memory"
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        super().__init__(ttl, maxsize)
+        self._data: "OrderedDict[str, CachedQuote]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, symbol: str) -> Optional[CachedQuote]:
+        with self._lock:
+            entry = self._data.get(symbol)
+            if entry is not None:
+                self._data.move_to_end(symbol)
+            return entry
+
+    def _store(self, symbol: str, entry: CachedQuote) -> None:
+        with self._lock:
+            self._data[symbol] = entry
+            self._data.move_to_end(symbol)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _size(self) -> int:
+        return len(self._data)
+
+
+class SQLiteQuoteCache(QuoteCache):
+    """Entries in a SQLite file; the oldest rows beyond ``maxsize`` are evicted."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, ttl: float, maxsize: int) -> None:
+        super().__init__(ttl, maxsize)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quote_cache ("
+                "symbol TEXT PRIMARY KEY, price REAL, fetched_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _load(self, symbol: str) -> Optional[CachedQuote]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT price, fetched_at FROM quote_cache WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return CachedQuote(*row) if row else None
+
+    def _store(self, symbol: str, entry: CachedQuote) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO quote_cache (symbol, price, fetched_at) VALUES (?, ?, ?)",
+                    (symbol, entry.price, entry.fetched_at),
+                )
+                conn.execute(
+                    "DELETE FROM quote_cache WHERE symbol NOT IN ("
+                    "SELECT symbol FROM quote_cache ORDER BY fetched_at DESC LIMIT ?)",
+                    (self.maxsize,),
+                )
+        finally:
+            conn.close()
+
+    def _clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM quote_cache")
+        finally:
+            conn.close()
+
+    def _size(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM quote_cache").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class RespError(Exception):
+    pass
+
+
+# Connection failures and timeouts are OSErrors; ValueError covers a
+# corrupt Redis value.
+BACKEND_ERRORS = (OSError, sqlite3.Error, RespError, ValueError)
+
+
+class RespClient:
+    """Minimal Redis-protocol client: one socket per call, no pooling."""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 timeout: float = 2.0) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    def _read(cls, stream):
+        line = stream.readline()
+        if not line:
+            raise RespError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = stream.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(rest)
+            if size < 0:
+                return None
+            return [cls._read(stream) for _ in range(size)]
+        raise RespError(f"unexpected reply {line!r}")
+
+    def execute(self, *commands: List) -> list:
+        """Send ``commands`` in one round trip and return their replies."""
+        prelude = []
+        if self.password:
+            prelude.append(["AUTH", self.password])
+        if self.db:
+            prelude.append(["SELECT", self.db])
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(b"".join(self._encode(*cmd) for cmd in prelude + list(commands)))
+            stream = sock.makefile("rb")
+            replies = [self._read(stream) for _ in prelude + list(commands)]
+        return replies[len(prelude):]
+
+
+class RedisQuoteCache(QuoteCache):
+    """Entries as Redis keys expiring after ``ttl``; the server bounds the size."""
+
+    backend = "redis"
+
+    def __init__(self, client: RespClient, ttl: float, prefix: str = "quote:") -> None:
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    def _load(self, symbol: str) -> Optional[CachedQuote]:
+        (raw,) = self.client.execute(["GET", self.prefix + symbol])
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedQuote(data["price"], data["fetched_at"])
+
+    def _store(self, symbol: str, entry: CachedQuote) -> None:
+        value = json.dumps({"price": entry.price, "fetched_at": entry.fetched_at})
+        self.client.execute(["SET", self.prefix + symbol, value, "PX", int(self.ttl * 1000)])
+
+    def _keys(self) -> List[bytes]:
+        keys: List[bytes] = []
+        cursor = b"0"
+        while True:
+            ((cursor, batch),) = self.client.execute(
+                ["SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500]
+            )
+            keys.extend(batch)
+            if cursor in (b"0", 0, "0"):
+                return keys
+
+    def _clear(self) -> None:
+        keys = self._keys()
+        if keys:
+            self.client.execute(["DEL", *keys])
+
+    def _size(self) -> int:
+        return len(self._keys())
+
+
+def from_url(url: str, ttl: float, maxsize: int) -> QuoteCache:
+    """Build the cache described by ``url`` (see module docstring)."""
+    if not url or url == "memory":
+        return MemoryQuoteCache(ttl, maxsize)
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # Same convention as SQLAlchemy: sqlite:///relative, sqlite:////absolute.
+        return SQLiteQuoteCache(parsed.path[1:], ttl, maxsize)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        client = RespClient(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password)
+        return RedisQuoteCache(client, ttl)
+    raise ValueError(f"unsupported quote cache URL: {url}")
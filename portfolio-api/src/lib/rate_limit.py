@@ -0,0 +1,60 @@
+"""Token buckets limiting request rates per provider.
+
+Each provider gets one bucket per process via :func:`bucket`. ``acquire``
+blocks until a token is available, so any number of worker threads can
+share a bucket and the provider still sees at most ``rate`` requests per
+second (after an initial burst of ``capacity``).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` if available; return the seconds to wait otherwise.
+
+        ``0.0`` means the tokens were taken.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` are available and take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_lock = threading.Lock()
+
+
+def bucket(provider: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+    """Return the process-wide bucket for ``provider``, creating it once."""
+    with _lock:
+        found = _buckets.get(provider)
+        if found is None:
+            found = _buckets[provider] = TokenBucket(rate, capacity)
+        return found
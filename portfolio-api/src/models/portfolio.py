@@ -23,6 +23,7 @@ class Stock(db.Model):
     
     # Relationship with transactions
     transactions = db.relationship('Transaction', backref='stock', lazy=True, cascade='all, delete-orphan')
+    position = db.relationship('Position', backref='stock', uselist=False, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Stock {self.symbol}>'
@@ -49,6 +50,9 @@ class Transaction(db.Model):
     fx_error = db.Column(db.String(128), nullable=True)
     deal_amount = db.Column(db.Numeric(14, 2), nullable=True)
     deal_currency = db.Column(db.String(3), nullable=True)
+    # Buy transaction ids and quantities a sell should consume under the
+    # ``specific`` cost-basis method, e.g. ``[{"transaction_id": 3, "quantity": 5}]``.
+    lot_selection = db.Column(db.JSON, nullable=True)
     transaction_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -70,6 +74,7 @@ class Transaction(db.Model):
             'fx_error': self.fx_error,
             'deal_amount': float(self.deal_amount) if self.deal_amount is not None else None,
             'deal_currency': self.deal_currency,
+            'lot_selection': self.lot_selection,
             'total_value': self.quantity * self.price_per_share,
             'total_value_base': self.total_value_base,
             'transaction_date': self.transaction_date.isoformat() if self.transaction_date else None,
@@ -86,17 +91,143 @@ class Transaction(db.Model):
         return self.quantity * self.price_per_share * rate
 
 
+class Position(db.Model):
+    """Materialized holdings for one stock, maintained on every trade write.
+
+    Money columns are in the portfolio base currency except ``cost_orig``
+    which is expressed in ``currency`` (the currency of the first buy).
+    """
+
+    __tablename__ = "positions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False, unique=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    total_bought = db.Column(db.Integer, nullable=False, default=0)
+    total_sold = db.Column(db.Integer, nullable=False, default=0)
+    buy_cost = db.Column(db.Float, nullable=False, default=0.0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)
+    cost_orig = db.Column(db.Float, nullable=False, default=0.0)
+    currency = db.Column(db.String(3), nullable=True)
+    fees = db.Column(db.Float, nullable=False, default=0.0)
+    contributions = db.Column(db.Float, nullable=False, default=0.0)
+    realized_gain = db.Column(db.Float, nullable=False, default=0.0)
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Lot(db.Model):
+    """An open or partially consumed buy lot.
+
+    ``unit_cost`` includes the buy fee and is in the portfolio base currency;
+    ``unit_cost_orig`` is in the trade ``currency``.
+    """
+
+    __tablename__ = "lots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False, index=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, unique=True)
+    acquired_on = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    remaining = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)
+    unit_cost_orig = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'transaction_id': self.transaction_id,
+            'acquired_on': self.acquired_on.isoformat(),
+            'quantity': self.quantity,
+            'remaining': self.remaining,
+            'unit_cost': self.unit_cost,
+            'unit_cost_orig': self.unit_cost_orig,
+            'currency': self.currency,
+            'cost_basis': self.remaining * self.unit_cost,
+        }
+
+
+class LotMatch(db.Model):
+    """Quantity of a lot consumed by a sell and the resulting realized gain."""
+
+    __tablename__ = "lot_matches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False, index=True)
+    sell_transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)
+    lot_id = db.Column(db.Integer, db.ForeignKey('lots.id'), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    proceeds = db.Column(db.Float, nullable=False)
+
+    lot = db.relationship('Lot')
+
+
 class PriceCache(db.Model):
+    """Fetched quotes, one row per fetch.
+
+    Rows older than ``PRICE_CACHE_COMPACT_DAYS`` are rolled up into one
+    daily bar per symbol: ``price`` is the close, ``fetched_at`` the last
+    fetch of the day and ``samples`` the number of fetches it replaces.
+    Raw rows have ``samples`` unset.
+    """
+
+    __table_args__ = (
+        db.Index("ix_price_cache_symbol_fetched_at", "symbol", "fetched_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(10), nullable=False)
     price = db.Column(db.Float, nullable=False)
     currency = db.Column(db.Enum(CurrencyEnum), nullable=False, default=BASE_CURRENCY)
     fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    open = db.Column(db.Float, nullable=True)
+    high = db.Column(db.Float, nullable=True)
+    low = db.Column(db.Float, nullable=True)
+    samples = db.Column(db.Integer, nullable=True)
 
     def __repr__(self):
         return f"<PriceCache {self.symbol} {self.price} {self.currency.value}>"
 
 
+class PriceHistory(db.Model):
+    """Daily closing price of a symbol in its native currency."""
+
+    __tablename__ = "price_history"
+
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(32), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("symbol", "date", name="uix_price_history"),
+    )
+
+    def __repr__(self):
+        return f"<PriceHistory {self.symbol} {self.date} {self.close}>"
+
+
+class SymbolMetadata(db.Model):
+    """Company name and listing details of a ticker, filled in the background.
+
+    A row without ``name`` records a lookup that found nothing.
+    """
+
+    __tablename__ = "symbol_metadata"
+
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(10), nullable=False, unique=True)
+    name = db.Column(db.String(128), nullable=True)
+    exchange = db.Column(db.String(32), nullable=True)
+    currency = db.Column(db.String(3), nullable=True)
+    source = db.Column(db.String(32), nullable=True)
+    checked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
 class ExchangeRate(db.Model):
     __tablename__ = "exchange_rates"
 
@@ -114,3 +245,12 @@ class ExchangeRate(db.Model):
     def __repr__(self):
         return f"<ExchangeRate {self.base}->{self.quote} {self.date} {self.rate}>"
 
+
+
+class CacheVersion(db.Model):
+    """Version stamp shared by all workers to invalidate in-process caches."""
+
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
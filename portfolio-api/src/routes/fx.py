@@ -1,8 +1,9 @@
 from datetime import date
 from flask import Blueprint, request, jsonify
-from src.models.portfolio import ExchangeRate
 from src.models.user import db
-from src.lib.fx import validate_currency_code
+from src.lib.fx import upsert_rates, validate_currency_code
+from src.lib import fx_cache
+from src.services import fx as services_fx
 
 fx_bp = Blueprint('fx', __name__)
 
@@ -13,13 +14,14 @@ def manual_rate():
     quote = validate_currency_code(data.get('quote', ''))
     rate = float(data['rate'])
     dt = date.fromisoformat(data['date'])
-    rec = ExchangeRate.query.filter_by(base=base, quote=quote, date=dt).first()
-    if rec:
-        rec.rate = rate
-        rec.source = 'manual'
-    else:
-        db.session.add(
-            ExchangeRate(base=base, quote=quote, date=dt, rate=rate, source='manual')
-        )
+    services_fx.drop_derived(dt)
+    upsert_rates([
+        {'base': base, 'quote': quote, 'date': dt, 'rate': rate, 'source': 'manual'}
+    ])
     db.session.commit()
     return jsonify({'date': dt.isoformat(), 'base': base, 'quote': quote, 'rate': rate})
+
+
+@fx_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({**fx_cache.cache.stats(), "single_flight": services_fx._flights.stats()})
@@ -1,10 +1,13 @@
+import os
 from datetime import datetime
 from flask import Blueprint, request, jsonify
+from src.config import PORTFOLIO_BASE_CCY
 from src.models.portfolio import Stock, Transaction
 from src.lib.fx import validate_currency_code
 from src.models.user import db
 from src.services.google_finance import parse_raw
 from src.services.xlsx_import import parse_xlsx
+from src.services import positions
 from werkzeug.exceptions import BadRequest
 from src.importers.avanza_text import detect_avanza_text, parse_avanza_text
 
@@ -27,6 +30,7 @@ def google_finance_import():
     data = request.get_json(force=True)
     raw = data.get('raw', '')
     rows, invalid = parse_raw(raw)
+    base_currency = os.environ.get('PORTFOLIO_BASE_CCY', PORTFOLIO_BASE_CCY)
     ids = []
     duplicates = 0
     for row in rows:
@@ -68,6 +72,7 @@ def google_finance_import():
         )
         db.session.add(tx)
         db.session.flush()
+        positions.apply_transaction(tx, base_currency)
         ids.append(tx.id)
     db.session.commit()
     return jsonify({"inserted_ids": ids, "invalid_rows": invalid, "duplicates_skipped": duplicates})
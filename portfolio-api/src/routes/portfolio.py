@@ -1,12 +1,11 @@
 from flask import Blueprint, request, jsonify, abort, current_app
-from werkzeug.exceptions import HTTPException, BadGateway
+from werkzeug.exceptions import HTTPException
 from src.models.user import db
 from src.models.portfolio import (
     Stock,
     Transaction,
     CurrencyEnum,
     PriceCache,
-    ExchangeRate,
     BASE_CURRENCY,
 )
 from src.config import PORTFOLIO_BASE_CCY
@@ -15,15 +14,27 @@ from src.lib.fx import (
     UnsupportedCurrency,
     FxDownloadError,
     validate_currency_code,
-    to_base,
 )
-from src.services import fx as services_fx
-import requests
 from datetime import datetime, date, timedelta
 import os
 
 from src.data_api import ApiClient
+from src.lib import av_quota
 from src.services.market_data import fetch_quote, QuoteAPIError
+from src.services.history import lttb, sample_days, to_points, value_history
+from src.services.holdings import preload_rates
+from src.services import (
+    fx_backfill,
+    lots,
+    positions,
+    price_cache,
+    price_freshness,
+    price_history,
+    symbol_metadata,
+)
+from src.services.positions import load_positions
+from src.services.latest_fx import latest_rates
+from src.services.quote_refresh import refresh_quotes
 
 portfolio_bp = Blueprint('portfolio', __name__)
 prices_bp = Blueprint('prices', __name__)
@@ -31,8 +42,8 @@ client = ApiClient()
 
 
 def ensure_fx_rates(start_date: date, currency: str) -> None:
-    """Ensure FX rates from ``currency`` to the base currency exist from
-    ``start_date`` through today."""
+    """Backfill FX rates from ``currency`` to the base currency from
+    ``start_date`` through today, off the request thread."""
     base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
     if currency.upper() == base_currency:
         return
@@ -40,18 +51,40 @@ def ensure_fx_rates(start_date: date, currency: str) -> None:
     if isinstance(start_date, str):
         start_date = date.fromisoformat(start_date)
 
-    d = start_date
-    today = date.today()
-    while d <= today:
-        exists = (
-            ExchangeRate.query.filter_by(base=currency.upper(), quote=base_currency, date=d).first()
-        )
-        if not exists:
-            try:
-                get_fx_rate(currency, base_currency, d)
-            except (UnsupportedCurrency, FxDownloadError):
-                break
-        d += timedelta(days=1)
+    try:
+        fx_backfill.schedule(currency, base_currency, start_date)
+    except (UnsupportedCurrency, FxDownloadError) as exc:
+        current_app.logger.warning("FX backfill failed: %s", exc)
+
+
+def display_rate(env_base: str, requested_base: str):
+    """Return the cached latest rate from ``env_base`` to ``requested_base``.
+
+    ``None`` means no rate is stored yet; callers report figures in
+    ``env_base`` until the background refresh has fetched one.
+    """
+    if requested_base == env_base:
+        return None
+    try:
+        return latest_rates.get(env_base, requested_base)
+    except UnsupportedCurrency:
+        return None
+
+
+def display_currency(env_base: str, requested_base: str, latest) -> str:
+    """Return the currency the converted figures are actually in."""
+    return requested_base if latest or requested_base == env_base else env_base
+
+
+def fx_fields(env_base: str, requested_base: str, latest) -> dict:
+    """Describe the display conversion for JSON responses."""
+    if requested_base == env_base:
+        return {}
+    return {
+        'fx_rate': latest.rate if latest else None,
+        'fx_rate_date': latest.as_of.isoformat() if latest and latest.as_of else None,
+        'fx_rate_age_days': latest.age_days if latest else None,
+    }
 
 
 def parse_range(range_str: str):
@@ -73,123 +106,95 @@ def parse_range(range_str: str):
     start, granularity = mapping.get(range_str, (date(1970, 1, 1), 'month'))
     return start, today, granularity
 
+def refresh_held_prices(stocks, price_currency: str) -> tuple:
+    """Apply stale-while-revalidate to the stored prices of ``stocks``.
+
+    Expired prices are fetched before returning, stale ones are queued for
+    a background refresh. Stocks that were never priced are left alone.
+    Returns the symbols whose price is served stale and whether expired
+    prices were refreshed; that commit expires every loaded row.
+    """
+    states = {}
+    for stock in stocks:
+        if stock.current_price is not None:
+            states[stock.symbol] = price_freshness.freshness(stock.last_updated)
+    expired = [s for s, state in states.items() if state == price_freshness.EXPIRED]
+    stale = {s for s, state in states.items() if state == price_freshness.STALE}
+    if expired:
+        report = refresh_quotes(price_currency, expired, priority=av_quota.INTERACTIVE)
+        stale.update(report.failed)
+    price_freshness.revalidate(sorted(stale - set(expired)), price_currency)
+    return stale, bool(expired)
+
+
 # Return JSON for not found errors within this blueprint
 @portfolio_bp.errorhandler(404)
 def not_found(e):
     return jsonify(message=getattr(e, "description", "Not Found")), 404
 
+@portfolio_bp.errorhandler(lots.UnsupportedCostBasisMethod)
+def unsupported_cost_basis_method(e):
+    # A server misconfiguration, not a bad request.
+    return jsonify({'error': f'unsupported COST_BASIS_METHOD: {e}'}), 500
+
 @portfolio_bp.route('/stocks', methods=['GET'])
 def get_all_stocks():
     """Get all stocks in the portfolio with current holdings"""
     try:
         env_base = os.environ.get('BASE_CURRENCY', BASE_CURRENCY)
         requested_base = request.args.get('base', env_base).upper()
-        rate = 1.0
-        if requested_base != env_base:
-            try:
-                resp = requests.get(
-                    "https://api.exchangerate.host/latest",
-                    params={"base": env_base, "symbols": requested_base},
-                    timeout=10,
-                )
-                rate = resp.json()["rates"][requested_base]
-            except Exception:
-                rate = 1.0
+        latest = display_rate(env_base, requested_base)
+        rate = latest.rate if latest else 1.0
 
-        stocks = Stock.query.all()
-        transactions = Transaction.query.order_by(Transaction.transaction_date).all()
-        portfolio_data = []
-        
         base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
+        portfolio_data = []
 
-        for stock in stocks:
-            # Calculate current holdings
-            buy_transactions = Transaction.query.filter_by(
-                stock_id=stock.id, 
-                transaction_type='buy'
-            ).all()
-            sell_transactions = Transaction.query.filter_by(
-                stock_id=stock.id, 
-                transaction_type='sell'
-            ).all()
-            
-            total_bought = sum(t.quantity for t in buy_transactions)
-            total_sold = sum(t.quantity for t in sell_transactions)
-            current_quantity = total_bought - total_sold
-            
+        positions = list(load_positions(base_currency))
+        stale, refreshed = refresh_held_prices(
+            [s for s, p in positions if p.quantity > 0], env_base
+        )
+        if refreshed:
+            # Reload the expired rows in one query instead of one per attribute access.
+            positions = list(load_positions(base_currency))
+
+        for stock, position in positions:
+            current_quantity = position.quantity
             if current_quantity > 0:  # Only include stocks we currently own
-                # Determine transaction currency (use first buy)
-                tx_currency = buy_transactions[0].currency if buy_transactions else env_base
-                # Calculate average cost basis
-                def tx_fee_to_ccy(tx, ccy):
-                    fee = float(tx.fee_amount or 0)
-                    src = tx.fee_currency or tx.currency
-                    if fee and src != ccy:
-                        if ccy == base_currency:
-                            fee = to_base(fee, src, tx.transaction_date)
-                        else:
-                            base_fee = to_base(fee, src, tx.transaction_date)
-                            try:
-                                rate = services_fx.get_rate(
-                                    tx.transaction_date,
-                                    ccy,
-                                    base_currency,
-                                )
-                            except FxDownloadError as exc:
-                                raise BadGateway("FX rate unavailable") from exc
-                            fee = base_fee / rate
-                    return fee
-
-                def trade_cost(tx):
-                    fee_ccy = tx_fee_to_ccy(tx, tx.currency)
-                    return tx.quantity * tx.price_per_share + fee_ccy
-
-                if len(buy_transactions) == 1 and len(sell_transactions) == 0:
-                    tx = buy_transactions[0]
-                    conv_price = to_base(tx.price_per_share, tx.currency, tx.transaction_date)
-                    avg_cost_basis = (
-                        conv_price
-                        + tx_fee_to_ccy(tx, base_currency) / tx.quantity
-                    )
-                    total_cost = tx.quantity * avg_cost_basis
-                    total_cost_orig = trade_cost(tx)
-                else:
-                    total_cost = sum(
-                        to_base(trade_cost(t), t.currency, t.transaction_date)
-                        for t in buy_transactions
-                    )
-                    avg_cost_basis = total_cost / total_bought if total_bought > 0 else 0
-                    total_cost_orig = sum(
-                        trade_cost(t) for t in buy_transactions if t.currency == tx_currency
-                    )
+                avg_cost_basis = position.cost_basis / current_quantity
 
-                fees_total = sum(
-                    tx_fee_to_ccy(t, base_currency)
-                    for t in buy_transactions + sell_transactions
-                )
-                
                 # Calculate current value and gains
                 current_value = current_quantity * (stock.current_price or 0)
-                cost_basis = current_quantity * avg_cost_basis
+                cost_basis = position.cost_basis
                 total_gain = current_value - cost_basis
                 total_gain_percent = (total_gain / cost_basis * 100) if cost_basis > 0 else 0
-                
+                avg_cost_original = (
+                    position.cost_orig / position.total_bought
+                    if position.total_bought > 0 else 0
+                )
+
                 stock_data = stock.to_dict()
                 stock_data.update({
                     'quantity': current_quantity,
                     'avg_cost_basis': round(avg_cost_basis * rate, 2),
-                    'avg_cost_original': round(total_cost_orig / total_bought, 2) if total_bought > 0 else 0,
-                    'transaction_currency': tx_currency,
+                    'avg_cost_original': round(avg_cost_original, 2),
+                    'transaction_currency': position.currency or base_currency,
                     'current_price': round((stock.current_price or 0) * rate, 2) if stock.current_price else None,
                     'current_value': round(current_value * rate, 2),
                     'cost_basis': round(cost_basis * rate, 2),
                     'total_gain': round(total_gain * rate, 2),
                     'total_gain_percent': round(total_gain_percent, 2),
-                    'fees_paid': round(fees_total * rate, 2)
+                    'realized_gain': round(position.realized_gain * rate, 2),
+                    'fees_paid': round(position.fees * rate, 2),
+                    'stale': stock.symbol in stale,
                 })
                 portfolio_data.append(stock_data)
-        
-        return jsonify(portfolio_data)
+
+        response = jsonify(portfolio_data)
+        response.headers['X-Base-Currency'] = display_currency(env_base, requested_base, latest)
+        for key, value in fx_fields(env_base, requested_base, latest).items():
+            if value is not None:
+                response.headers['X-' + key.replace('_', '-').title()] = str(value)
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -201,17 +206,8 @@ def get_stock(symbol):
     try:
         env_base = os.environ.get('BASE_CURRENCY', BASE_CURRENCY)
         requested_base = request.args.get('base', env_base).upper()
-        rate = 1.0
-        if requested_base != env_base:
-            try:
-                resp = requests.get(
-                    "https://api.exchangerate.host/latest",
-                    params={"base": env_base, "symbols": requested_base},
-                    timeout=10,
-                )
-                rate = resp.json()["rates"][requested_base]
-            except Exception:
-                rate = 1.0
+        latest = display_rate(env_base, requested_base)
+        rate = latest.rate if latest else 1.0
 
         stock = Stock.query.filter_by(symbol=symbol.upper()).first()
         if not stock:
@@ -219,10 +215,23 @@ def get_stock(symbol):
         data = stock.to_dict()
         if data.get('current_price') is not None:
             data['current_price'] = round(data['current_price'] * rate, 2)
+        data.update(fx_fields(env_base, requested_base, latest))
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@portfolio_bp.route('/stocks/<symbol>/lots', methods=['GET'])
+def get_stock_lots(symbol):
+    """Return the open buy lots of a stock in acquisition order."""
+    stock = Stock.query.filter_by(symbol=symbol.upper()).first()
+    if not stock:
+        return jsonify({'error': 'Stock not found'}), 404
+    return jsonify({
+        'symbol': stock.symbol,
+        'method': lots.current_method(),
+        'lots': [lot.to_dict() for lot in lots.open_lots(stock.id)],
+    })
+
 @portfolio_bp.route('/stocks/<symbol>/price', methods=['POST'])
 def update_stock_price(symbol):
     """Update stock price from Yahoo Finance API"""
@@ -243,15 +252,19 @@ def update_stock_price(symbol):
                 result = chart_data['chart']['result'][0]
                 if 'meta' in result and 'regularMarketPrice' in result['meta']:
                     current_price = result['meta']['regularMarketPrice']
-                    company_name = result['meta'].get('longName', result['meta'].get('shortName', ''))
-                    if not company_name:
-                        from src.lib.market_data import get_company_name
-                        company_name = get_company_name(symbol)
+                    company_name = (
+                        result['meta'].get('longName')
+                        or result['meta'].get('shortName')
+                        or stock.company_name
+                        or symbol_metadata.cached_name(stock.symbol)
+                    )
                     
                     stock.current_price = current_price
                     stock.company_name = company_name
                     stock.last_updated = datetime.utcnow()
                     db.session.commit()
+                    if not company_name:
+                        symbol_metadata.enrich([stock.symbol])
                     
                     return jsonify({
                         'symbol': stock.symbol,
@@ -276,8 +289,9 @@ def update_stock_price(symbol):
 def update_price():
     """Update a single stock price using the quote service.
 
-    If the price was already fetched today, the cached value is returned
-    without contacting the external API.
+    A cached price younger than the hard TTL is returned without contacting
+    the external API; past the soft TTL it is flagged ``stale`` and
+    refreshed in the background (see ``services.price_freshness``).
     """
     symbol = request.args.get('symbol', '').upper()
     if not symbol:
@@ -285,35 +299,26 @@ def update_price():
 
     env_base = os.environ.get('BASE_CURRENCY', BASE_CURRENCY)
     requested_base = request.args.get('base', env_base).upper()
-    rate = 1.0
-    if requested_base != env_base:
-        try:
-            resp = requests.get(
-                "https://api.exchangerate.host/latest",
-                params={"base": env_base, "symbols": requested_base},
-                timeout=10,
-            )
-            rate = resp.json()["rates"][requested_base]
-        except Exception:
-            rate = 1.0
+    latest = display_rate(env_base, requested_base)
+    rate = latest.rate if latest else 1.0
 
-    today = date.today()
-    cache = (
-        PriceCache.query.filter_by(symbol=symbol)
-        .order_by(PriceCache.fetched_at.desc())
-        .first()
-    )
-    if cache and cache.fetched_at.date() == today:
+    cache = price_cache.latest(symbol)
+    state = price_freshness.freshness(cache.fetched_at) if cache else price_freshness.EXPIRED
+    if state != price_freshness.EXPIRED:
         stock = Stock.query.filter_by(symbol=symbol).first()
-        if stock:
+        if stock and stock.last_updated != cache.fetched_at:
             stock.current_price = cache.price
             stock.last_updated = cache.fetched_at
             db.session.commit()
+        if state == price_freshness.STALE:
+            price_freshness.revalidate([symbol], env_base)
         return jsonify({
             'symbol': symbol,
             'current_price': round(cache.price * rate, 2),
             'company': stock.company_name if stock else None,
             'last_updated': cache.fetched_at.isoformat(),
+            'stale': state == price_freshness.STALE,
+            **fx_fields(env_base, requested_base, latest),
         })
 
     try:
@@ -326,13 +331,11 @@ def update_price():
 
     stock = Stock.query.filter_by(symbol=symbol).first()
     if not stock:
-        from src.lib.market_data import get_company_name
-        stock = Stock(symbol=symbol, company_name=get_company_name(symbol))
+        stock = Stock(symbol=symbol, company_name=symbol_metadata.cached_name(symbol))
         db.session.add(stock)
         db.session.flush()
     elif not stock.company_name:
-        from src.lib.market_data import get_company_name
-        stock.company_name = get_company_name(symbol)
+        stock.company_name = symbol_metadata.cached_name(symbol)
 
     stock.current_price = price
     stock.last_updated = datetime.utcnow()
@@ -341,46 +344,55 @@ def update_price():
         PriceCache(symbol=symbol, price=price, currency=CurrencyEnum[base_currency])
     )
     db.session.commit()
+    if not stock.company_name:
+        symbol_metadata.enrich([symbol])
 
     return jsonify({
         'symbol': stock.symbol,
         'current_price': round(price * rate, 2),
         'company': stock.company_name,
         'last_updated': stock.last_updated.isoformat(),
+        'stale': False,
+        **fx_fields(env_base, requested_base, latest),
     })
 
 
+@prices_bp.route('/cache', methods=['GET'])
+def quote_cache_stats():
+    """Return quote cache counters and coalesced provider requests."""
+    from src.services import market_data
+    return jsonify({**market_data._CACHE.stats(), "single_flight": market_data._flights.stats()})
+
+
+@prices_bp.route('/providers', methods=['GET'])
+def provider_state():
+    """Return circuit breaker state and health of each quote provider.
+
+    ``?symbol=`` adds what the router remembers about that symbol.
+    """
+    from src.services import market_data
+    symbol = request.args.get('symbol', '').upper() or None
+    return jsonify(market_data.router.state(symbol))
+
+
+@prices_bp.route('/http', methods=['GET'])
+def http_stats():
+    """Return request counts and latency per provider host."""
+    from src.lib import http_client
+    return jsonify(http_client.stats())
+
+
 @portfolio_bp.route('/prices/refresh', methods=['POST'])
 def refresh_prices():
-    """Refresh prices for all known tickers using AlphaVantage."""
-    symbols = [s.symbol for s in Stock.query.distinct(Stock.symbol)]
+    """Refresh prices for all known tickers using AlphaVantage.
+
+    Pass ``?report=1`` for per-symbol latency and errors.
+    """
     base_currency = os.environ.get('BASE_CURRENCY', BASE_CURRENCY)
-    updated = 0
-    failed = []
-    for symbol in symbols:
-        try:
-            price = fetch_quote(symbol)
-        except QuoteAPIError:
-            price = None
-        if price is None:
-            failed.append(symbol)
-            continue
-        stock = Stock.query.filter_by(symbol=symbol).first()
-        if stock and not stock.company_name:
-            from src.lib.market_data import get_company_name
-            stock.company_name = get_company_name(symbol)
-        stock.current_price = price
-        stock.last_updated = datetime.utcnow()
-        db.session.add(
-            PriceCache(
-                symbol=symbol,
-                price=price,
-                currency=CurrencyEnum[base_currency]
-            )
-        )
-        updated += 1
-    db.session.commit()
-    return jsonify({"updated": updated, "failed": failed})
+    report = refresh_quotes(base_currency, company_names=True)
+    if request.args.get('report'):
+        return jsonify(report.to_dict())
+    return jsonify({"updated": len(report.updated), "failed": report.failed})
 
 @portfolio_bp.route('/transactions', methods=['GET'])
 def get_transactions():
@@ -415,13 +427,11 @@ def add_transaction():
         # Get or create stock
         stock = Stock.query.filter_by(symbol=symbol).first()
         if not stock:
-            from src.lib.market_data import get_company_name
-            stock = Stock(symbol=symbol, company_name=get_company_name(symbol))
+            stock = Stock(symbol=symbol, company_name=symbol_metadata.cached_name(symbol))
             db.session.add(stock)
             db.session.flush()  # Get the ID
         elif not stock.company_name:
-            from src.lib.market_data import get_company_name
-            stock.company_name = get_company_name(symbol)
+            stock.company_name = symbol_metadata.cached_name(symbol)
         
         # Parse transaction date
         try:
@@ -457,11 +467,16 @@ def add_transaction():
             fee_currency=fee_currency,
             deal_amount=deal_amount,
             deal_currency=deal_currency,
+            lot_selection=data.get('lot_selection'),
             transaction_date=transaction_date
         )
         
         db.session.add(transaction)
+        db.session.flush()
+        positions.apply_transaction(transaction, base_currency)
         db.session.commit()
+        if not stock.company_name:
+            symbol_metadata.enrich([symbol])
 
         ensure_fx_rates(transaction_date, currency)
 
@@ -488,13 +503,13 @@ def update_transaction(transaction_id):
         data = request.get_json() or {}
 
         base_currency = os.environ.get('PORTFOLIO_BASE_CCY', PORTFOLIO_BASE_CCY)
+        previous_stock_id = transaction.stock_id
 
         if 'symbol' in data:
             symbol = data['symbol'].upper()
             stock = Stock.query.filter_by(symbol=symbol).first()
             if not stock:
-                from src.lib.market_data import get_company_name
-                stock = Stock(symbol=symbol, company_name=get_company_name(symbol))
+                stock = Stock(symbol=symbol, company_name=symbol_metadata.cached_name(symbol))
                 db.session.add(stock)
                 db.session.flush()
             transaction.stock_id = stock.id
@@ -535,6 +550,8 @@ def update_transaction(transaction_id):
         if 'deal_currency' in data:
             cur = data['deal_currency']
             transaction.deal_currency = cur.upper() if cur else None
+        if 'lot_selection' in data:
+            transaction.lot_selection = data['lot_selection']
 
         if 'currency' in data or 'transaction_date' in data:
             fx_rate = 1.0
@@ -554,7 +571,16 @@ def update_transaction(transaction_id):
             transaction.fx_rate = fx_rate
             transaction.fx_error = fx_error
 
+        if transaction.stock_id != previous_stock_id:
+            # The old stock's ledger still holds a lot for this trade.
+            lots.discard_transaction(transaction)
+        db.session.flush()
+        positions.refresh_stocks(
+            [previous_stock_id, transaction.stock_id], base_currency
+        )
         db.session.commit()
+        if not transaction.stock.company_name:
+            symbol_metadata.enrich([transaction.stock.symbol])
         return jsonify(transaction.to_dict())
 
     except Exception as e:
@@ -569,7 +595,12 @@ def delete_transaction(transaction_id):
         if not transaction:
             return jsonify({'error': 'Transaction not found'}), 404
         
+        stock_id = transaction.stock_id
+        lots.discard_transaction(transaction)
         db.session.delete(transaction)
+        db.session.flush()
+        base_currency = os.environ.get('PORTFOLIO_BASE_CCY', PORTFOLIO_BASE_CCY)
+        positions.refresh_stocks([stock_id], base_currency)
         db.session.commit()
         
         return jsonify({'message': 'Transaction deleted successfully'})
@@ -584,98 +615,25 @@ def get_portfolio_summary():
     try:
         env_base = os.environ.get('BASE_CURRENCY', BASE_CURRENCY)
         requested_base = request.args.get('base', env_base).upper()
-        rate = 1.0
-        if requested_base != env_base:
-            try:
-                resp = requests.get(
-                    "https://api.exchangerate.host/latest",
-                    params={"base": env_base, "symbols": requested_base},
-                    timeout=10,
-                )
-                rate = resp.json()["rates"][requested_base]
-            except Exception:
-                rate = 1.0
+        latest = display_rate(env_base, requested_base)
+        rate = latest.rate if latest else 1.0
 
-        stocks = Stock.query.all()
-        transactions = Transaction.query.order_by(Transaction.transaction_date).all()
         base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
         total_value = 0
         total_cost_basis = 0
         portfolio_stocks = []
         total_fees = 0.0
         contributions = 0.0
+        realized_gain = 0.0
 
-        def tx_fee_to_ccy(tx, ccy):
-            fee = float(tx.fee_amount or 0)
-            src = tx.fee_currency or tx.currency
-            if fee and src != ccy:
-                if ccy == base_currency:
-                    fee = to_base(fee, src, tx.transaction_date)
-                else:
-                    base_fee = to_base(fee, src, tx.transaction_date)
-                    try:
-                        rate = services_fx.get_rate(
-                            tx.transaction_date,
-                            ccy,
-                            base_currency,
-                        )
-                    except FxDownloadError as exc:
-                        raise BadGateway("FX rate unavailable") from exc
-                    fee = base_fee / rate
-            return fee
-
-        for tx in transactions:
-            fee_base = tx_fee_to_ccy(tx, base_currency)
-            trade_base = to_base(
-                tx.quantity * tx.price_per_share,
-                tx.currency,
-                tx.transaction_date,
-            )
-            total_fees += fee_base
-            if tx.transaction_type == 'buy':
-                contributions += trade_base + fee_base
-            else:
-                contributions -= trade_base - fee_base
-        
-        for stock in stocks:
-            # Calculate current holdings
-            buy_transactions = Transaction.query.filter_by(
-                stock_id=stock.id, 
-                transaction_type='buy'
-            ).all()
-            sell_transactions = Transaction.query.filter_by(
-                stock_id=stock.id, 
-                transaction_type='sell'
-            ).all()
-            
-            total_bought = sum(t.quantity for t in buy_transactions)
-            total_sold = sum(t.quantity for t in sell_transactions)
-            current_quantity = total_bought - total_sold
-            
+        for stock, position in load_positions(base_currency):
+            total_fees += position.fees
+            contributions += position.contributions
+            realized_gain += position.realized_gain
+
+            current_quantity = position.quantity
             if current_quantity > 0:  # Only include stocks we currently own
-                # Calculate cost basis for current holdings
-                remaining_quantity = current_quantity
-                cost_basis = 0
-                
-                # FIFO method for cost basis calculation
-                def trade_cost(tx):
-                    fee_ccy = tx_fee_to_ccy(tx, tx.currency)
-                    return tx.quantity * tx.price_per_share + fee_ccy
-
-                for transaction in sorted(buy_transactions, key=lambda x: x.transaction_date):
-                    if remaining_quantity <= 0:
-                        break
-
-                    shares_to_use = min(remaining_quantity, transaction.quantity)
-                    per_share = trade_cost(transaction) / transaction.quantity
-                    per_share_base = to_base(
-                        per_share,
-                        transaction.currency,
-                        transaction.transaction_date,
-                    )
-                    cost_basis += shares_to_use * per_share_base
-                    remaining_quantity -= shares_to_use
-                
+                cost_basis = position.cost_basis
                 current_value = current_quantity * (stock.current_price or 0)
                 total_value += current_value
                 total_cost_basis += cost_basis
@@ -686,17 +644,19 @@ def get_portfolio_summary():
                     'current_value': round(current_value * rate, 2),
                     'cost_basis': round(cost_basis * rate, 2)
                 })
-        
+
         total_gain = total_value - total_cost_basis
         total_gain_percent = (total_gain / total_cost_basis * 100) if total_cost_basis > 0 else 0
         net_gain_after_fees = total_value - contributions
 
         return jsonify({
-            'base_currency': requested_base,
+            'base_currency': display_currency(env_base, requested_base, latest),
+            **fx_fields(env_base, requested_base, latest),
             'total_value': round(total_value * rate, 2),
             'total_cost_basis': round(total_cost_basis * rate, 2),
             'total_gain': round(total_gain * rate, 2),
             'total_gain_percent': round(total_gain_percent, 2),
+            'total_realized_gain': round(realized_gain * rate, 2),
             'total_fees_paid': round(total_fees * rate, 2),
             'net_gain_after_fees': round(net_gain_after_fees * rate, 2),
             'stocks_count': len(portfolio_stocks),
@@ -720,8 +680,7 @@ def search_stock(symbol):
         if price is None:
             abort(404, description="symbol not found")
 
-        from src.lib.market_data import get_company_name
-        company = get_company_name(symbol)
+        company = symbol_metadata.lookup(symbol).name
         return jsonify({"symbol": symbol.upper(), "price": price, "company": company}), 200
 
     except QuoteAPIError as exc:
@@ -741,9 +700,13 @@ def get_portfolio_history():
         range_param = request.args.get('range')
         start_param = request.args.get('start') or request.args.get('from')
         end_param = request.args.get('end') or request.args.get('to')
+        points = request.args.get('points', type=int)
+        if points is not None and points < 2:
+            return jsonify({'error': 'points must be at least 2'}), 400
 
+        granularity = 'day'
         if range_param:
-            start_date, end_date, _ = parse_range(range_param)
+            start_date, end_date, granularity = parse_range(range_param)
         else:
             start_date = transactions[0].transaction_date
             if start_param:
@@ -758,66 +721,22 @@ def get_portfolio_history():
 
         base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
         stocks = {stock.id: stock for stock in Stock.query.all()}
+        preload_rates(transactions, base_currency)
 
-        history = []
-        holdings = {sid: 0 for sid in stocks}
-        contributions = 0.0
-
-        def tx_fee_to_ccy(tx, ccy):
-            fee = float(tx.fee_amount or 0)
-            src = tx.fee_currency or tx.currency
-            if fee and src != ccy:
-                if ccy == base_currency:
-                    fee = to_base(fee, src, tx.transaction_date)
-                else:
-                    base_fee = to_base(fee, src, tx.transaction_date)
-                    try:
-                        rate = services_fx.get_rate(
-                            tx.transaction_date,
-                            ccy,
-                            base_currency,
-                        )
-                    except FxDownloadError as exc:
-                        raise BadGateway("FX rate unavailable") from exc
-                    fee = base_fee / rate
-            return fee
-
-        idx = 0
-        current = start_date
-        while current <= end_date:
-            while idx < len(transactions) and transactions[idx].transaction_date <= current:
-                t = transactions[idx]
-                fee_base = tx_fee_to_ccy(t, base_currency)
-                trade_base = to_base(
-                    t.quantity * t.price_per_share,
-                    t.currency,
-                    t.transaction_date,
-                )
-                if t.transaction_type == 'buy':
-                    holdings[t.stock_id] = holdings.get(t.stock_id, 0) + t.quantity
-                    contributions += trade_base + fee_base
-                else:
-                    holdings[t.stock_id] = holdings.get(t.stock_id, 0) - t.quantity
-                    contributions -= trade_base - fee_base
-                idx += 1
-
-            market_value = 0.0
-            for sid, qty in holdings.items():
-                if qty:
-                    price = stocks[sid].current_price or 0
-                    market_value += qty * price
-
-            history.append({
-                'date': current.isoformat(),
-                'market_value_only': round(market_value - contributions, 2),
-                'with_contributions': round(market_value, 2)
-            })
-
-            current += timedelta(days=1)
+        traded = {t.stock_id for t in transactions}
+        closes = price_history.load_closes(
+            {stocks[sid].symbol for sid in traded}, start_date, end_date
+        )
+        days = sample_days(start_date, end_date, granularity)
+        frame = value_history(transactions, stocks, start_date, end_date, base_currency, closes, days)
+        if points:
+            frame = lttb(frame, points)
+        history = to_points(frame)
 
         last_updated = db.session.query(db.func.max(Stock.last_updated)).scalar()
         return jsonify({
             'history': history,
+            'granularity': granularity,
             'last_updated': last_updated.isoformat() if last_updated else None
         })
 
@@ -1,41 +1,136 @@
 from __future__ import annotations
 
-import time
 from datetime import date as date_cls
-from typing import Dict
+from typing import Dict, Iterable, Optional, Set, Tuple
 
-import requests
-from flask import current_app
+from sqlalchemy import or_
+from flask import current_app, g, has_app_context, has_request_context
 
 from src.models.portfolio import ExchangeRate, CurrencyEnum
 from src.models.user import db
-from src.lib.fx import validate_currency_code, FxDownloadError, get_fx_rate
+from src.lib.fx import (
+    FxDownloadError,
+    as_of_rate,
+    get_fx_rate,
+    is_business_day,
+    previous_business_day,
+    upsert_rates,
+    validate_currency_code,
+)
+from src.lib import fx_cache, http_client
+from src.lib.single_flight import SingleFlight
 from src import settings
 
 SUPPORTED_CCY = [c.name for c in CurrencyEnum]
 
+RateKey = Tuple[str, str, date_cls]
+
+# ``source`` prefix of rows computed from other stored rates.
+DERIVED_PREFIX = "derived:"
+
+# Provider downloads in flight, keyed by (base, date).
+_flights = SingleFlight()
+
+
+class RateMatrix:
+    """In-memory ``(base, quote, date) -> rate`` table.
+
+    Valuation code collects every pair it needs up front and loads them with
+    a single query; :func:`get_rate` then resolves conversions from memory
+    and only falls back to the database or the provider on a miss.
+    """
+
+    def __init__(self) -> None:
+        self._rates: Dict[RateKey, float] = {}
+
+    def __contains__(self, key: RateKey) -> bool:
+        return key in self._rates
+
+    def __len__(self) -> int:
+        return len(self._rates)
+
+    def lookup(self, dt: date_cls, base: str, quote: str) -> Optional[float]:
+        return self._rates.get((base, quote, dt))
+
+    def add(self, dt: date_cls, base: str, quote: str, rate: float) -> None:
+        self._rates[(base, quote, dt)] = rate
+
+    def missing(self, keys: Iterable[RateKey]) -> Set[RateKey]:
+        return {k for k in keys if k[0] != k[1] and k not in self._rates}
+
+    def load(self, keys: Iterable[RateKey]) -> "RateMatrix":
+        """Load rates for ``keys`` not held yet with one range query."""
+        cached, wanted = fx_cache.lookup_many(self.missing(keys))
+        self._rates.update(cached)
+        if not wanted:
+            return self
+        dates = [dt for _, _, dt in wanted]
+        rows = (
+            db.session.query(
+                ExchangeRate.base, ExchangeRate.quote, ExchangeRate.date, ExchangeRate.rate
+            )
+            .filter(
+                ExchangeRate.base.in_({b for b, _, _ in wanted}),
+                ExchangeRate.quote.in_({q for _, q, _ in wanted}),
+                ExchangeRate.date.between(min(dates), max(dates)),
+            )
+            .all()
+        )
+        for base, quote, dt, rate in rows:
+            self._rates[(base, quote, dt)] = rate
+            fx_cache.cache.put((base, quote, dt), rate)
+        for base, quote, dt in self.missing(wanted):
+            rate = as_of_rate(base, quote, dt)
+            if rate is not None:
+                self._rates[(base, quote, dt)] = rate
+        return self
+
+
+def current_matrix() -> Optional[RateMatrix]:
+    """Return the rate matrix of the active app context, if any."""
+    if not has_app_context():
+        return None
+    return g.get("fx_rates")
+
+
+def preload_rates(keys: Iterable[RateKey]) -> RateMatrix:
+    """Load ``keys`` into the app-context rate matrix and return it."""
+    matrix = current_matrix()
+    if matrix is None:
+        matrix = RateMatrix()
+        g.fx_rates = matrix
+    return matrix.load(keys)
+
 
 def _fetch_rates(dt: date_cls, base: str) -> Dict[str, float]:
+    """Download all ``base`` rates for ``dt``.
+
+    Concurrent calls for the same ``(base, dt)`` share one download.
+    """
+    return _flights.do((base, dt), _download_rates, dt, base)
+
+
+def _download_rates(dt: date_cls, base: str) -> Dict[str, float]:
+    """Download the rates from the provider.
+
+    Inside a request a failed download is not retried, so a conversion never
+    sleeps through retry backoff; background refreshes keep the retries.
+    """
     url = f"{settings.FX_PROVIDER_URL.rstrip('/')}/{dt.isoformat()}"
     params = {"base": base}
     if settings.FX_API_KEY:
         params["apikey"] = settings.FX_API_KEY
-    delay = 1.0
-    last_exc: Exception | None = None
-    for _ in range(3):
-        try:
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            if "rates" not in data:
-                raise ValueError("missing rates")
-            return {k.upper(): float(v) for k, v in data["rates"].items()}
-        except Exception as exc:  # noqa: BLE001
-            last_exc = exc
-            current_app.logger.warning("FX fetch failed: %s", exc)
-            time.sleep(delay)
-            delay *= 2
-    raise FxDownloadError(str(last_exc) if last_exc else "unknown error")
+    retries = 0 if has_request_context() else None
+    try:
+        resp = http_client.get(url, params=params, retries=retries)
+        resp.raise_for_status()
+        data = resp.json()
+        if "rates" not in data:
+            raise ValueError("missing rates")
+        return {k.upper(): float(v) for k, v in data["rates"].items()}
+    except Exception as exc:  # noqa: BLE001
+        current_app.logger.warning("FX fetch failed: %s", exc)
+        raise FxDownloadError(str(exc)) from exc
 
 
 def get_rate(date: date_cls | str, base_ccy: str, quote_ccy: str) -> float:
@@ -46,10 +141,92 @@ def get_rate(date: date_cls | str, base_ccy: str, quote_ccy: str) -> float:
     if base == quote:
         return 1.0
 
-    rec = ExchangeRate.query.filter_by(base=base, quote=quote, date=dt).first()
-    if rec:
-        return rec.rate
+    matrix = current_matrix()
+    if matrix is not None:
+        hit = matrix.lookup(dt, base, quote)
+        if hit is not None:
+            return hit
+
+    rate = _get_rate_uncached(dt, base, quote)
+    if matrix is not None:
+        matrix.add(dt, base, quote, rate)
+    return rate
+
+
+def derive_rate(dt: date_cls, base: str, quote: str) -> Optional[Tuple[float, str]]:
+    """Compute ``base``/``quote`` on ``dt`` from other stored rates.
+
+    Tries the inverse pair, then a cross through any pivot currency quoted
+    against both legs that day. Returns ``(rate, source)`` or ``None``.
+    """
+    rows = (
+        db.session.query(ExchangeRate.base, ExchangeRate.quote, ExchangeRate.rate)
+        .filter(
+            ExchangeRate.date == dt,
+            or_(ExchangeRate.base.in_((base, quote)), ExchangeRate.quote.in_((base, quote))),
+        )
+        .all()
+    )
+    direct = {(b, q): r for b, q, r in rows if r}
+    if (quote, base) in direct:
+        return 1 / direct[(quote, base)], DERIVED_PREFIX + "inverse"
+
+    def leg(src: str, dst: str) -> Optional[float]:
+        if (src, dst) in direct:
+            return direct[(src, dst)]
+        if (dst, src) in direct:
+            return 1 / direct[(dst, src)]
+        return None
+
+    pivots = sorted({ccy for pair in direct for ccy in pair} - {base, quote})
+    for pivot in pivots:
+        first = leg(base, pivot)
+        second = leg(pivot, quote)
+        if first is not None and second is not None:
+            return first * second, f"{DERIVED_PREFIX}cross:{pivot}"
+    return None
+
 
+def drop_derived(dt: date_cls) -> None:
+    """Delete rates derived for ``dt`` after one of their inputs changed."""
+    deleted = ExchangeRate.query.filter(
+        ExchangeRate.date == dt, ExchangeRate.source.startswith(DERIVED_PREFIX)
+    ).delete(synchronize_session=False)
+    if deleted:
+        fx_cache.cache.clear()
+        fx_cache.bump_version()
+
+
+def _get_rate_uncached(dt: date_cls, base: str, quote: str) -> float:
+    cached = fx_cache.lookup(base, quote, dt)
+    if cached is not None:
+        return cached
+
+    derived = derive_rate(dt, base, quote)
+    if derived is not None:
+        rate, source = derived
+        upsert_rates([{"base": base, "quote": quote, "date": dt, "rate": rate, "source": source}])
+        db.session.commit()
+        return rate
+
+    rate = as_of_rate(base, quote, dt)
+    if rate is not None:
+        return rate
+    if not is_business_day(dt):
+        # No rate is published for weekends; use the preceding trading day,
+        # downloading it if nothing recent is stored.
+        return _get_rate_uncached(previous_business_day(dt), base, quote)
+
+    try:
+        return _download_rate(dt, base, quote)
+    except FxDownloadError:
+        rate = as_of_rate(base, quote, dt, force=True)
+        if rate is None:
+            raise
+        return rate
+
+
+def _download_rate(dt: date_cls, base: str, quote: str) -> float:
     # Allow overriding via routes for testing
     try:
         from importlib import import_module
@@ -60,25 +237,18 @@ def get_rate(date: date_cls | str, base_ccy: str, quote_ccy: str) -> float:
     try:
         rate = custom_getter(base, quote, dt)
         if rate is not None:
-            row = ExchangeRate.query.filter_by(base=base, quote=quote, date=dt).first()
-            if row:
-                row.rate = rate
-            else:
-                db.session.add(ExchangeRate(base=base, quote=quote, date=dt, rate=rate))
+            upsert_rates([{"base": base, "quote": quote, "date": dt, "rate": rate}])
             db.session.commit()
             return rate
     except FxDownloadError:
         pass
 
     rates = _fetch_rates(dt, base)
-    for tgt, rate in rates.items():
-        if tgt not in SUPPORTED_CCY:
-            continue
-        row = ExchangeRate.query.filter_by(base=base, quote=tgt, date=dt).first()
-        if row:
-            row.rate = rate
-        else:
-            db.session.add(ExchangeRate(base=base, quote=tgt, date=dt, rate=rate))
+    upsert_rates(
+        {"base": base, "quote": tgt, "date": dt, "rate": rate}
+        for tgt, rate in rates.items()
+        if tgt in SUPPORTED_CCY
+    )
     db.session.commit()
 
     if quote not in rates:
@@ -0,0 +1,190 @@
+"""Backfill historical FX rates for a currency pair over a date range.
+
+Adding a backdated trade needs a rate for every day since the trade date.
+Instead of probing ``exchange_rates`` one day at a time, :func:`backfill`
+finds the gaps with a single query, downloads the missing span as one
+time series from ``FX_PROVIDER_URL`` and bulk-upserts the new rows.
+
+:func:`schedule` runs the backfill on a background thread so the request
+that triggered it returns immediately. ``FX_BACKFILL`` (setting or app
+config) selects ``async`` (default), ``sync`` or ``off``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_cls, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import tuple_
+
+from src import settings
+from src.lib import fx_cache, http_client
+from src.lib.fx import FxDownloadError, is_business_day, upsert_rates, validate_currency_code
+from src.models.portfolio import ExchangeRate
+from src.models.user import db
+
+# exchangerate.host limits time-series requests to 365 days.
+MAX_SPAN_DAYS = 365
+
+Pair = Tuple[str, str]
+
+
+def missing_by_pair(
+    pairs: Iterable[Pair], start: date_cls, end: date_cls, business_days: bool = False
+) -> Dict[Pair, List[date_cls]]:
+    """Return the days in ``start..end`` without a stored rate, per pair.
+
+    All pairs are checked with a single query. With ``business_days`` only
+    weekdays are reported, since providers publish nothing on weekends.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    stored: Dict[Pair, Set[date_cls]] = {pair: set() for pair in pairs}
+    if pairs:
+        rows = db.session.query(ExchangeRate.base, ExchangeRate.quote, ExchangeRate.date).filter(
+            tuple_(ExchangeRate.base, ExchangeRate.quote).in_(pairs),
+            ExchangeRate.date.between(start, end),
+        )
+        for base, quote, dt in rows:
+            stored[(base, quote)].add(dt)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    if business_days:
+        days = [dt for dt in days if is_business_day(dt)]
+    return {pair: [dt for dt in days if dt not in have] for pair, have in stored.items()}
+
+
+def missing_dates(
+    base: str, quote: str, start: date_cls, end: date_cls, business_days: bool = False
+) -> List[date_cls]:
+    """Return the days in ``start..end`` without a stored ``base/quote`` rate."""
+    return missing_by_pair([(base, quote)], start, end, business_days)[(base, quote)]
+
+
+def windows(dates: List[date_cls], span: int = MAX_SPAN_DAYS) -> List[Tuple[date_cls, date_cls]]:
+    """Group sorted ``dates`` into ``(start, end)`` ranges of at most ``span`` days."""
+    result: List[Tuple[date_cls, date_cls]] = []
+    for dt in dates:
+        if result and (dt - result[-1][0]).days < span:
+            result[-1] = (result[-1][0], dt)
+        else:
+            result.append((dt, dt))
+    return result
+
+
+def fetch_series(base: str, quote: str, start: date_cls, end: date_cls) -> Dict[date_cls, float]:
+    """Download daily ``base/quote`` rates for ``start..end``."""
+    url = f"{settings.FX_PROVIDER_URL.rstrip('/')}/timeseries"
+    series: Dict[date_cls, float] = {}
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=MAX_SPAN_DAYS - 1), end)
+        params = {
+            "base": base,
+            "symbols": quote,
+            "start_date": chunk_start.isoformat(),
+            "end_date": chunk_end.isoformat(),
+        }
+        if settings.FX_API_KEY:
+            params["apikey"] = settings.FX_API_KEY
+        try:
+            resp = http_client.get(url, params=params, timeout=30)
+            resp.raise_for_status()
+            rates = resp.json()["rates"]
+        except Exception as exc:  # noqa: BLE001
+            raise FxDownloadError(str(exc)) from exc
+        for day, values in rates.items():
+            rate = (values or {}).get(quote)
+            if rate is not None:
+                series[date_cls.fromisoformat(day)] = float(rate)
+        chunk_start = chunk_end + timedelta(days=1)
+    return series
+
+
+def backfill(base: str, quote: str, start: date_cls, end: Optional[date_cls] = None) -> int:
+    """Store every missing ``base/quote`` rate from ``start`` to ``end``.
+
+    Returns the number of rows inserted.
+    """
+    base = validate_currency_code(base)
+    quote = validate_currency_code(quote)
+    end = end or date_cls.today()
+    if base == quote or start > end:
+        return 0
+
+    # Weekends never get a rate, and holidays inside a range downloaded
+    # earlier are known gaps; neither should trigger another download.
+    index = fx_cache.series(base, quote)
+    gaps = [
+        dt for dt in missing_dates(base, quote, start, end, business_days=True)
+        if not index.covers(dt)
+    ]
+    if not gaps:
+        return 0
+    series = fetch_series(base, quote, gaps[0], gaps[-1])
+    rows = [
+        {"base": base, "quote": quote, "date": dt, "rate": series[dt]}
+        for dt in gaps
+        if dt in series
+    ]
+    if rows:
+        upsert_rates(rows)
+        db.session.commit()
+    fx_cache.cover(base, quote, series)
+    return len(rows)
+
+
+class BackfillQueue:
+    """Single worker thread running backfills outside the request."""
+
+    def __init__(self) -> None:
+        self._pending: Set[Pair] = set()
+        self._starts: Dict[Pair, date_cls] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fx-backfill")
+
+    def submit(self, base: str, quote: str, start: date_cls) -> None:
+        key = (base, quote)
+        with self._lock:
+            earliest = self._starts.get(key)
+            self._starts[key] = min(start, earliest) if earliest else start
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        app = current_app._get_current_object()
+        self._executor.submit(self._run, app, key)
+
+    def _run(self, app, key: Pair) -> None:
+        with self._lock:
+            start = self._starts.pop(key)
+            self._pending.discard(key)
+        began = time.monotonic()
+        try:
+            with app.app_context():
+                count = backfill(*key, start)
+                app.logger.info(
+                    "FX backfill %s/%s from %s: %d rows in %.1fs",
+                    *key, start, count, time.monotonic() - began,
+                )
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning("FX backfill failed for %s/%s: %s", *key, exc)
+
+
+queue = BackfillQueue()
+
+
+def schedule(base: str, quote: str, start: date_cls) -> None:
+    """Backfill ``base/quote`` from ``start`` according to ``FX_BACKFILL``."""
+    mode = current_app.config.get("FX_BACKFILL", settings.FX_BACKFILL)
+    if mode == "off":
+        return
+    base = validate_currency_code(base)
+    quote = validate_currency_code(quote)
+    if base == quote:
+        return
+    if mode == "sync":
+        backfill(base, quote, start)
+    else:
+        queue.submit(base, quote, start)
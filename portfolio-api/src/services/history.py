@@ -0,0 +1,204 @@
+"""Portfolio value history computed over a date index.
+
+Instead of replaying the transactions day by day, :func:`value_history`
+scatters every trade into a days × stocks matrix of quantity deltas and a
+vector of contribution deltas, takes cumulative sums down the date axis and
+values each day as the row-wise dot product of the holdings matrix with a
+days × stocks matrix of as-of closes. Trade values and fees are converted
+to the base currency with one rate per distinct currency and date. The
+Python work is proportional to the number of transactions and symbols; the
+number of days only affects NumPy operations.
+
+Long ranges are evaluated only on the last day of each week or month
+(:func:`sample_days`), and :func:`lttb` reduces a history to a target
+number of points while keeping its peaks and troughs.
+"""
+
+from __future__ import annotations
+
+from datetime import date as date_cls
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models.portfolio import Stock, Transaction
+from src.lib.fx import to_base
+from src.services.price_history import CloseSeries
+
+# Ordinal of 1970-01-01, to turn date ordinals into datetime64 days.
+_EPOCH = date_cls(1970, 1, 1).toordinal()
+
+# pandas period-end frequencies of the ``parse_range`` granularities; other
+# granularities (``day``, and ``hour`` for which only daily closes exist)
+# keep every day.
+_PERIOD_ENDS = {'week': 'W-SUN', 'month': 'ME'}
+
+
+def sample_days(start: date_cls, end: date_cls, granularity: str = 'day') -> np.ndarray:
+    """Return the ordinals of the days ``granularity`` keeps in ``start..end``.
+
+    Weeks and months are represented by their last day; the final, partial
+    period by ``end``.
+    """
+    freq = _PERIOD_ENDS.get(granularity)
+    if freq is None:
+        return np.arange(start.toordinal(), end.toordinal() + 1)
+    ends = [ts.toordinal() for ts in pd.date_range(start, end, freq=freq)]
+    if not ends or ends[-1] != end.toordinal():
+        ends.append(end.toordinal())
+    return np.asarray(ends, dtype=np.int64)
+
+
+def price_matrix(
+    days: np.ndarray, stocks: List[Stock], closes: Mapping[str, CloseSeries]
+) -> np.ndarray:
+    """Return a days × stocks matrix of the close on or before each day.
+
+    ``days`` are proleptic ordinals (``date.toordinal()``). Days before a
+    symbol's first close take the first close; symbols without stored
+    closes use their current price throughout.
+    """
+    prices = np.zeros((len(days), len(stocks)))
+    for col, stock in enumerate(stocks):
+        series = closes.get(stock.symbol)
+        if series is None or not series.dates:
+            prices[:, col] = stock.current_price or 0.0
+            continue
+        dates = np.fromiter((d.toordinal() for d in series.dates), dtype=np.int64,
+                            count=len(series.dates))
+        idx = np.searchsorted(dates, days, side="right") - 1
+        prices[:, col] = np.asarray(series.closes, dtype=float)[np.maximum(idx, 0)]
+    return prices
+
+
+def value_history(
+    transactions: Iterable[Transaction],
+    stocks: Mapping[int, Stock],
+    start: date_cls,
+    end: date_cls,
+    base_currency: str,
+    closes: Mapping[str, CloseSeries],
+    days: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Return the ``with_contributions`` and ``market_value_only`` values.
+
+    The frame is indexed by ``days`` (sorted ordinals inside
+    ``start..end``, see :func:`sample_days`), by default every calendar
+    day of the range. Each day includes the transactions up to and
+    including it; later ones are ignored. FX rates of the transactions
+    should be preloaded.
+    """
+    if days is None:
+        days = sample_days(start, end)
+    columns: List[Stock] = list(stocks.values())
+    column_of: Dict[int, int] = {sid: col for col, sid in enumerate(stocks)}
+
+    traded: List[int] = []
+    cols: List[int] = []
+    signs: List[float] = []
+    quantities: List[float] = []
+    prices: List[float] = []
+    fees: List[float] = []
+    trade_rates: List[int] = []
+    fee_rates: List[int] = []
+    # Distinct (currency, date) pairs, converted once each below.
+    rate_index: Dict[tuple, int] = {}
+    for t in transactions:
+        day = t.transaction_date
+        if day > end:
+            continue
+        currency = t.currency
+        fee = float(t.fee_amount or 0)
+        traded.append(day.toordinal())
+        cols.append(column_of[t.stock_id])
+        signs.append(1.0 if t.transaction_type == 'buy' else -1.0)
+        quantities.append(t.quantity)
+        prices.append(t.price_per_share)
+        fees.append(fee)
+        trade_rates.append(rate_index.setdefault((currency, day), len(rate_index)))
+        fee_key = (t.fee_currency or currency, day) if fee else (currency, day)
+        fee_rates.append(rate_index.setdefault(fee_key, len(rate_index)))
+
+    rates = np.array([
+        1.0 if currency == base_currency else to_base(1.0, currency, day)
+        for currency, day in rate_index
+    ])
+    signs = np.asarray(signs)
+    trade_base = np.asarray(quantities, dtype=float) * np.asarray(prices, dtype=float)
+    trade_base *= rates[np.asarray(trade_rates, dtype=np.int64)]
+    fee_base = np.asarray(fees) * rates[np.asarray(fee_rates, dtype=np.int64)]
+    # Buys add value plus fee, sells withdraw value minus fee.
+    contributions = signs * trade_base + fee_base
+    quantities = signs * np.asarray(quantities, dtype=float)
+
+    # Each trade lands on the first evaluated day on or after it.
+    rows = np.searchsorted(days, np.asarray(traded, dtype=np.int64), side="left")
+    keep = rows < len(days)
+    rows = rows[keep]
+    cols = np.asarray(cols, dtype=np.int64)[keep]
+    quantities = quantities[keep]
+    contributions = contributions[keep]
+
+    holdings = np.zeros((len(days), len(columns)))
+    np.add.at(holdings, (rows, cols), quantities)
+    np.cumsum(holdings, axis=0, out=holdings)
+    invested = np.zeros(len(days))
+    np.add.at(invested, rows, contributions)
+    np.cumsum(invested, out=invested)
+
+    market_value = np.einsum("ij,ij->i", holdings, price_matrix(days, columns, closes))
+    return pd.DataFrame(
+        {
+            "market_value_only": market_value - invested,
+            "with_contributions": market_value,
+        },
+        index=pd.DatetimeIndex((days - _EPOCH).astype("datetime64[D]"), name="date"),
+    )
+
+
+def lttb(frame: pd.DataFrame, points: int, column: str = "with_contributions") -> pd.DataFrame:
+    """Downsample ``frame`` to ``points`` rows with Largest-Triangle-Three-Buckets.
+
+    The first and last rows are kept. The rows in between are split into
+    ``points - 2`` buckets, and each bucket keeps the row of ``column`` that
+    forms the largest triangle with the previously kept row and the mean of
+    the next bucket. That row is usually the bucket's extreme, so spikes and
+    drops survive. Frames with at most ``points`` rows are returned as is.
+    """
+    n = len(frame)
+    if points >= n:
+        return frame
+    if points <= 2:
+        return frame.iloc[[0, n - 1]]
+    y = frame[column].to_numpy(dtype=float)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected.append(a)
+    selected.append(n - 1)
+    return frame.iloc[selected]
+
+
+def to_points(frame: pd.DataFrame) -> List[dict]:
+    """Serialize a :func:`value_history` frame for the ``/history`` response."""
+    values = frame.round(2)
+    return [
+        {'date': day, 'market_value_only': only, 'with_contributions': total}
+        for day, only, total in zip(
+            values.index.strftime('%Y-%m-%d'),
+            values['market_value_only'].tolist(),
+            values['with_contributions'].tolist(),
+        )
+    ]
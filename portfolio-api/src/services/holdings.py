@@ -0,0 +1,154 @@
+"""Aggregate transactions into per-stock holdings.
+
+All transactions are loaded with a single query and grouped in memory so the
+number of database round trips does not grow with the number of stocks.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, Iterable, List, Set
+
+from werkzeug.exceptions import BadGateway
+
+from src.models.portfolio import Stock, Transaction
+from src.lib.fx import FxDownloadError, to_base
+from src.services import fx as services_fx
+
+
+def fee_to_ccy(tx: Transaction, ccy: str, base_currency: str) -> float:
+    """Return the fee of ``tx`` expressed in ``ccy``."""
+    fee = float(tx.fee_amount or 0)
+    src = tx.fee_currency or tx.currency
+    if fee and src != ccy:
+        base_fee = to_base(fee, src, tx.transaction_date)
+        if ccy == base_currency:
+            return base_fee
+        try:
+            rate = services_fx.get_rate(tx.transaction_date, ccy, base_currency)
+        except FxDownloadError as exc:
+            raise BadGateway("FX rate unavailable") from exc
+        fee = base_fee / rate
+    return fee
+
+
+def rate_keys(transactions: Iterable[Transaction], base_currency: str) -> Set[services_fx.RateKey]:
+    """Return every ``(currency, base, date)`` rate needed to value ``transactions``."""
+    keys = set()
+    for tx in transactions:
+        keys.add((tx.currency, base_currency, tx.transaction_date))
+        if tx.fee_amount and tx.fee_currency:
+            keys.add((tx.fee_currency, base_currency, tx.transaction_date))
+    return {k for k in keys if k[0] != base_currency}
+
+
+def preload_rates(transactions: Iterable[Transaction], base_currency: str) -> services_fx.RateMatrix:
+    """Load every rate needed to value ``transactions`` with one query."""
+    return services_fx.preload_rates(rate_keys(transactions, base_currency))
+
+
+def trade_cost(tx: Transaction, base_currency: str) -> float:
+    """Return the cost of ``tx`` including fees in the trade currency."""
+    return tx.quantity * tx.price_per_share + fee_to_ccy(tx, tx.currency, base_currency)
+
+
+def trade_value_base(tx: Transaction) -> float:
+    """Return the gross value of ``tx`` in the base currency."""
+    return to_base(tx.quantity * tx.price_per_share, tx.currency, tx.transaction_date)
+
+
+@dataclass
+class Holding:
+    """Transactions and derived figures for a single stock.
+
+    Money values are expressed in ``base_currency`` unless the attribute name
+    says otherwise. Figures that need FX conversion are computed on first
+    access so closed positions never trigger rate lookups.
+    """
+
+    stock: Stock
+    base_currency: str
+    buys: List[Transaction] = field(default_factory=list)
+    sells: List[Transaction] = field(default_factory=list)
+
+    @property
+    def transactions(self) -> List[Transaction]:
+        return self.buys + self.sells
+
+    @property
+    def total_bought(self) -> int:
+        return sum(t.quantity for t in self.buys)
+
+    @property
+    def total_sold(self) -> int:
+        return sum(t.quantity for t in self.sells)
+
+    @property
+    def quantity(self) -> int:
+        return self.total_bought - self.total_sold
+
+    @property
+    def transaction_currency(self) -> str:
+        """Currency of the first buy, or the base currency without buys."""
+        return self.buys[0].currency if self.buys else self.base_currency
+
+    @cached_property
+    def total_cost(self) -> float:
+        """Cost of all buys including fees."""
+        return sum(
+            trade_value_base(t) + fee_to_ccy(t, self.base_currency, self.base_currency)
+            for t in self.buys
+        )
+
+    @cached_property
+    def total_cost_orig(self) -> float:
+        """Cost of buys made in :attr:`transaction_currency`, in that currency."""
+        ccy = self.transaction_currency
+        return sum(
+            trade_cost(t, self.base_currency) for t in self.buys if t.currency == ccy
+        )
+
+    @cached_property
+    def fees(self) -> float:
+        return sum(
+            fee_to_ccy(t, self.base_currency, self.base_currency)
+            for t in self.transactions
+        )
+
+    @cached_property
+    def contributions(self) -> float:
+        """Net cash put into the stock: buys plus fees less sale proceeds."""
+        total = 0.0
+        for tx in self.transactions:
+            fee_base = fee_to_ccy(tx, self.base_currency, self.base_currency)
+            value = trade_value_base(tx)
+            if tx.transaction_type == 'buy':
+                total += value + fee_base
+            else:
+                total -= value - fee_base
+        return total
+
+
+def load_holdings(base_currency: str) -> List[Holding]:
+    """Return a :class:`Holding` for every stock.
+
+    Runs one query for stocks and one for transactions regardless of how many
+    stocks the portfolio contains.
+    """
+    stocks = Stock.query.order_by(Stock.id).all()
+    holdings: Dict[int, Holding] = {
+        stock.id: Holding(stock=stock, base_currency=base_currency) for stock in stocks
+    }
+    transactions = Transaction.query.order_by(
+        Transaction.transaction_date, Transaction.id
+    ).all()
+    for tx in transactions:
+        holding = holdings.get(tx.stock_id)
+        if holding is None:
+            continue
+        if tx.transaction_type == 'buy':
+            holding.buys.append(tx)
+        else:
+            holding.sells.append(tx)
+    return list(holdings.values())
@@ -0,0 +1,131 @@
+"""Latest FX rates for display-currency conversion.
+
+Endpoints that accept ``?base=`` convert figures with the most recent rate
+stored in ``exchange_rates``. Rates are held in memory and refreshed in a
+background thread once they are older than ``LATEST_FX_TTL`` seconds, so the
+request path never waits on the FX provider.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date as date_cls
+from typing import Dict, Optional, Set, Tuple
+
+from flask import current_app
+
+from src import settings
+from src.lib import av_quota
+from src.models.portfolio import ExchangeRate
+from src.lib.fx import FxDownloadError, validate_currency_code
+
+Pair = Tuple[str, str]
+
+# Seconds to wait before retrying a refresh that failed.
+_RETRY_AFTER = 60
+
+
+@dataclass(frozen=True)
+class LatestRate:
+    rate: float
+    as_of: Optional[date_cls]
+    checked_at: float
+
+    @property
+    def age_days(self) -> Optional[int]:
+        if self.as_of is None:
+            return None
+        return (date_cls.today() - self.as_of).days
+
+
+def _load(base: str, quote: str) -> Optional[LatestRate]:
+    """Return the newest stored rate for ``base``/``quote`` or its inverse."""
+    now = time.time()
+    direct = (
+        ExchangeRate.query.filter_by(base=base, quote=quote)
+        .order_by(ExchangeRate.date.desc())
+        .first()
+    )
+    inverse = (
+        ExchangeRate.query.filter_by(base=quote, quote=base)
+        .order_by(ExchangeRate.date.desc())
+        .first()
+    )
+    if inverse is not None and inverse.rate and (direct is None or inverse.date > direct.date):
+        return LatestRate(1 / inverse.rate, inverse.date, now)
+    if direct is not None:
+        return LatestRate(direct.rate, direct.date, now)
+    return None
+
+
+class LatestRateService:
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._rates: Dict[Pair, LatestRate] = {}
+        self._pending: Set[Pair] = set()
+        self._retry_at: Dict[Pair, float] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="latest-fx")
+
+    def get(self, base: str, quote: str) -> Optional[LatestRate]:
+        """Return the cached latest rate, scheduling a refresh when stale.
+
+        Returns ``None`` when no rate has been stored for the pair yet.
+        """
+        base = validate_currency_code(base)
+        quote = validate_currency_code(quote)
+        if base == quote:
+            return LatestRate(1.0, date_cls.today(), time.time())
+
+        key = (base, quote)
+        entry = self._rates.get(key)
+        if entry is None:
+            entry = _load(base, quote)
+            if entry is not None:
+                self._rates[key] = entry
+        now = time.time()
+        if (entry is None or now - entry.checked_at > self.ttl) and now >= self._retry_at.get(key, 0):
+            self._schedule(key)
+        return entry
+
+    def _schedule(self, key: Pair) -> None:
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        app = current_app._get_current_object()
+        self._executor.submit(self._refresh_in_app, app, key)
+
+    def _refresh_in_app(self, app, key: Pair) -> None:
+        try:
+            with app.app_context(), av_quota.background():
+                self.refresh(*key)
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning("latest FX refresh failed for %s/%s: %s", *key, exc)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._retry_at[key] = time.time() + min(self.ttl, _RETRY_AFTER)
+
+    def refresh(self, base: str, quote: str) -> Optional[LatestRate]:
+        """Download today's rates for ``base`` and update the cache."""
+        from src.services import fx as services_fx
+
+        try:
+            services_fx.get_rate(date_cls.today(), base, quote)
+        except FxDownloadError:
+            pass
+        entry = _load(base, quote)
+        if entry is not None:
+            self._rates[(base, quote)] = entry
+        return entry
+
+    def clear(self) -> None:
+        self._rates.clear()
+        self._retry_at.clear()
+
+
+latest_rates = LatestRateService(settings.LATEST_FX_TTL)
@@ -0,0 +1,200 @@
+"""Lot ledger: buy lots consumed by sells at write time.
+
+Every buy opens a :class:`Lot`. Every sell consumes open lots according to
+the configured cost-basis method and records a :class:`LotMatch` per lot
+touched, so realized gains are fixed when the trade is written. Cost basis
+and unrealized gains are then read from the remaining quantity of the open
+lots.
+
+Methods:
+
+``fifo``
+    consume the oldest lots first.
+``lifo``
+    consume the newest lots first.
+``average``
+    consume every open lot proportionally, which values the sold shares at
+    the average cost of the position.
+``specific``
+    consume the lots listed in the sell's ``lot_selection``; any quantity
+    not covered by the selection falls back to FIFO.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, List
+
+from sqlalchemy import and_, or_
+
+from src.config import COST_BASIS_METHOD
+from src.models.user import db
+from src.models.portfolio import Lot, LotMatch, Position, Transaction
+from src.services.holdings import fee_to_ccy, trade_cost, trade_value_base
+
+METHODS = ("fifo", "lifo", "average", "specific")
+
+# Quantities below this are treated as fully consumed (average method
+# leaves fractional remainders).
+_EPSILON = 1e-9
+
+
+class UnsupportedCostBasisMethod(ValueError):
+    pass
+
+
+def current_method() -> str:
+    """Return the configured cost-basis method."""
+    method = os.environ.get("COST_BASIS_METHOD", COST_BASIS_METHOD).lower()
+    if method not in METHODS:
+        raise UnsupportedCostBasisMethod(method)
+    return method
+
+
+def _sort_key(lot: Lot):
+    return (lot.acquired_on, lot.transaction_id)
+
+
+def _open_lot(tx: Transaction, base_currency: str) -> Lot:
+    fee_base = fee_to_ccy(tx, base_currency, base_currency)
+    cost = trade_value_base(tx) + fee_base
+    return Lot(
+        stock_id=tx.stock_id,
+        transaction_id=tx.id,
+        acquired_on=tx.transaction_date,
+        quantity=tx.quantity,
+        remaining=float(tx.quantity),
+        unit_cost=cost / tx.quantity if tx.quantity else 0.0,
+        unit_cost_orig=trade_cost(tx, base_currency) / tx.quantity if tx.quantity else 0.0,
+        currency=tx.currency,
+    )
+
+
+def _allocate(tx: Transaction, lots: List[Lot], method: str) -> Dict[int, float]:
+    """Return ``{index into lots: quantity}`` consumed by the sell ``tx``."""
+    wanted = float(tx.quantity)
+    available = sum(lot.remaining for lot in lots)
+    allocation: Dict[int, float] = {}
+
+    if method == "average":
+        if available <= 0:
+            return allocation
+        fraction = min(wanted / available, 1.0)
+        return {i: lot.remaining * fraction for i, lot in enumerate(lots)}
+
+    if method == "specific":
+        by_tx = {lot.transaction_id: i for i, lot in enumerate(lots)}
+        for item in tx.lot_selection or []:
+            i = by_tx.get(item.get("transaction_id"))
+            if i is None or wanted <= 0:
+                continue
+            qty = min(float(item.get("quantity", 0)), lots[i].remaining - allocation.get(i, 0.0), wanted)
+            if qty > 0:
+                allocation[i] = allocation.get(i, 0.0) + qty
+                wanted -= qty
+
+    order = sorted(range(len(lots)), key=lambda i: _sort_key(lots[i]), reverse=method == "lifo")
+    for i in order:
+        if wanted <= _EPSILON:
+            break
+        free = lots[i].remaining - allocation.get(i, 0.0)
+        if free <= _EPSILON:
+            continue
+        qty = min(free, wanted)
+        allocation[i] = allocation.get(i, 0.0) + qty
+        wanted -= qty
+    return allocation
+
+
+def _consume(tx: Transaction, lots: List[Lot], base_currency: str, method: str) -> tuple:
+    """Consume ``lots`` for the sell ``tx``; return ``(cost, realized_gain)``."""
+    fee_base = fee_to_ccy(tx, base_currency, base_currency)
+    proceeds = trade_value_base(tx) - fee_base
+    allocation = _allocate(tx, lots, method)
+    total_cost = 0.0
+    sold = float(tx.quantity) or 1.0
+    for i, qty in allocation.items():
+        lot = lots[i]
+        cost = qty * lot.unit_cost
+        lot.remaining = max(lot.remaining - qty, 0.0)
+        total_cost += cost
+        db.session.add(LotMatch(
+            stock_id=tx.stock_id,
+            sell_transaction_id=tx.id,
+            lot=lot,
+            quantity=qty,
+            cost=cost,
+            proceeds=proceeds * qty / sold,
+        ))
+    # Proceeds for shares sold beyond the open quantity have no basis.
+    return total_cost, proceeds - total_cost
+
+
+def open_lots(stock_id: int) -> List[Lot]:
+    """Return open lots of ``stock_id`` in acquisition order."""
+    return (
+        Lot.query.filter(Lot.stock_id == stock_id, Lot.remaining > _EPSILON)
+        .order_by(Lot.acquired_on, Lot.transaction_id)
+        .all()
+    )
+
+
+def is_latest(tx: Transaction) -> bool:
+    """Return ``True`` when no other trade of the stock sorts after ``tx``."""
+    later = Transaction.query.filter(
+        Transaction.stock_id == tx.stock_id,
+        Transaction.id != tx.id,
+        or_(
+            Transaction.transaction_date > tx.transaction_date,
+            and_(
+                Transaction.transaction_date == tx.transaction_date,
+                Transaction.id > tx.id,
+            ),
+        ),
+    ).first()
+    return later is None
+
+
+def apply(position: Position, tx: Transaction, base_currency: str) -> None:
+    """Book the newest trade ``tx`` of a stock against its open lots."""
+    method = current_method()
+    if tx.transaction_type == 'buy':
+        lot = _open_lot(tx, base_currency)
+        db.session.add(lot)
+        position.cost_basis += lot.remaining * lot.unit_cost
+        return
+    cost, realized = _consume(tx, open_lots(tx.stock_id), base_currency, method)
+    position.cost_basis = max(position.cost_basis - cost, 0.0)
+    position.realized_gain += realized
+
+
+def replay(position: Position, transactions: Iterable[Transaction], base_currency: str) -> None:
+    """Rebuild the lots of ``position`` from its full trade history."""
+    method = current_method()
+    stock_id = position.stock_id
+    LotMatch.query.filter_by(stock_id=stock_id).delete()
+    Lot.query.filter_by(stock_id=stock_id).delete()
+
+    lots: List[Lot] = []
+    realized = 0.0
+    for tx in sorted(transactions, key=lambda t: (t.transaction_date, t.id)):
+        if tx.transaction_type == 'buy':
+            lot = _open_lot(tx, base_currency)
+            db.session.add(lot)
+            lots.append(lot)
+        else:
+            _, gain = _consume(
+                tx, [lot for lot in lots if lot.remaining > _EPSILON], base_currency, method
+            )
+            realized += gain
+    position.cost_basis = sum(lot.remaining * lot.unit_cost for lot in lots)
+    position.realized_gain = realized
+
+
+def discard_transaction(tx: Transaction) -> None:
+    """Delete ledger rows referencing ``tx`` before it is removed."""
+    lot_ids = [lot.id for lot in Lot.query.filter_by(transaction_id=tx.id)]
+    LotMatch.query.filter(
+        or_(LotMatch.sell_transaction_id == tx.id, LotMatch.lot_id.in_(lot_ids))
+    ).delete(synchronize_session=False)
+    Lot.query.filter_by(transaction_id=tx.id).delete()
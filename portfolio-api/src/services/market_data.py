@@ -1,85 +1,208 @@
 import os
+import threading
 import time
-import requests
-from typing import Optional
+from contextlib import contextmanager
+from typing import List, Optional
 
 from .providers import stooq
 
+from src import settings
 from src.data_api import ApiClient
+from src.lib import av_quota, http_client, quote_cache
+from src.lib.single_flight import SingleFlight
+from src.services import provider_router
+from src.services.provider_router import ProviderRouter
 
 class QuoteAPIError(Exception):
     """Raised when the external quote service fails"""
 
 
-_CACHE = {}
-_CACHE_TTL = 60  # seconds
+_CACHE = quote_cache.from_url(
+    settings.QUOTE_CACHE_URL, settings.QUOTE_CACHE_TTL, settings.QUOTE_CACHE_SIZE
+)
 _API_URL = "https://www.alphavantage.co/query"
 
+# Outbound quote requests in flight, keyed by (provider, symbol).
+_flights = SingleFlight()
 
-def fetch_quote(symbol: str):
-    """Return the latest price for *symbol* or ``None`` if unavailable.
+# Concurrent requests allowed per provider across all threads.
+_PROVIDER_SLOTS = {
+    "alphavantage": threading.BoundedSemaphore(settings.ALPHAVANTAGE_CONCURRENCY),
+    "stooq": threading.BoundedSemaphore(settings.STOOQ_CONCURRENCY),
+}
 
-    Tries Alpha Vantage first and falls back to Stooq when the symbol is not
-    supported there or the API returns no data.
-    """
 
-    api_key = os.environ.get("ALPHAVANTAGE_API_KEY")
+@contextmanager
+def provider_slot(provider: str):
+    """Hold one of ``provider``'s concurrency slots for the duration."""
+    with _PROVIDER_SLOTS[provider]:
+        yield
 
-    symbol = symbol.upper()
-    now = time.time()
-    cached = _CACHE.get(symbol)
-    if cached and now - cached[1] < _CACHE_TTL:
-        return cached[0]
 
-    price = None
-    if api_key:
-        params = {
-            "function": "GLOBAL_QUOTE",
-            "symbol": symbol,
-            "apikey": api_key,
-        }
-        try:
-            resp = requests.get(_API_URL, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            if "Global Quote" in data and data["Global Quote"]:
-                price = float(data["Global Quote"]["05. price"])
-            elif "Error Message" in data:
-                price = None
-            elif "Note" in data:
-                raise QuoteAPIError(data.get("Note"))
-        except QuoteAPIError:
-            raise
-        except Exception as exc:
-            raise QuoteAPIError(str(exc)) from exc
+class ProviderSkipped(Exception):
+    """The provider was not asked, e.g. because its request budget is spent."""
 
-    if price is None:
+
+def _alphavantage_quote(symbol: str) -> Optional[float]:
+    if not av_quota.acquire():
+        raise ProviderSkipped("alphavantage budget exhausted")
+    params = {
+        "function": "GLOBAL_QUOTE",
+        "symbol": symbol,
+        "apikey": os.environ.get("ALPHAVANTAGE_API_KEY"),
+    }
+    try:
+        with provider_slot("alphavantage"):
+            # Not retried: every attempt would spend Alpha Vantage budget, and
+            # the router falls back to the next provider instead.
+            resp = http_client.get(_API_URL, params=params, retries=0)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as exc:
+        raise QuoteAPIError(str(exc)) from exc
+    if "Global Quote" in data and data["Global Quote"]:
         try:
-            price = stooq.fetch_quote(symbol)
+            return float(data["Global Quote"]["05. price"])
         except Exception as exc:
             raise QuoteAPIError(str(exc)) from exc
+    if "Note" in data or "Information" in data:
+        # Throttled: record it and fall back to Stooq.
+        av_quota.exhaust(data)
+        raise ProviderSkipped("alphavantage throttled")
+    return None
 
-    _CACHE[symbol] = (price, now)
-    return price
 
+def _stooq_quote(symbol: str) -> Optional[float]:
+    try:
+        with provider_slot("stooq"):
+            return stooq.fetch_quote(symbol)
+    except Exception as exc:
+        raise QuoteAPIError(str(exc)) from exc
 
-def get_company_name(symbol: str) -> Optional[str]:
-    """Return the company name for ``symbol`` using the data API.
 
-    Returns ``None`` if the lookup fails or the API response is invalid.
-    """
-    client = ApiClient()
+def _yahoo_quote(symbol: str) -> Optional[float]:
+    """Latest price from the data API's Yahoo chart endpoint."""
     try:
-        data = client.call_api(
+        data = ApiClient().call_api(
             "YahooFinance/get_stock_chart",
-            query={"symbol": symbol.upper(), "interval": "1d", "range": "1d"},
+            query={"symbol": symbol, "interval": "1d", "range": "1d"},
+            retries=0,
         )
-    except Exception:
+        result = (data.get("chart") or {}).get("result") or []
+    except Exception as exc:
+        raise QuoteAPIError(str(exc)) from exc
+    price = result[0].get("meta", {}).get("regularMarketPrice") if result else None
+    return float(price) if price is not None else None
+
+
+_QUOTE_PROVIDERS = {
+    "alphavantage": _alphavantage_quote,
+    "stooq": _stooq_quote,
+    "yahoo": _yahoo_quote,
+}
+
+router = ProviderRouter(_QUOTE_PROVIDERS)
+
+
+def quote_providers() -> List[str]:
+    """Configured quote providers in preference order."""
+    names = []
+    if os.environ.get("ALPHAVANTAGE_API_KEY"):
+        names.append("alphavantage")
+    names.append("stooq")
+    if os.environ.get("DATA_API_BASE_URL"):
+        names.append("yahoo")
+    return names
+
+
+def _ask_provider(provider: str, symbol: str) -> Optional[float]:
+    """Ask ``provider`` for ``symbol`` and record the outcome with the router.
+
+    Runs once per shared request (in the single-flight leader), so callers
+    that join it do not count the same outcome again.
+    """
+    start = time.perf_counter()
+    try:
+        price = _QUOTE_PROVIDERS[provider](symbol)
+    except QuoteAPIError:
+        router.record(provider, symbol, provider_router.ERROR, time.perf_counter() - start)
+        raise
+    outcome = provider_router.HIT if price is not None else provider_router.MISS
+    router.record(provider, symbol, outcome, time.perf_counter() - start)
+    return price
+
+
+def fetch_quote(symbol: str):
+    """Return the latest price for *symbol* or ``None`` if unavailable.
+
+    Providers (Alpha Vantage when configured, Stooq, and the data API's
+    Yahoo chart when ``DATA_API_BASE_URL`` is set) are tried in the order
+    chosen by :data:`router`, which skips providers with an open circuit
+    breaker or a remembered miss for the symbol. Alpha Vantage is skipped
+    while the shared request budget (:mod:`src.lib.av_quota`) is used up.
+    Concurrent calls for the same provider and symbol share one request
+    (see ``_flights``). :class:`QuoteAPIError` is raised only when no
+    provider answered.
+    """
+
+    symbol = symbol.upper()
+    cached = _CACHE.get(symbol)
+    if cached is not None:
+        return cached.price
+
+    candidates = quote_providers()
+    order = router.order(symbol, candidates)
+    if not order and not any(router.breakers[name].available() for name in candidates):
+        raise QuoteAPIError("all quote providers unavailable")
+
+    price = None
+    # With an empty order every provider is known to lack the symbol.
+    answered = not order
+    errors = []
+    for provider in order:
+        if not router.allow(provider):
+            continue
+        try:
+            price = _flights.do((provider, symbol), _ask_provider, provider, symbol)
+        except ProviderSkipped:
+            # No call was made: a half-open breaker keeps its trial.
+            router.release(provider)
+            continue
+        except QuoteAPIError as exc:
+            errors.append(exc)
+            continue
+        answered = True
+        if price is not None:
+            break
+
+    if not answered:
+        if errors:
+            raise errors[0]
         return None
+    _CACHE.set(symbol, price)
+    return price
 
+
+def prefetch_quotes(symbols) -> None:
+    """Warm the quote cache for ``symbols`` with batched Stooq requests.
+
+    Only used when Alpha Vantage is not configured, since it would be tried
+    first. Failures are ignored; :func:`fetch_quote` then retries per symbol.
+    """
+    if os.environ.get("ALPHAVANTAGE_API_KEY") or not router.breakers["stooq"].available():
+        return
+    wanted = [s.upper() for s in symbols if _CACHE.get(s.upper()) is None]
+    if not wanted:
+        return
+    start = time.perf_counter()
     try:
-        result = data["chart"]["result"][0]
-        meta = result.get("meta", {})
-        return meta.get("longName") or meta.get("shortName")
+        with provider_slot("stooq"):
+            prices = stooq.fetch_quotes(wanted)
     except Exception:
-        return None
+        router.record("stooq", None, provider_router.ERROR, time.perf_counter() - start)
+        return
+    for symbol, price in prices.items():
+        if price is not None:
+            router.remember(symbol, "stooq")
+            _CACHE.set(symbol, price)
+
@@ -0,0 +1,173 @@
+"""Maintain the materialized :class:`Position` table.
+
+Positions are updated inside the same database transaction as the trade
+write that affects them. New trades are applied as deltas and booked against
+the lot ledger (:mod:`src.services.lots`); backdated trades, edits and
+deletes replay only the affected stock. Writes never download FX rates: when a
+rate is not cached yet the position is flagged ``stale`` and recomputed on
+the next read, which may fetch it.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple
+
+from werkzeug.exceptions import BadGateway
+
+from src.models.user import db
+from src.models.portfolio import Lot, LotMatch, Position, Stock, Transaction
+from src.lib.fx import FxDownloadError
+from src.services import lots
+from src.services.holdings import (
+    Holding,
+    fee_to_ccy,
+    load_holdings,
+    preload_rates,
+    rate_keys,
+    trade_cost,
+    trade_value_base,
+)
+
+
+def _rates_cached(transactions: Iterable[Transaction], base_currency: str) -> bool:
+    """Return ``True`` when every FX rate needed to value ``transactions``
+    is already stored locally.
+
+    The rates are preloaded into the request's rate matrix as a side effect.
+    """
+    transactions = list(transactions)
+    matrix = preload_rates(transactions, base_currency)
+    return not matrix.missing(rate_keys(transactions, base_currency))
+
+
+def _fill(position: Position, holding: Holding) -> None:
+    quantity = holding.quantity
+    position.quantity = quantity
+    position.total_bought = holding.total_bought
+    position.total_sold = holding.total_sold
+    position.buy_cost = holding.total_cost
+    position.cost_orig = holding.total_cost_orig
+    position.currency = holding.buys[0].currency if holding.buys else None
+    position.fees = holding.fees
+    position.contributions = holding.contributions
+    lots.replay(position, holding.transactions, holding.base_currency)
+    position.stale = False
+
+
+def refresh_stock(stock_id: int, base_currency: str, fetch: bool = True) -> Position:
+    """Recompute the position of ``stock_id`` from its transactions.
+
+    With ``fetch=False`` missing FX rates are not downloaded; the position is
+    flagged stale instead. Otherwise :class:`BadGateway` is raised when a
+    rate is unavailable.
+    """
+    position = Position.query.filter_by(stock_id=stock_id).first()
+    if position is None:
+        position = Position(stock_id=stock_id)
+        db.session.add(position)
+
+    stock = db.session.get(Stock, stock_id)
+    holding = Holding(stock=stock, base_currency=base_currency)
+    transactions = (
+        Transaction.query.filter_by(stock_id=stock_id)
+        .order_by(Transaction.transaction_date, Transaction.id)
+        .all()
+    )
+    for tx in transactions:
+        if tx.transaction_type == 'buy':
+            holding.buys.append(tx)
+        else:
+            holding.sells.append(tx)
+    if not _rates_cached(transactions, base_currency) and not fetch:
+        position.stale = True
+        return position
+    try:
+        _fill(position, holding)
+    except (BadGateway, FxDownloadError):
+        position.stale = True
+        raise
+    return position
+
+
+def apply_transaction(tx: Transaction, base_currency: str) -> None:
+    """Apply a newly inserted ``tx`` to its stock's position and lots."""
+    position = Position.query.filter_by(stock_id=tx.stock_id).first()
+    if position is None or position.stale:
+        refresh_stock(tx.stock_id, base_currency, fetch=False)
+        return
+    if not _rates_cached([tx], base_currency):
+        position.stale = True
+        return
+    if not lots.is_latest(tx):
+        # A backdated trade changes which lots later sells consumed.
+        refresh_stock(tx.stock_id, base_currency, fetch=False)
+        return
+
+    fee_base = fee_to_ccy(tx, base_currency, base_currency)
+    value = trade_value_base(tx)
+    if tx.transaction_type == 'buy':
+        if position.currency is None:
+            position.currency = tx.currency
+        if tx.currency == position.currency:
+            position.cost_orig += trade_cost(tx, base_currency)
+        position.total_bought += tx.quantity
+        position.buy_cost += value + fee_base
+        position.contributions += value + fee_base
+    else:
+        position.total_sold += tx.quantity
+        position.contributions -= value - fee_base
+    position.fees += fee_base
+    position.quantity = position.total_bought - position.total_sold
+    lots.apply(position, tx, base_currency)
+
+
+def refresh_stocks(stock_ids: Iterable[int], base_currency: str) -> None:
+    """Recompute positions for ``stock_ids`` from cached rates only."""
+    for stock_id in dict.fromkeys(stock_ids):
+        if stock_id is not None:
+            refresh_stock(stock_id, base_currency, fetch=False)
+
+
+def rebuild_positions(base_currency: str) -> int:
+    """Regenerate every position from the full transaction history.
+
+    Returns the number of positions written. The caller commits.
+    """
+    LotMatch.query.delete()
+    Lot.query.delete()
+    Position.query.delete()
+    count = 0
+    holdings = load_holdings(base_currency)
+    preload_rates(
+        (tx for holding in holdings for tx in holding.transactions), base_currency
+    )
+    for holding in holdings:
+        position = Position(stock_id=holding.stock.id)
+        _fill(position, holding)
+        db.session.add(position)
+        count += 1
+    return count
+
+
+def load_positions(base_currency: str) -> List[Tuple[Stock, Position]]:
+    """Return ``(stock, position)`` pairs for every stock.
+
+    Positions that are missing (e.g. rows written before the table existed)
+    or flagged stale are recomputed and committed before returning.
+    """
+    rows = (
+        db.session.query(Stock, Position)
+        .outerjoin(Position, Position.stock_id == Stock.id)
+        .order_by(Stock.id)
+        .all()
+    )
+    result = []
+    refreshed = False
+    for stock, position in rows:
+        if position is None or position.stale:
+            position = refresh_stock(stock.id, base_currency)
+            refreshed = True
+        result.append((stock, position))
+    if refreshed:
+        db.session.commit()
+    return result
@@ -0,0 +1,151 @@
+"""Lookups and housekeeping for the ``PriceCache`` table.
+
+Every quote refresh appends a row. :func:`compact` rolls the rows of each
+symbol and day older than ``PRICE_CACHE_COMPACT_DAYS`` into one OHLC bar,
+and :func:`purge` deletes bars past ``PRICE_CACHE_RETENTION_DAYS``, so the
+table stays proportional to symbols × retained days rather than to the
+number of fetches. Latest-price lookups walk the
+``(symbol, fetched_at)`` index backwards and read a single row.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date as date_cls, datetime, time as time_cls, timedelta
+from itertools import groupby
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select
+
+from src import settings
+from src.models.portfolio import PriceCache
+from src.models.user import db
+
+# Row ids per DELETE statement; stays below SQLite's bound-parameter limit.
+_DELETE_CHUNK = 500
+
+
+@dataclass
+class CompactionReport:
+    symbols: int = 0
+    rows_removed: int = 0
+    bars_written: int = 0
+    purged: int = 0
+
+    def to_dict(self):
+        return {
+            "symbols": self.symbols,
+            "rows_removed": self.rows_removed,
+            "bars_written": self.bars_written,
+            "purged": self.purged,
+        }
+
+
+def latest(symbol: str) -> Optional[PriceCache]:
+    """Return the newest stored price of ``symbol``."""
+    return (
+        PriceCache.query.filter_by(symbol=symbol)
+        .order_by(PriceCache.fetched_at.desc())
+        .limit(1)
+        .first()
+    )
+
+
+def _midnight(day: date_cls) -> datetime:
+    return datetime.combine(day, time_cls.min)
+
+
+def _bar(rows: list) -> dict:
+    """Merge raw rows and earlier bars of one symbol and day."""
+    last = rows[-1]
+    return {
+        "symbol": last.symbol,
+        "currency": last.currency,
+        "fetched_at": last.fetched_at,
+        "price": last.price,
+        "open": rows[0].open if rows[0].open is not None else rows[0].price,
+        "high": max(r.high if r.high is not None else r.price for r in rows),
+        "low": min(r.low if r.low is not None else r.price for r in rows),
+        "samples": sum(r.samples or 1 for r in rows),
+    }
+
+
+def _delete(ids: List[int]) -> None:
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        db.session.execute(delete(PriceCache).where(PriceCache.id.in_(ids[i:i + _DELETE_CHUNK])))
+
+
+def compact_symbol(symbol: str, cutoff: datetime) -> tuple:
+    """Roll ``symbol``'s rows before ``cutoff`` into daily bars.
+
+    Only days that still have raw rows are rewritten. Rows are read as
+    plain tuples, so the caller's session is left as it was. Returns
+    ``(rows_removed, bars_written)``; the caller commits.
+    """
+    first_raw = (
+        db.session.query(db.func.min(PriceCache.fetched_at))
+        .filter(
+            PriceCache.symbol == symbol,
+            PriceCache.samples.is_(None),
+            PriceCache.fetched_at < cutoff,
+        )
+        .scalar()
+    )
+    if first_raw is None:
+        return 0, 0
+    table = PriceCache.__table__
+    rows = db.session.execute(
+        select(table)
+        .where(
+            table.c.symbol == symbol,
+            table.c.fetched_at >= _midnight(first_raw.date()),
+            table.c.fetched_at < cutoff,
+        )
+        .order_by(table.c.fetched_at, table.c.id)
+    ).all()
+    stale_ids: List[int] = []
+    bars = []
+    for _, day_rows in groupby(rows, key=lambda r: r.fetched_at.date()):
+        day_rows = list(day_rows)
+        if len(day_rows) == 1 and day_rows[0].samples is not None:
+            continue
+        bars.append(_bar(day_rows))
+        stale_ids.extend(r.id for r in day_rows)
+    _delete(stale_ids)
+    if bars:
+        db.session.execute(insert(PriceCache), bars)
+    return len(stale_ids), len(bars)
+
+
+def compact(before: Optional[date_cls] = None) -> CompactionReport:
+    """Compact every symbol's rows of days before ``before``.
+
+    Defaults to ``PRICE_CACHE_COMPACT_DAYS`` ago. Commits once per symbol.
+    """
+    before = before or date_cls.today() - timedelta(days=settings.PRICE_CACHE_COMPACT_DAYS)
+    cutoff = _midnight(before)
+    symbols = [
+        symbol
+        for (symbol,) in db.session.query(PriceCache.symbol)
+        .filter(PriceCache.samples.is_(None), PriceCache.fetched_at < cutoff)
+        .distinct()
+    ]
+    report = CompactionReport(symbols=len(symbols))
+    for symbol in symbols:
+        removed, written = compact_symbol(symbol, cutoff)
+        db.session.commit()
+        report.rows_removed += removed
+        report.bars_written += written
+    return report
+
+
+def purge(before: Optional[date_cls] = None) -> int:
+    """Delete rows of days before ``before`` (default: the retention limit)."""
+    if before is None:
+        if not settings.PRICE_CACHE_RETENTION_DAYS:
+            return 0
+        before = date_cls.today() - timedelta(days=settings.PRICE_CACHE_RETENTION_DAYS)
+    result = db.session.execute(delete(PriceCache).where(PriceCache.fetched_at < _midnight(before)))
+    db.session.commit()
+    return result.rowcount or 0
+
@@ -0,0 +1,101 @@
+"""Stale-while-revalidate serving of stored prices.
+
+A stored price is *fresh* for ``PRICE_SOFT_TTL`` seconds and is returned
+as is. Until ``PRICE_HARD_TTL`` it is *stale*: still returned immediately,
+flagged ``stale``, and a background refresh is queued. Only *expired*
+prices make the request wait for the quote providers.
+
+``PRICE_REVALIDATE`` (setting or app config) selects how stale prices are
+refreshed: ``async`` (default), ``sync`` or ``off``.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, Optional, Set
+
+from flask import current_app
+
+from src import settings
+from src.lib import av_quota
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+def freshness(fetched_at: Optional[datetime], now: Optional[datetime] = None) -> str:
+    """Classify a price stored at ``fetched_at`` (UTC)."""
+    if fetched_at is None:
+        return EXPIRED
+    age = ((now or datetime.utcnow()) - fetched_at).total_seconds()
+    if age < settings.PRICE_SOFT_TTL:
+        return FRESH
+    if age < settings.PRICE_HARD_TTL:
+        return STALE
+    return EXPIRED
+
+
+class RevalidationQueue:
+    """Single worker thread refreshing stale prices outside the request.
+
+    A symbol is queued at most once while it waits or is being refreshed;
+    symbols queued together are fetched as one batch.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Set[str] = set()
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-revalidate")
+
+    def submit(self, symbols: Iterable[str], base_currency: str) -> bool:
+        """Queue ``symbols``; ``False`` when all of them are already queued."""
+        with self._lock:
+            new = set(symbols) - self._pending - self._running
+            if not new:
+                return False
+            self._pending |= new
+        app = current_app._get_current_object()
+        self._executor.submit(self._run, app, base_currency)
+        return True
+
+    def _run(self, app, base_currency: str) -> None:
+        with self._lock:
+            symbols, self._pending = self._pending, set()
+            self._running |= symbols
+        if not symbols:
+            return
+        try:
+            with app.app_context(), av_quota.background():
+                from src.services.quote_refresh import refresh_quotes
+
+                report = refresh_quotes(base_currency, sorted(symbols))
+                app.logger.info(
+                    "revalidated %d prices (%d failed)", len(report.updated), len(report.failed)
+                )
+        except Exception as exc:  # noqa: BLE001
+            app.logger.warning("price revalidation failed for %s: %s", sorted(symbols), exc)
+        finally:
+            with self._lock:
+                self._running -= symbols
+
+
+queue = RevalidationQueue()
+
+
+def revalidate(symbols: Iterable[str], base_currency: str) -> None:
+    """Refresh stale ``symbols`` according to ``PRICE_REVALIDATE``."""
+    symbols = list(symbols)
+    mode = current_app.config.get("PRICE_REVALIDATE", settings.PRICE_REVALIDATE)
+    if not symbols or mode == "off":
+        return
+    if mode == "sync":
+        from src.services.quote_refresh import refresh_quotes
+
+        with av_quota.background():
+            refresh_quotes(base_currency, symbols)
+    else:
+        queue.submit(symbols, base_currency)
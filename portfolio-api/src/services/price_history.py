@@ -0,0 +1,225 @@
+"""Daily closing prices backing the portfolio value history.
+
+Closes are downloaded from Stooq's daily CSV endpoint, one request per
+symbol covering the whole missing span, and bulk-upserted into
+``price_history``. :func:`backfill` fills everything since a symbol's first
+trade; the nightly ``update_prices`` task calls it again, which only fetches
+the days after each symbol's last downloaded close, and then records the
+refreshed quotes as today's close where Stooq had none yet. Those
+``source="quote"`` rows are placeholders: the next run downloads the same
+days again and overwrites them with Stooq's closes.
+
+:func:`load_closes` reads the closes of a set of symbols for a date range
+with one query and returns them as sorted per-symbol columns, so valuing a
+day is a binary search rather than a query.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date as date_cls, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, or_, select, union_all
+
+from src.models.portfolio import PriceHistory, Stock, Transaction
+from src.models.user import db
+from src.services.providers import stooq
+
+
+@dataclass
+class CloseSeries:
+    """Closes of one symbol as parallel, date-sorted columns."""
+
+    dates: List[date_cls] = field(default_factory=list)
+    closes: List[float] = field(default_factory=list)
+
+    def as_of(self, day: date_cls) -> Optional[float]:
+        """Return the latest close on or before ``day``.
+
+        Days before the first stored close take the first close.
+        """
+        if not self.dates:
+            return None
+        idx = bisect_right(self.dates, day)
+        return self.closes[idx - 1] if idx else self.closes[0]
+
+
+def upsert_closes(rows: Iterable[dict], replace: bool = True) -> int:
+    """Insert ``price_history`` rows in bulk.
+
+    ``rows`` are dicts with ``symbol``, ``date``, ``close`` and an optional
+    ``source``. Existing closes are overwritten unless ``replace`` is
+    false. Returns the number of rows sent; the caller commits.
+    """
+    by_key = {}
+    for row in rows:
+        row = {"source": None, **row}
+        by_key[(row["symbol"], row["date"])] = row
+    if not by_key:
+        return 0
+    values = list(by_key.values())
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return _upsert_closes_fallback(values, replace)
+
+    stmt = insert(PriceHistory.__table__)
+    if replace:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["symbol", "date"],
+            set_={"close": stmt.excluded.close, "source": stmt.excluded.source},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["symbol", "date"])
+    db.session.execute(stmt, values)
+    return len(values)
+
+
+def _upsert_closes_fallback(rows: List[dict], replace: bool) -> int:
+    new_rows = []
+    for symbol, items in groupby(sorted(rows, key=lambda r: r["symbol"]), key=lambda r: r["symbol"]):
+        items = list(items)
+        dates = [row["date"] for row in items]
+        existing = {
+            rec.date: rec
+            for rec in PriceHistory.query.filter(
+                PriceHistory.symbol == symbol,
+                PriceHistory.date.between(min(dates), max(dates)),
+            )
+        }
+        for row in items:
+            rec = existing.get(row["date"])
+            if rec is None:
+                new_rows.append(row)
+            elif replace:
+                rec.close = row["close"]
+                rec.source = row["source"]
+    if new_rows:
+        db.session.bulk_insert_mappings(PriceHistory, new_rows)
+    return len(rows)
+
+
+def last_dates(symbols: Iterable[str]) -> Dict[str, date_cls]:
+    """Return the last downloaded close date of each of ``symbols``.
+
+    Closes recorded from quotes are ignored, so a backfill fetches their
+    days again.
+    """
+    symbols = set(symbols)
+    if not symbols:
+        return {}
+    rows = (
+        db.session.query(PriceHistory.symbol, func.max(PriceHistory.date))
+        .filter(
+            PriceHistory.symbol.in_(symbols),
+            or_(PriceHistory.source.is_(None), PriceHistory.source != "quote"),
+        )
+        .group_by(PriceHistory.symbol)
+    )
+    return dict(rows)
+
+
+def first_trade_dates() -> Dict[str, date_cls]:
+    """Return the first transaction date of every traded symbol."""
+    rows = (
+        db.session.query(Stock.symbol, func.min(Transaction.transaction_date))
+        .join(Transaction, Transaction.stock_id == Stock.id)
+        .group_by(Stock.symbol)
+    )
+    return dict(rows)
+
+
+def backfill(
+    symbols: Optional[Iterable[str]] = None,
+    start: Optional[date_cls] = None,
+    end: Optional[date_cls] = None,
+) -> Dict[str, int]:
+    """Download and store daily closes of ``symbols`` (default: every traded one).
+
+    Without ``start`` each symbol resumes the day after its last downloaded
+    close, or starts at its first trade; downloaded closes replace quotes
+    recorded for the same day. Every symbol is committed on its
+    own, so an interrupted run resumes where it stopped. Returns the
+    number of closes stored per symbol; failed downloads are left out.
+    """
+    end = end or date_cls.today()
+    first_trades = first_trade_dates()
+    symbols = sorted(first_trades if symbols is None else set(symbols))
+    last = last_dates(symbols)
+    stored: Dict[str, int] = {}
+    for symbol in symbols:
+        if start is not None:
+            begin = start
+        elif symbol in last:
+            begin = last[symbol] + timedelta(days=1)
+        else:
+            begin = first_trades.get(symbol)
+        if begin is None or begin > end:
+            continue
+        try:
+            closes = stooq.fetch_daily(symbol, begin, end)
+        except Exception:  # noqa: BLE001
+            continue
+        stored[symbol] = upsert_closes(
+            {"symbol": symbol, "date": day, "close": close, "source": "stooq"}
+            for day, close in closes.items()
+        )
+        db.session.commit()
+    return stored
+
+
+def record(prices: Dict[str, float], day: Optional[date_cls] = None) -> int:
+    """Store refreshed quotes as the close of ``day`` unless one exists.
+
+    The caller commits.
+    """
+    day = day or date_cls.today()
+    return upsert_closes(
+        ({"symbol": symbol, "date": day, "close": price, "source": "quote"}
+         for symbol, price in prices.items()),
+        replace=False,
+    )
+
+
+def load_closes(
+    symbols: Iterable[str], start: date_cls, end: date_cls
+) -> Dict[str, CloseSeries]:
+    """Return the closes of ``symbols`` in ``start..end`` with one query.
+
+    Each series also holds the last close before ``start``, so
+    :meth:`CloseSeries.as_of` answers every day of the range.
+    """
+    symbols = set(symbols)
+    if not symbols:
+        return {}
+    table = PriceHistory.__table__
+    seeds = (
+        select(table.c.symbol, func.max(table.c.date).label("date"))
+        .where(table.c.symbol.in_(symbols), table.c.date < start)
+        .group_by(table.c.symbol)
+        .subquery()
+    )
+    in_range = select(table.c.symbol, table.c.date, table.c.close).where(
+        table.c.symbol.in_(symbols), table.c.date.between(start, end)
+    )
+    before = select(table.c.symbol, table.c.date, table.c.close).join(
+        seeds, and_(table.c.symbol == seeds.c.symbol, table.c.date == seeds.c.date)
+    )
+    rows = union_all(in_range, before).subquery()
+    result = db.session.execute(
+        select(rows.c.symbol, rows.c.date, rows.c.close).order_by(rows.c.symbol, rows.c.date)
+    )
+    series: Dict[str, CloseSeries] = {}
+    for symbol, items in groupby(result, key=lambda row: row[0]):
+        column = series[symbol] = CloseSeries()
+        for _, day, close in items:
+            column.dates.append(day)
+            column.closes.append(close)
+    return series
@@ -0,0 +1,213 @@
+"""Order quote providers by observed health.
+
+Every provider has a circuit breaker and a rolling window of call outcomes.
+After ``PROVIDER_BREAKER_FAILURES`` consecutive errors its breaker opens
+and the provider is skipped for ``PROVIDER_BREAKER_RESET`` seconds; then a
+single trial call decides whether it closes again. Healthy providers are
+tried in configured order unless one is clearly slower or failing more
+often (``PROVIDER_LATENCY_SLACK``).
+
+The router also remembers, per symbol, which provider returned a price and
+which ones had no data (for ``PROVIDER_MISS_TTL`` seconds), so unsupported
+tickers go straight to the provider that knows them.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from src import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+HIT = "hit"
+MISS = "miss"
+ERROR = "error"
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, reset_after: float) -> None:
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _update(self, now: float) -> None:
+        if self.state == OPEN and now - self.opened_at >= self.reset_after:
+            self.state = HALF_OPEN
+            self._trial = False
+
+    def available(self, now: Optional[float] = None) -> bool:
+        """Whether a call could be made, without claiming the half-open trial."""
+        with self._lock:
+            self._update(now or time.monotonic())
+            return self.state == CLOSED or (self.state == HALF_OPEN and not self._trial)
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Claim permission for one call."""
+        with self._lock:
+            self._update(now or time.monotonic())
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a claimed call that was not made (e.g. skipped for budget)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def failure(self, now: Optional[float] = None) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = now or time.monotonic()
+                self._trial = False
+
+
+class ProviderStats:
+    """Outcome and latency of the last ``window`` calls."""
+
+    def __init__(self, window: int) -> None:
+        self._calls: deque = deque(maxlen=window)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            self._calls.append((ok, latency))
+            self.total += 1
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            calls = list(self._calls)
+        if not calls:
+            return {"calls": self.total, "error_rate": 0.0, "avg_ms": None, "p95_ms": None}
+        latencies = sorted(latency for _, latency in calls)
+        return {
+            "calls": self.total,
+            "error_rate": round(sum(1 for ok, _ in calls if not ok) / len(calls), 3),
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        }
+
+    def score(self) -> float:
+        """Expected cost of a call in seconds; errors cost a full read timeout."""
+        summary = self.summary()
+        if summary["avg_ms"] is None:
+            return 0.0
+        return summary["avg_ms"] / 1000 + summary["error_rate"] * settings.HTTP_READ_TIMEOUT
+
+
+class ProviderRouter:
+    def __init__(self, providers: Iterable[str]) -> None:
+        self.providers = list(providers)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.breakers = {
+                name: CircuitBreaker(settings.PROVIDER_BREAKER_FAILURES, settings.PROVIDER_BREAKER_RESET)
+                for name in self.providers
+            }
+            self.stats = {name: ProviderStats(settings.PROVIDER_STATS_WINDOW) for name in self.providers}
+            self._known: Dict[str, str] = {}
+            self._misses: Dict[str, Dict[str, float]] = {}
+
+    def _missing(self, symbol: str, now: float) -> set:
+        misses = self._misses.get(symbol, {})
+        return {name for name, until in misses.items() if until > now}
+
+    def order(self, symbol: str, candidates: Iterable[str]) -> List[str]:
+        """Return ``candidates`` to try for ``symbol``, best first.
+
+        Providers with an open breaker or a remembered miss are left out.
+        """
+        now = time.monotonic()
+        with self._lock:
+            known = self._known.get(symbol)
+            missing = self._missing(symbol, now)
+        slack = settings.PROVIDER_LATENCY_SLACK
+        ranked = []
+        for priority, name in enumerate(candidates):
+            if name in missing or not self.breakers[name].available(now):
+                continue
+            bucket = int(self.stats[name].score() / slack) if slack > 0 else 0
+            ranked.append((name != known, bucket, priority, name))
+        return [name for *_, name in sorted(ranked)]
+
+    def allow(self, provider: str) -> bool:
+        return self.breakers[provider].allow()
+
+    def release(self, provider: str) -> None:
+        self.breakers[provider].release()
+
+    def record(self, provider: str, symbol: Optional[str], outcome: str, latency: float) -> None:
+        """Record a call: ``HIT``, ``MISS`` (no data for the symbol) or ``ERROR``."""
+        self.stats[provider].record(outcome != ERROR, latency)
+        if outcome == ERROR:
+            self.breakers[provider].failure()
+            return
+        self.breakers[provider].success()
+        if outcome == HIT:
+            self.remember(symbol, provider)
+        else:
+            with self._lock:
+                self._misses.setdefault(symbol, {})[provider] = (
+                    time.monotonic() + settings.PROVIDER_MISS_TTL
+                )
+                if self._known.get(symbol) == provider:
+                    del self._known[symbol]
+
+    def remember(self, symbol: str, provider: str) -> None:
+        """Note that ``provider`` has data for ``symbol``."""
+        with self._lock:
+            self._known[symbol] = provider
+            misses = self._misses.get(symbol)
+            if misses:
+                misses.pop(provider, None)
+
+    def state(self, symbol: Optional[str] = None) -> Dict[str, object]:
+        now = time.monotonic()
+        providers = {}
+        for name in self.providers:
+            breaker = self.breakers[name]
+            breaker.available(now)
+            providers[name] = {
+                "state": breaker.state,
+                "consecutive_failures": breaker.failures,
+                **self.stats[name].summary(),
+            }
+        with self._lock:
+            result: Dict[str, object] = {
+                "providers": providers,
+                "known_symbols": len(self._known),
+                "symbols_with_misses": sum(1 for s in self._misses if self._missing(s, now)),
+            }
+            if symbol:
+                result["symbol"] = {
+                    "symbol": symbol,
+                    "known": self._known.get(symbol),
+                    "misses": sorted(self._missing(symbol, now)),
+                }
+        if symbol:
+            result["symbol"]["order"] = self.order(symbol, self.providers)
+        return result
@@ -1,15 +1,82 @@
+import csv
 import io
-import pandas as pd
-import requests
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from src.lib import http_client
+
+_URL = "https://stooq.com/q/l/?s={symbols}&f=sd2t2ohlcv&h&e=csv"
+_DAILY_URL = "https://stooq.com/q/d/l/?s={symbol}&d1={start:%Y%m%d}&d2={end:%Y%m%d}&i=d"
+
+# Symbols per request; keeps the URL short.
+BATCH_SIZE = 50
+
+
+def _stooq_symbol(symbol: str) -> str:
+    return symbol.split('.')[0].lower()
+
+
+def _close(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # Stooq reports unknown symbols with "N/D" fields.
+        return None
+
+
+def _fetch_chunk(symbols: List[str], retries: Optional[int] = None) -> Dict[str, Optional[float]]:
+    by_stooq = {_stooq_symbol(s): s for s in symbols}
+    url = _URL.format(symbols="+".join(by_stooq))
+    resp = http_client.get(url, retries=retries)
+    resp.raise_for_status()
+    prices: Dict[str, Optional[float]] = dict.fromkeys(symbols)
+    for row in csv.DictReader(io.StringIO(resp.text)):
+        symbol = by_stooq.get((row.get('Symbol') or '').lower())
+        if symbol is not None:
+            prices[symbol] = _close(row.get('Close'))
+    return prices
+
+
+def fetch_quotes(
+    symbols: Iterable[str], retries: Optional[int] = None
+) -> Dict[str, Optional[float]]:
+    """Return latest closing prices for ``symbols`` from Stooq.
+
+    Symbols are requested ``BATCH_SIZE`` at a time; unavailable symbols map
+    to ``None``. ``retries`` overrides ``HTTP_RETRIES``.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    prices: Dict[str, Optional[float]] = {}
+    for i in range(0, len(symbols), BATCH_SIZE):
+        prices.update(_fetch_chunk(symbols[i:i + BATCH_SIZE], retries))
+    return prices
 
 
 def fetch_quote(symbol: str):
-    """Return latest closing price from Stooq or ``None`` if unavailable."""
-    stooq_symbol = symbol.split('.')[0].lower()
-    url = f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
-    resp = requests.get(url, timeout=10)
+    """Return latest closing price from Stooq or ``None`` if unavailable.
+
+    Single lookups sit on the request path and are not retried; the quote
+    router falls back to another provider instead.
+    """
+    return fetch_quotes([symbol], retries=0).get(symbol)
+
+
+def fetch_daily(symbol: str, start: date, end: date) -> Dict[date, float]:
+    """Return daily closes of ``symbol`` for ``start..end`` in one request.
+
+    Unknown symbols and ranges without trading days yield an empty dict.
+    """
+    url = _DAILY_URL.format(symbol=_stooq_symbol(symbol), start=start, end=end)
+    resp = http_client.get(url, timeout=30)
     resp.raise_for_status()
-    df = pd.read_csv(io.StringIO(resp.text))
-    if df.empty or df['Close'].isna().iloc[0]:
-        return None
-    return float(df['Close'].iloc[0])
+    closes: Dict[date, float] = {}
+    # Stooq answers "No data" instead of a CSV header for unknown symbols.
+    for row in csv.DictReader(io.StringIO(resp.text)):
+        close = _close(row.get('Close'))
+        try:
+            day = date.fromisoformat(row.get('Date') or '')
+        except ValueError:
+            continue
+        if close is not None:
+            closes[day] = close
+    return closes
@@ -0,0 +1,137 @@
+"""Refresh quotes for many symbols at once.
+
+Quotes are fetched on a bounded thread pool; each provider additionally
+caps its own concurrent requests (see ``market_data.provider_slot``). The
+database is only touched after every fetch finished, and all prices are
+written in a single transaction. Used by ``POST /prices/refresh`` and
+``tasks/update_prices.py``.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from src import settings
+from src.lib import av_quota
+from src.models.portfolio import CurrencyEnum, PriceCache, Stock
+from src.models.user import db
+from src.services import market_data
+
+
+@dataclass
+class QuoteResult:
+    symbol: str
+    price: Optional[float] = None
+    error: Optional[str] = None
+    latency: float = 0.0
+
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "price": self.price,
+            "error": self.error,
+            "latency_ms": round(self.latency * 1000, 1),
+        }
+
+
+@dataclass
+class RefreshReport:
+    results: List[QuoteResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def updated(self) -> List[str]:
+        return [r.symbol for r in self.results if r.price is not None]
+
+    @property
+    def failed(self) -> List[str]:
+        return [r.symbol for r in self.results if r.price is None]
+
+    def to_dict(self):
+        return {
+            "updated": len(self.updated),
+            "failed": self.failed,
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+            "quotes": [r.to_dict() for r in self.results],
+        }
+
+
+def _fetch(symbol: str, priority: str) -> QuoteResult:
+    start = time.perf_counter()
+    result = QuoteResult(symbol)
+    token = av_quota.priority.set(priority)
+    try:
+        result.price = market_data.fetch_quote(symbol)
+        if result.price is None:
+            result.error = "no quote"
+    except market_data.QuoteAPIError as exc:
+        result.error = str(exc) or exc.__class__.__name__
+    except Exception as exc:  # noqa: BLE001
+        # A provider bug must not drop the quotes fetched for other symbols.
+        result.error = f"{exc.__class__.__name__}: {exc}"
+    finally:
+        av_quota.priority.reset(token)
+    result.latency = time.perf_counter() - start
+    return result
+
+
+def fetch_quotes(
+    symbols: Iterable[str],
+    workers: int = settings.QUOTE_REFRESH_WORKERS,
+    priority: str = av_quota.BACKGROUND,
+) -> List[QuoteResult]:
+    """Fetch quotes for ``symbols`` concurrently, preserving their order.
+
+    ``priority`` is the Alpha Vantage budget class of the requests.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return []
+    market_data.prefetch_quotes(symbols)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(symbols))),
+                            thread_name_prefix="quotes") as pool:
+        return list(pool.map(_fetch, symbols, [priority] * len(symbols)))
+
+
+def refresh_quotes(
+    base_currency: str,
+    symbols: Optional[Iterable[str]] = None,
+    company_names: bool = False,
+    workers: int = settings.QUOTE_REFRESH_WORKERS,
+    priority: str = av_quota.BACKGROUND,
+) -> RefreshReport:
+    """Fetch and store prices for ``symbols`` (default: every stock).
+
+    Prices are written to ``Stock`` and ``PriceCache`` in one commit. With
+    ``company_names`` stocks without a company name are queued for a
+    metadata lookup (see ``services.symbol_metadata``).
+    """
+    start = time.perf_counter()
+    if symbols is None:
+        symbols = [symbol for (symbol,) in db.session.query(Stock.symbol).distinct()]
+    report = RefreshReport(fetch_quotes(symbols, workers, priority))
+
+    prices = {r.symbol: r.price for r in report.results if r.price is not None}
+    if prices:
+        stocks = Stock.query.filter(Stock.symbol.in_(prices)).all()
+        now = datetime.utcnow()
+        for stock in stocks:
+            stock.current_price = prices[stock.symbol]
+            stock.last_updated = now
+        db.session.bulk_insert_mappings(PriceCache, [
+            {"symbol": symbol, "price": price, "currency": CurrencyEnum[base_currency],
+             "fetched_at": now}
+            for symbol, price in prices.items()
+        ])
+    db.session.commit()
+    if company_names and prices:
+        from src.services import symbol_metadata
+
+        unnamed = Stock.query.filter(Stock.symbol.in_(prices), Stock.company_name.is_(None))
+        symbol_metadata.enrich(stock.symbol for stock in unnamed)
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,158 @@
+"""Stored company names and listing details of ticker symbols.
+
+Looking a name up can take an Alpha Vantage request followed by two Yahoo
+requests, so write endpoints never do it inline. They read whatever is
+stored in ``symbol_metadata`` and call :func:`enrich`, which looks missing
+or outdated symbols up off the request path and copies the name onto
+``Stock.company_name``. Results are re-checked after ``SYMBOL_METADATA_TTL``;
+symbols no provider knew after ``SYMBOL_METADATA_NEGATIVE_TTL``.
+
+``SYMBOL_ENRICHMENT`` (setting or app config) selects ``async`` (default),
+``sync`` or ``off``.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from flask import current_app
+
+from src import settings
+from src.lib import av_quota
+from src.lib import market_data as lib_market_data
+from src.models.portfolio import Stock, SymbolMetadata
+from src.models.user import db
+
+
+def is_expired(row: SymbolMetadata, now: Optional[datetime] = None) -> bool:
+    ttl = settings.SYMBOL_METADATA_TTL if row.name else settings.SYMBOL_METADATA_NEGATIVE_TTL
+    return row.checked_at + timedelta(seconds=ttl) <= (now or datetime.utcnow())
+
+
+def cached(symbols: Iterable[str]) -> Dict[str, SymbolMetadata]:
+    """Return the stored rows for ``symbols`` with one query."""
+    symbols = {s.upper() for s in symbols}
+    if not symbols:
+        return {}
+    rows = SymbolMetadata.query.filter(SymbolMetadata.symbol.in_(symbols))
+    return {row.symbol: row for row in rows}
+
+
+def cached_name(symbol: str) -> Optional[str]:
+    row = cached([symbol]).get(symbol.upper())
+    return row.name if row else None
+
+
+def store(symbol: str, info: Optional[dict]) -> SymbolMetadata:
+    """Save a lookup result (``None`` when nothing was found).
+
+    Stocks without a company name get the found one. The caller commits.
+    """
+    symbol = symbol.upper()
+    row = SymbolMetadata.query.filter_by(symbol=symbol).first()
+    if row is None:
+        row = SymbolMetadata(symbol=symbol)
+        db.session.add(row)
+    info = info or {}
+    # A failed re-check keeps the details found earlier.
+    if info.get("name") or not row.name:
+        row.name = info.get("name")
+        row.exchange = info.get("exchange")
+        row.currency = info.get("currency")
+        row.source = info.get("source")
+    row.checked_at = datetime.utcnow()
+    if row.name:
+        for stock in Stock.query.filter(Stock.symbol == symbol, Stock.company_name.is_(None)):
+            stock.company_name = row.name
+    return row
+
+
+def refresh(symbol: str) -> SymbolMetadata:
+    """Look ``symbol`` up at the providers and store the result."""
+    return store(symbol, lib_market_data.fetch_metadata(symbol))
+
+
+def lookup(symbol: str) -> SymbolMetadata:
+    """Return stored metadata, looking ``symbol`` up first when outdated.
+
+    Blocks on the providers; only for read endpoints such as symbol search.
+    """
+    row = cached([symbol]).get(symbol.upper())
+    if row is None or is_expired(row):
+        row = refresh(symbol)
+        db.session.commit()
+    return row
+
+
+def pending(symbols: Iterable[str]) -> List[str]:
+    """Return the ``symbols`` without a current stored lookup."""
+    symbols = sorted({s.upper() for s in symbols})
+    rows = cached(symbols)
+    now = datetime.utcnow()
+    return [s for s in symbols if s not in rows or is_expired(rows[s], now)]
+
+
+class EnrichmentQueue:
+    """Single worker thread looking symbols up outside the request.
+
+    A symbol is queued at most once while it waits or is being looked up.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Set[str] = set()
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="symbol-metadata")
+
+    def submit(self, symbols: Iterable[str]) -> bool:
+        """Queue ``symbols``; ``False`` when all of them are already queued."""
+        with self._lock:
+            new = set(symbols) - self._pending - self._running
+            if not new:
+                return False
+            self._pending |= new
+        app = current_app._get_current_object()
+        self._executor.submit(self._run, app)
+        return True
+
+    def _run(self, app) -> None:
+        with self._lock:
+            symbols, self._pending = self._pending, set()
+            self._running |= symbols
+        try:
+            with app.app_context(), av_quota.background():
+                for symbol in sorted(symbols):
+                    try:
+                        refresh(symbol)
+                        db.session.commit()
+                    except Exception as exc:  # noqa: BLE001
+                        db.session.rollback()
+                        app.logger.warning("symbol lookup failed for %s: %s", symbol, exc)
+        finally:
+            with self._lock:
+                self._running -= symbols
+
+
+queue = EnrichmentQueue()
+
+
+def enrich(symbols: Iterable[str]) -> None:
+    """Look up ``symbols`` without current metadata per ``SYMBOL_ENRICHMENT``.
+
+    Call after committing, so the worker sees the new stocks.
+    """
+    mode = current_app.config.get("SYMBOL_ENRICHMENT", settings.SYMBOL_ENRICHMENT)
+    if mode == "off":
+        return
+    symbols = pending(symbols)
+    if not symbols:
+        return
+    if mode == "sync":
+        for symbol in symbols:
+            refresh(symbol)
+        db.session.commit()
+    else:
+        queue.submit(symbols)
@@ -1,4 +1,79 @@
 import os
 
+from src.config import DB_DIR
+
 FX_PROVIDER_URL = os.environ.get("FX_PROVIDER_URL", "https://api.exchangerate.host")
 FX_API_KEY = os.environ.get("FX_API_KEY")
+
+# Maximum number of exchange rates kept in the per-process LRU cache.
+FX_CACHE_SIZE = int(os.environ.get("FX_CACHE_SIZE", "4096"))
+
+# Seconds before a cached "latest" FX rate is refreshed in the background.
+LATEST_FX_TTL = int(os.environ.get("LATEST_FX_TTL", "3600"))
+
+# How historical FX gaps are backfilled after a trade: async, sync or off.
+FX_BACKFILL = os.environ.get("FX_BACKFILL", "async")
+
+# Oldest rate (in days before the requested date) an as-of lookup may return.
+FX_MAX_STALENESS_DAYS = int(os.environ.get("FX_MAX_STALENESS_DAYS", "5"))
+
+# Concurrent downloads and provider requests per second for FX backfills.
+FX_BACKFILL_WORKERS = int(os.environ.get("FX_BACKFILL_WORKERS", "4"))
+FX_PROVIDER_RATE_LIMIT = float(os.environ.get("FX_PROVIDER_RATE_LIMIT", "5"))
+
+# Quote refresh: worker threads and concurrent requests per provider.
+QUOTE_REFRESH_WORKERS = int(os.environ.get("QUOTE_REFRESH_WORKERS", "8"))
+ALPHAVANTAGE_CONCURRENCY = int(os.environ.get("ALPHAVANTAGE_CONCURRENCY", "2"))
+STOOQ_CONCURRENCY = int(os.environ.get("STOOQ_CONCURRENCY", "4"))
+
+# Alpha Vantage budget shared by all workers through a SQLite file. Background
+# work leaves AV_BACKGROUND_RESERVE of each budget to interactive requests.
+AV_QUOTA_DB = os.environ.get("AV_QUOTA_DB", str(DB_DIR / "av_quota.db"))
+AV_REQUESTS_PER_MINUTE = float(os.environ.get("AV_REQUESTS_PER_MINUTE", "5"))
+AV_REQUESTS_PER_DAY = float(os.environ.get("AV_REQUESTS_PER_DAY", "25"))
+AV_BACKGROUND_RESERVE = float(os.environ.get("AV_BACKGROUND_RESERVE", "0.2"))
+
+# Latest-quote cache: "memory", "sqlite:///path" or "redis://host:port/db".
+QUOTE_CACHE_URL = os.environ.get("QUOTE_CACHE_URL", "memory")
+QUOTE_CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL", "60"))
+QUOTE_CACHE_SIZE = int(os.environ.get("QUOTE_CACHE_SIZE", "1024"))
+
+# Stored prices younger than PRICE_SOFT_TTL seconds are served as is; until
+# PRICE_HARD_TTL they are served flagged stale and refreshed in the background
+# (PRICE_REVALIDATE: async, sync or off). Older prices are fetched first.
+PRICE_SOFT_TTL = int(os.environ.get("PRICE_SOFT_TTL", "900"))
+PRICE_HARD_TTL = int(os.environ.get("PRICE_HARD_TTL", "86400"))
+PRICE_REVALIDATE = os.environ.get("PRICE_REVALIDATE", "async")
+
+# Outbound HTTP: pooled connections per provider host, timeouts in seconds and
+# retries with jittered exponential backoff (HTTP_BACKOFF * 2**attempt, capped).
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.25"))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "4"))
+
+# Symbol metadata (company name, exchange, currency) is looked up off the
+# request path (SYMBOL_ENRICHMENT: async, sync or off) and re-checked after
+# SYMBOL_METADATA_TTL seconds, or SYMBOL_METADATA_NEGATIVE_TTL when nothing
+# was found.
+SYMBOL_ENRICHMENT = os.environ.get("SYMBOL_ENRICHMENT", "async")
+SYMBOL_METADATA_TTL = int(os.environ.get("SYMBOL_METADATA_TTL", str(30 * 86400)))
+SYMBOL_METADATA_NEGATIVE_TTL = int(os.environ.get("SYMBOL_METADATA_NEGATIVE_TTL", "86400"))
+
+# Quote provider routing: consecutive errors that open a provider's circuit
+# breaker, seconds before a trial call, calls kept for latency/error stats,
+# latency difference (seconds) that changes the provider order, and seconds
+# a provider without data for a symbol is skipped for it.
+PROVIDER_BREAKER_FAILURES = int(os.environ.get("PROVIDER_BREAKER_FAILURES", "5"))
+PROVIDER_BREAKER_RESET = float(os.environ.get("PROVIDER_BREAKER_RESET", "30"))
+PROVIDER_STATS_WINDOW = int(os.environ.get("PROVIDER_STATS_WINDOW", "100"))
+PROVIDER_LATENCY_SLACK = float(os.environ.get("PROVIDER_LATENCY_SLACK", "0.5"))
+PROVIDER_MISS_TTL = int(os.environ.get("PROVIDER_MISS_TTL", str(6 * 3600)))
+
+# PriceCache rows older than PRICE_CACHE_COMPACT_DAYS are rolled up into one
+# daily OHLC bar per symbol; bars older than PRICE_CACHE_RETENTION_DAYS are
+# deleted (0 keeps them forever).
+PRICE_CACHE_COMPACT_DAYS = int(os.environ.get("PRICE_CACHE_COMPACT_DAYS", "7"))
+PRICE_CACHE_RETENTION_DAYS = int(os.environ.get("PRICE_CACHE_RETENTION_DAYS", "730"))
@@ -0,0 +1,61 @@
+"""Roll old price cache rows into daily bars and apply the retention policy.
+
+Meant to run daily, e.g. after ``update_prices``::
+
+    python -m src.tasks.compact_prices --compact-days 7 --retention-days 730
+
+Each symbol is compacted in its own transaction, so an interrupted run
+leaves finished symbols compacted and the rest untouched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from datetime import date, timedelta
+from typing import List, Optional
+
+from flask import Flask
+
+from src import settings
+from src.config import SQLALCHEMY_DATABASE_URI
+from src.models.user import db
+from src.services import price_cache
+
+
+def create_app() -> Flask:
+    app = Flask("compact-prices")
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", SQLALCHEMY_DATABASE_URI
+    )
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compact and prune the price cache.")
+    parser.add_argument("--compact-days", type=int, default=settings.PRICE_CACHE_COMPACT_DAYS,
+                        help="keep raw rows of this many recent days")
+    parser.add_argument("--retention-days", type=int, default=settings.PRICE_CACHE_RETENTION_DAYS,
+                        help="delete rows older than this (0 keeps everything)")
+    args = parser.parse_args(argv)
+
+    today = date.today()
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        purged = 0
+        if args.retention_days:
+            purged = price_cache.purge(today - timedelta(days=args.retention_days))
+        report = price_cache.compact(today - timedelta(days=args.compact_days))
+        report.purged = purged
+        print(
+            f"compacted {report.rows_removed} rows of {report.symbols} symbols "
+            f"into {report.bars_written} bars, purged {report.purged} rows",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Regenerate the materialized positions table from scratch.
+
+Positions are normally maintained incrementally by the transaction write
+endpoints. Run this script after importing data out of band, after a manual
+database edit or when the base currency changes.
+"""
+
+from __future__ import annotations
+
+import os
+
+from flask import Flask
+
+from src.config import SQLALCHEMY_DATABASE_URI, PORTFOLIO_BASE_CCY
+from src.models.user import db
+from src.services.positions import rebuild_positions
+
+
+def create_app() -> Flask:
+    app = Flask("rebuild-positions")
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", SQLALCHEMY_DATABASE_URI
+    )
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["PORTFOLIO_BASE_CCY"] = os.environ.get(
+        "PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY
+    )
+    db.init_app(app)
+    return app
+
+
+def rebuild() -> int:
+    """Rebuild every position and return the number of rows written."""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        base_currency = app.config["PORTFOLIO_BASE_CCY"]
+        count = rebuild_positions(base_currency)
+        db.session.commit()
+        print(f"rebuilt {count} positions", flush=True)
+        return count
+
+
+if __name__ == "__main__":
+    rebuild()
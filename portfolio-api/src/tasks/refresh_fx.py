@@ -1,19 +1,35 @@
-"""Fetch and store FX rates for a given date.
+"""Fetch and store FX rates.
 
-This task mirrors the behaviour of the `/api/fx/refresh` endpoint but can be
-run as a standalone script or scheduled job.
+Without arguments the script refreshes today's rates, mirroring the
+`/api/fx/refresh` endpoint. With ``--start`` it backfills a date range::
+
+    python -m src.tasks.refresh_fx --start 2015-01-01 --pairs EUR/USD SEK
+
+Missing business days of every pair are found with one query, downloaded as
+time series on a bounded thread pool sharing a per-provider token bucket,
+and written in batches. Each batch is committed, so an interrupted run
+resumes where it stopped when started again.
 """
 
 from __future__ import annotations
 
+import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
 
 from flask import Flask
 
+from src import settings
 from src.config import SQLALCHEMY_DATABASE_URI, PORTFOLIO_BASE_CCY
+from src.lib import av_quota, rate_limit
+from src.lib.fx import FxDownloadError, upsert_rates, validate_currency_code
 from src.models.user import db
-from src.services.fx import ensure_fx_rates
+from src.services import fx as services_fx, fx_backfill
+
+Pair = Tuple[str, str]
 
 
 def create_app() -> Flask:
@@ -32,9 +48,120 @@ def refresh_fx(target_date: date) -> None:
     with app.app_context():
         db.create_all()
         base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
-        ensure_fx_rates(target_date, base_currency)
+        services_fx.ensure_fx_rates(target_date, base_currency)
         print(f"FX rates refreshed for {target_date.isoformat()}", flush=True)
 
 
+def parse_pairs(values: Optional[Iterable[str]], base_currency: str) -> List[Pair]:
+    """Parse ``EUR/USD`` or ``EUR`` (quoted in ``base_currency``) arguments.
+
+    Defaults to every supported currency against ``base_currency``.
+    """
+    base_currency = validate_currency_code(base_currency)
+    if not values:
+        return [(ccy, base_currency) for ccy in services_fx.SUPPORTED_CCY if ccy != base_currency]
+    pairs = []
+    for value in values:
+        base, _, quote = value.partition("/")
+        pairs.append((validate_currency_code(base), validate_currency_code(quote or base_currency)))
+    return pairs
+
+
+def _flush(rows: list) -> int:
+    if not rows:
+        return 0
+    written = upsert_rates(rows)
+    db.session.commit()
+    rows.clear()
+    return written
+
+
+def backfill_range(
+    start: date,
+    end: date,
+    pairs: List[Pair],
+    workers: int = settings.FX_BACKFILL_WORKERS,
+    rate: float = settings.FX_PROVIDER_RATE_LIMIT,
+    batch_size: int = 5000,
+) -> int:
+    """Store every missing business-day rate of ``pairs`` in ``start..end``.
+
+    Must run inside an app context. Returns the number of rows written.
+    """
+    gaps = fx_backfill.missing_by_pair(pairs, start, end, business_days=True)
+    jobs = [
+        (pair, first, last)
+        for pair, dates in gaps.items()
+        for first, last in fx_backfill.windows(dates)
+    ]
+    provider = urlparse(settings.FX_PROVIDER_URL).netloc or settings.FX_PROVIDER_URL
+    limiter = rate_limit.bucket(provider, rate)
+
+    def download(pair: Pair, first: date, last: date):
+        limiter.acquire()
+        return pair, fx_backfill.fetch_series(pair[0], pair[1], first, last)
+
+    print(f"{sum(map(len, gaps.values()))} missing dates in {len(jobs)} requests", flush=True)
+    written = 0
+    pending: list = []
+    pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="fx-backfill")
+    try:
+        futures = [pool.submit(download, *job) for job in jobs]
+        for future in as_completed(futures):
+            try:
+                (base, quote), series = future.result()
+            except FxDownloadError as exc:
+                print(f"download failed: {exc}", flush=True)
+                continue
+            wanted = set(gaps[(base, quote)])
+            pending.extend(
+                {"base": base, "quote": quote, "date": dt, "rate": value}
+                for dt, value in series.items()
+                if dt in wanted
+            )
+            if len(pending) >= batch_size:
+                written += _flush(pending)
+                print(f"{written} rates stored", flush=True)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        written += _flush(pending)
+    return written
+
+
+def backfill(start: date, end: date, pairs: List[Pair], **kwargs) -> int:
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        written = backfill_range(start, end, pairs, **kwargs)
+        print(f"FX backfill stored {written} rates", flush=True)
+        return written
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Refresh or backfill FX rates.")
+    parser.add_argument("--start", type=date.fromisoformat, help="first date to backfill")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--pairs", nargs="*", help="BASE/QUOTE or BASE (quoted in PORTFOLIO_BASE_CCY)")
+    parser.add_argument("--workers", type=int, default=settings.FX_BACKFILL_WORKERS)
+    parser.add_argument("--rate", type=float, default=settings.FX_PROVIDER_RATE_LIMIT,
+                        help="provider requests per second")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.start is None:
+        refresh_fx(date.today())
+        return
+    base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
+    backfill(
+        args.start,
+        args.end,
+        parse_pairs(args.pairs, base_currency),
+        workers=args.workers,
+        rate=args.rate,
+        batch_size=args.batch_size,
+    )
+
+
 if __name__ == "__main__":
-    refresh_fx(date.today())
+    with av_quota.background():
+        main()
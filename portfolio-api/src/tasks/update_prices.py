@@ -2,21 +2,29 @@
 
 This script fetches the latest quote for each stock symbol in the
 portfolio and stores the result in the database. Prices are stored in the
-instrument's native currency. The script mirrors the behaviour of the
+instrument's native currency. The script shares the batch refresher with the
 /price/refresh API endpoint but can be run standalone.
+
+Each run also appends daily closes to ``price_history``: the days since
+each symbol's last stored close are downloaded from Stooq and the refreshed
+quotes fill in today. With ``--start`` the script only backfills closes::
+
+    python -m src.tasks.update_prices --start 2015-01-01 --symbols AAPL MSFT
 """
 
 from __future__ import annotations
 
+import argparse
 import os
-from datetime import datetime
+from datetime import date
+from typing import List, Optional
 
 from flask import Flask
 
 from src.config import SQLALCHEMY_DATABASE_URI, PORTFOLIO_BASE_CCY
-from src.models.portfolio import Stock, PriceCache, CurrencyEnum
 from src.models.user import db
-from src.services.market_data import fetch_quote, QuoteAPIError
+from src.services import price_history
+from src.services.quote_refresh import refresh_quotes
 
 
 def create_app() -> Flask:
@@ -34,29 +42,47 @@ def update_prices() -> None:
     with app.app_context():
         db.create_all()
         base_currency = os.environ.get("PORTFOLIO_BASE_CCY", PORTFOLIO_BASE_CCY)
-        symbols = [s.symbol for s in Stock.query.distinct(Stock.symbol)]
-        for symbol in symbols:
-            try:
-                price = fetch_quote(symbol)
-            except QuoteAPIError as exc:
-                print(f"failed to fetch {symbol}: {exc}", flush=True)
-                continue
-            if price is None:
-                print(f"no quote for {symbol}", flush=True)
-                continue
-            stock = Stock.query.filter_by(symbol=symbol).first()
-            stock.current_price = price
-            stock.last_updated = datetime.utcnow()
-            db.session.add(
-                PriceCache(
-                    symbol=symbol,
-                    price=price,
-                    currency=CurrencyEnum[base_currency],
-                )
-            )
-            db.session.commit()
-            print(f"{symbol}: {price}", flush=True)
+        report = refresh_quotes(base_currency)
+        for result in report.results:
+            latency = f"{result.latency * 1000:.0f} ms"
+            if result.price is None:
+                print(f"failed to fetch {result.symbol}: {result.error} ({latency})", flush=True)
+            else:
+                print(f"{result.symbol}: {result.price} ({latency})", flush=True)
+        print(
+            f"updated {len(report.updated)} of {len(report.results)} symbols "
+            f"in {report.elapsed:.1f}s",
+            flush=True,
+        )
+
+        stored = price_history.backfill()
+        price_history.record({r.symbol: r.price for r in report.results if r.price is not None})
+        db.session.commit()
+        print(f"appended {sum(stored.values())} daily closes", flush=True)
+
+
+def backfill_history(start: date, end: date, symbols: Optional[List[str]]) -> None:
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        stored = price_history.backfill(symbols, start, end)
+        for symbol, count in sorted(stored.items()):
+            print(f"{symbol}: {count} closes", flush=True)
+        print(f"stored {sum(stored.values())} daily closes", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Refresh prices or backfill daily closes.")
+    parser.add_argument("--start", type=date.fromisoformat, help="first date to backfill")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--symbols", nargs="*", help="symbols to backfill (default: every traded one)")
+    args = parser.parse_args(argv)
+
+    if args.start is None:
+        update_prices()
+        return
+    backfill_history(args.start, args.end, [s.upper() for s in args.symbols] if args.symbols else None)
 
 
 if __name__ == "__main__":
-    update_prices()
+    main()
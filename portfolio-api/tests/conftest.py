@@ -13,6 +13,31 @@ from src.routes.user import user_bp
 from src.routes.portfolio import portfolio_bp, prices_bp
 from src.routes.import_routes import import_bp
 from src.routes.fx import fx_bp
+from src.lib import av_quota, fx_cache
+from src.services.latest_fx import latest_rates
+from src.services.market_data import router as quote_router
+
+
+@pytest.fixture(autouse=True)
+def reset_fx_cache():
+    fx_cache.cache.reset()
+    latest_rates.clear()
+    yield
+    fx_cache.cache.reset()
+    latest_rates.clear()
+
+@pytest.fixture(autouse=True)
+def reset_quote_router():
+    quote_router.reset()
+    yield
+    quote_router.reset()
+
+@pytest.fixture(autouse=True)
+def av_budget(tmp_path, monkeypatch):
+    """Give every test its own, generous Alpha Vantage budget."""
+    quota = av_quota.SharedQuota(tmp_path / "av_quota.db", per_minute=1000, per_day=100000)
+    monkeypatch.setattr(av_quota, "quota", quota)
+    return quota
 
 @pytest.fixture
 def app():
@@ -21,6 +46,9 @@ def app():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['FX_BACKFILL'] = 'off'
+    app.config['PRICE_REVALIDATE'] = 'off'
+    app.config['SYMBOL_ENRICHMENT'] = 'off'
     db.init_app(app)
     with app.app_context():
         db.create_all()
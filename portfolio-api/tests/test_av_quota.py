@@ -0,0 +1,82 @@
+import pytest
+import requests
+
+from src import settings
+from src.lib import av_quota, http_client
+from src.lib.av_quota import BACKGROUND, INTERACTIVE, SharedQuota
+from src.services import market_data
+from src.services.providers import stooq
+
+
+def test_budget_shared_between_workers(tmp_path):
+    path = tmp_path / "quota.db"
+    first = SharedQuota(path, per_minute=3, per_day=100)
+    second = SharedQuota(path, per_minute=3, per_day=100)
+    assert first.acquire(INTERACTIVE)
+    assert second.acquire(INTERACTIVE)
+    assert first.acquire(INTERACTIVE)
+    assert not second.acquire(INTERACTIVE)
+    assert first.remaining()["minute"] < 1
+
+
+def test_background_leaves_reserve(tmp_path):
+    quota = SharedQuota(tmp_path / "quota.db", per_minute=5, per_day=100, reserve=0.4)
+    assert quota.acquire(BACKGROUND)
+    assert quota.acquire(BACKGROUND)
+    assert quota.acquire(BACKGROUND)
+    # Two of five requests are kept for interactive callers.
+    assert not quota.acquire(BACKGROUND)
+    assert quota.acquire(INTERACTIVE)
+    with av_quota.background():
+        assert av_quota.priority.get() == BACKGROUND
+    assert av_quota.priority.get() == INTERACTIVE
+
+
+def test_empty_budget_routes_quotes_to_stooq(monkeypatch, av_budget):
+    market_data._CACHE.clear()
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    av_budget.exhaust("day")
+
+    def fail_av(*args, **kwargs):
+        raise AssertionError("Alpha Vantage must not be called")
+
+    monkeypatch.setattr(http_client, "get", fail_av)
+    monkeypatch.setattr(stooq, "fetch_quotes", lambda symbols, retries=None: {s: 4.5 for s in symbols})
+    assert market_data.fetch_quote("CIG.WA") == 4.5
+
+
+def test_throttle_note_drains_budget(monkeypatch, av_budget):
+    market_data._CACHE.clear()
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+
+    class R:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"Note": "Thank you for using Alpha Vantage!"}
+
+    monkeypatch.setattr(http_client, "get", lambda *a, **k: R())
+    monkeypatch.setattr(stooq, "fetch_quotes", lambda symbols, retries=None: {s: 9.0 for s in symbols})
+    assert market_data.fetch_quote("AAPL") == 9.0
+    assert av_budget.remaining()["minute"] < 1
+
+
+def test_timeout_spends_one_request(monkeypatch, av_budget):
+    market_data._CACHE.clear()
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    monkeypatch.setattr(settings, "HTTP_BACKOFF", 0)
+    http_client.reset()
+    attempts = []
+
+    def timeout(*args, **kwargs):
+        attempts.append(args)
+        raise requests.Timeout("read timed out")
+
+    monkeypatch.setattr(http_client.session("www.alphavantage.co"), "get", timeout)
+    monkeypatch.setattr(stooq, "fetch_quotes", lambda symbols, retries=None: {s: 7.0 for s in symbols})
+    before = av_budget.remaining()["minute"]
+    assert market_data.fetch_quote("IBM") == 7.0
+    assert len(attempts) == 1
+    assert before - av_budget.remaining()["minute"] == pytest.approx(1, abs=0.1)
+    http_client.reset()
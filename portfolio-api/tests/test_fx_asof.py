@@ -0,0 +1,113 @@
+from datetime import date
+
+from src import settings
+from src.lib import fx as lib_fx, http_client
+from src.models.portfolio import ExchangeRate
+from src.models.user import db
+from src.services import fx
+
+FRIDAY = date(2024, 1, 5)
+SATURDAY = date(2024, 1, 6)
+
+
+def _no_network(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("should not call the provider")
+    monkeypatch.setattr(fx, "_fetch_rates", fail)
+    monkeypatch.setattr(http_client, "get", fail)
+    monkeypatch.setattr("src.routes.portfolio.get_fx_rate", lib_fx.get_fx_rate)
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+
+
+def _add(*rows):
+    for dt, rate in rows:
+        db.session.add(ExchangeRate(base="EUR", quote="USD", date=dt, rate=rate))
+    db.session.commit()
+
+
+def test_weekend_uses_previous_trading_day(app, monkeypatch):
+    _no_network(monkeypatch)
+    with app.app_context():
+        _add((date(2024, 1, 4), 1.09), (FRIDAY, 1.1))
+        assert fx.get_rate(SATURDAY, "EUR", "USD") == 1.1
+        assert lib_fx.get_fx_rate("EUR", "USD", date(2024, 1, 7)) == 1.1
+        app.config["PORTFOLIO_BASE_CCY"] = "USD"
+        assert lib_fx.to_base(10, "EUR", SATURDAY) == 11.0
+
+
+def test_weekend_without_recent_rate_downloads_friday(app, monkeypatch):
+    calls = []
+
+    def fake_fetch(dt, base):
+        calls.append((dt, base))
+        return {"USD": 1.1}
+
+    monkeypatch.setattr(fx, "_fetch_rates", fake_fetch)
+    monkeypatch.setattr("src.routes.portfolio.get_fx_rate", lambda *a: None)
+    with app.app_context():
+        assert fx.get_rate(SATURDAY, "EUR", "USD") == 1.1
+        assert fx.get_rate(date(2024, 1, 7), "EUR", "USD") == 1.1
+    assert calls == [(FRIDAY, "EUR")]
+
+
+def test_holiday_inside_series_uses_previous_rate(app, monkeypatch):
+    _no_network(monkeypatch)
+    with app.app_context():
+        lib_fx.store_series("EUR", "USD", {date(2023, 12, 22): 1.1, date(2023, 12, 27): 1.11})
+        assert fx.get_rate(date(2023, 12, 25), "EUR", "USD") == 1.1
+
+
+def test_weekday_gap_between_sparse_rows_downloads(app, monkeypatch):
+    calls = []
+
+    def fake_get(url, params=None, **kwargs):
+        calls.append(params["function"])
+
+        class R:
+            def json(self):
+                return {"Time Series FX (Daily)": {"2024-03-05": {"4. close": "1.2"}}}
+        return R()
+
+    monkeypatch.setattr(http_client, "get", fake_get)
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    with app.app_context():
+        _add((date(2024, 3, 1), 1.1), (date(2024, 3, 8), 1.3))
+        assert lib_fx.as_of_rate("EUR", "USD", date(2024, 3, 5)) is None
+        assert lib_fx.get_fx_rate("EUR", "USD", date(2024, 3, 5)) == 1.2
+    assert calls == ["FX_DAILY"]
+
+
+def test_staleness_limit(app, monkeypatch):
+    _no_network(monkeypatch)
+    monkeypatch.setattr(settings, "FX_MAX_STALENESS_DAYS", 0)
+    with app.app_context():
+        _add((FRIDAY, 1.1), (date(2024, 1, 8), 1.2))
+        assert lib_fx.as_of_rate("EUR", "USD", SATURDAY) is None
+        monkeypatch.setattr(settings, "FX_MAX_STALENESS_DAYS", 5)
+        assert lib_fx.as_of_rate("EUR", "USD", SATURDAY) == 1.1
+
+
+def test_matrix_resolves_weekend_keys(app, monkeypatch):
+    _no_network(monkeypatch)
+    with app.app_context():
+        _add((FRIDAY, 1.1))
+        keys = {("EUR", "USD", SATURDAY)}
+        assert not fx.preload_rates(keys).missing(keys)
+
+
+def test_business_day_without_rate_still_downloads(app, monkeypatch):
+    calls = []
+
+    def fake_fetch(dt, base):
+        calls.append(dt)
+        return {"USD": 1.3}
+
+    monkeypatch.setattr(fx, "_fetch_rates", fake_fetch)
+    monkeypatch.setattr(
+        "src.routes.portfolio.get_fx_rate",
+        lambda *a: (_ for _ in ()).throw(lib_fx.FxDownloadError()),
+    )
+    with app.app_context():
+        _add((FRIDAY, 1.1))
+        assert fx.get_rate(date(2024, 1, 8), "EUR", "USD") == 1.3
+    assert calls == [date(2024, 1, 8)]
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+from src.lib import http_client
+from src.lib.fx import is_business_day
+from src.models.user import db
+from src.models.portfolio import ExchangeRate
+from src.services import fx_backfill
+
+
+class _Resp:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+HOLIDAY = date(2024, 1, 2)
+
+
+def _weekdays(start, end):
+    return sum(is_business_day(start + timedelta(days=i)) for i in range((end - start).days + 1))
+
+
+def _fake_timeseries(calls):
+    def fake_get(url, params=None, **kwargs):
+        if not url.endswith('/timeseries'):
+            return _Resp({})
+        calls.append(params)
+        start = date.fromisoformat(params['start_date'])
+        end = date.fromisoformat(params['end_date'])
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        # Like the real providers, publish nothing on weekends or on 2024-01-02.
+        days = [d for d in days if is_business_day(d) and d != HOLIDAY]
+        return _Resp({'rates': {d.isoformat(): {params['symbols']: 1.1} for d in days}})
+    return fake_get
+
+
+def test_backfill_fills_gaps_with_one_download(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, 'get', _fake_timeseries(calls))
+    start = date(2024, 1, 1)
+    with app.app_context():
+        db.session.add(ExchangeRate(base='EUR', quote='USD', date=date(2024, 1, 3), rate=1.0))
+        db.session.commit()
+        inserted = fx_backfill.backfill('EUR', 'USD', start, date(2024, 1, 10))
+        assert inserted == 6
+        assert ExchangeRate.query.filter_by(base='EUR', quote='USD').count() == 7
+        assert fx_backfill.missing_dates(
+            'EUR', 'USD', start, date(2024, 1, 10), business_days=True
+        ) == [HOLIDAY]
+        assert fx_backfill.backfill('EUR', 'USD', start, date(2024, 1, 10)) == 0
+    assert len(calls) == 1
+    assert calls[0]['start_date'] == '2024-01-01'
+
+
+def test_backfill_splits_long_ranges(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, 'get', _fake_timeseries(calls))
+    with app.app_context():
+        inserted = fx_backfill.backfill('EUR', 'USD', date(2020, 1, 1), date(2021, 12, 30))
+        assert inserted == _weekdays(date(2020, 1, 1), date(2021, 12, 30))
+        assert len(calls) == 2
+        # Weekends stay without rates but are not downloaded again.
+        assert fx_backfill.backfill('EUR', 'USD', date(2020, 1, 1), date(2021, 12, 30)) == 0
+    assert len(calls) == 2
+
+
+def test_backdated_trade_backfills(app, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, 'get', _fake_timeseries(calls))
+    monkeypatch.setattr('src.routes.portfolio.get_fx_rate', lambda *a, **k: 1.1)
+    app.config['FX_BACKFILL'] = 'sync'
+    start = date.today() - timedelta(days=30)
+    resp = client.post('/api/portfolio/transactions', json={
+        'symbol': 'AAPL',
+        'transaction_type': 'buy',
+        'quantity': 1,
+        'price_per_share': 100.0,
+        'transaction_date': start.isoformat(),
+        'currency': 'EUR',
+    })
+    assert resp.status_code == 201
+    assert len(calls) == 1
+    with app.app_context():
+        assert ExchangeRate.query.filter_by(base='EUR', quote='USD').count() == _weekdays(
+            start, date.today()
+        )
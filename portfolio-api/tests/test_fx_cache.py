@@ -0,0 +1,63 @@
+from datetime import date
+
+from src.lib import fx_cache
+from src.lib.fx_cache import RateCache
+from src.models.user import db
+from src.models.portfolio import ExchangeRate
+from src.services import fx
+
+DAY = date(2024, 1, 1)
+
+
+def _seed(app, rate=10.0):
+    with app.app_context():
+        db.session.add(ExchangeRate(base="USD", quote="SEK", date=DAY, rate=rate))
+        db.session.commit()
+
+
+def test_repeated_lookups_hit_cache(app):
+    _seed(app)
+    with app.app_context():
+        assert fx.get_rate(DAY, "USD", "SEK") == 10.0
+    with app.app_context():
+        ExchangeRate.query.delete()
+        db.session.commit()
+        assert fx.get_rate(DAY, "USD", "SEK") == 10.0
+    stats = fx_cache.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_manual_override_invalidates(app, client):
+    _seed(app)
+    with app.app_context():
+        assert fx.get_rate(DAY, "USD", "SEK") == 10.0
+    resp = client.post("/api/fx/override", json={
+        "date": DAY.isoformat(), "base": "USD", "quote": "SEK", "rate": 11.0,
+    })
+    assert resp.status_code == 200
+    with app.app_context():
+        assert fx.get_rate(DAY, "USD", "SEK") == 11.0
+    assert client.get("/api/fx/cache").get_json()["size"] == 1
+
+
+def test_version_stamp_from_other_worker(app):
+    _seed(app)
+    with app.app_context():
+        assert fx.get_rate(DAY, "USD", "SEK") == 10.0
+        # Another worker overrides the rate and bumps the shared stamp.
+        ExchangeRate.query.filter_by(base="USD", quote="SEK").update({"rate": 12.0})
+        fx_cache.bump_version()
+        db.session.commit()
+    with app.app_context():
+        assert fx.get_rate(DAY, "USD", "SEK") == 12.0
+
+
+def test_lru_is_bounded():
+    cache = RateCache(maxsize=2)
+    cache.put(("USD", "SEK", DAY), 1.0)
+    cache.put(("USD", "EUR", DAY), 2.0)
+    assert cache.get(("USD", "SEK", DAY)) == 1.0
+    cache.put(("USD", "GBP", DAY), 3.0)
+    assert cache.get(("USD", "EUR", DAY)) is None
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+import pytest
+
+from src.lib import fx, http_client
+from src.models.portfolio import ExchangeRate
+from src.models.user import db
+
+
+def _fake_av(calls, days):
+    def fake_get(url, params=None, **kwargs):
+        calls.append(params)
+
+        class R:
+            def json(self_inner):
+                series = {
+                    (date(2024, 1, 1) + timedelta(days=i)).isoformat(): {"4. close": str(1.0 + i / 100)}
+                    for i in range(days)
+                }
+                return {"Time Series FX (Daily)": series}
+
+        return R()
+    return fake_get
+
+
+def test_series_persisted_in_one_call(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, "get", _fake_av(calls, 30))
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    with app.app_context():
+        db.session.add(ExchangeRate(base="EUR", quote="USD", date=date(2024, 1, 2), rate=0.5))
+        db.session.commit()
+        assert fx.get_fx_rate("EUR", "USD", date(2024, 1, 5)) == 1.04
+        for i in range(30):
+            assert fx.get_fx_rate("EUR", "USD", date(2024, 1, 1) + timedelta(days=i)) == 1.0 + i / 100
+        assert ExchangeRate.query.filter_by(base="EUR", quote="USD").count() == 30
+    assert len(calls) == 1
+    # Dates older than the compact window request the full history.
+    assert calls[0]["outputsize"] == "full"
+
+
+def test_missing_date_raises_after_storing(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, "get", _fake_av(calls, 3))
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    with app.app_context():
+        with pytest.raises(fx.FxDownloadError):
+            fx.get_fx_rate("EUR", "USD", date(2024, 2, 1))
+        assert ExchangeRate.query.count() == 3
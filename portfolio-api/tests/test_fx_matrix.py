@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from src.models.user import db
+from src.models.portfolio import Stock, Transaction, ExchangeRate
+from src.services import fx
+
+
+def _seed(app, count):
+    start = date(2024, 1, 1)
+    with app.app_context():
+        stock = Stock(symbol="SAP", current_price=100.0)
+        db.session.add(stock)
+        for i in range(count):
+            day = start + timedelta(days=i)
+            db.session.add(Transaction(
+                stock=stock,
+                transaction_type="buy",
+                quantity=1,
+                price_per_share=90.0,
+                currency="EUR",
+                fee_amount=1.0,
+                fee_currency="SEK",
+                transaction_date=day,
+            ))
+            db.session.add(ExchangeRate(base="EUR", quote="USD", date=day, rate=1.1))
+            db.session.add(ExchangeRate(base="SEK", quote="USD", date=day, rate=0.1))
+        db.session.commit()
+    return start + timedelta(days=count - 1)
+
+
+def _fx_queries(app, client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "exchange_rates" in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        resp = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert resp.status_code == 200
+    return resp.get_json(), len(statements)
+
+
+def test_history_loads_rates_in_one_query(app, client, monkeypatch):
+    monkeypatch.setattr(fx, "_fetch_rates", lambda *a: (_ for _ in ()).throw(AssertionError))
+    end = _seed(app, 40)
+    data, count = _fx_queries(
+        app, client, f"/api/portfolio/history?start=2024-01-01&end={end.isoformat()}"
+    )
+    assert count == 1
+    assert data["history"][-1]["market_value_only"] == round(40 * (100.0 - 99.1), 2)
+
+
+def test_matrix_miss_falls_back_to_download(app, monkeypatch):
+    monkeypatch.setattr(fx, "get_fx_rate", lambda *a: (_ for _ in ()).throw(fx.FxDownloadError()))
+    monkeypatch.setattr("src.routes.portfolio.get_fx_rate", fx.get_fx_rate)
+    monkeypatch.setattr(fx, "_fetch_rates", lambda dt, base: {"SEK": 10.0})
+    with app.app_context():
+        db.session.add(ExchangeRate(base="USD", quote="EUR", date=date(2024, 1, 1), rate=0.9))
+        db.session.commit()
+        keys = {("USD", "EUR", date(2024, 1, 1)), ("USD", "SEK", date(2024, 1, 1))}
+        matrix = fx.preload_rates(keys)
+        assert matrix.missing(keys) == {("USD", "SEK", date(2024, 1, 1))}
+
+        assert fx.get_rate(date(2024, 1, 1), "USD", "EUR") == 0.9
+        assert fx.get_rate(date(2024, 1, 1), "USD", "SEK") == 10.0
+        assert not matrix.missing(keys)
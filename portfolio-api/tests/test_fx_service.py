@@ -59,3 +59,67 @@ def test_get_rate_provider_failure(monkeypatch, app):
     with app.app_context():
         with pytest.raises(fx.FxDownloadError):
             fx.get_rate(date(2024, 1, 1), "USD", "SEK")
+
+
+def _no_download(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("should derive without the provider")
+    monkeypatch.setattr(fx, "_fetch_rates", fail)
+    monkeypatch.setattr("src.routes.portfolio.get_fx_rate", fail)
+
+
+def test_get_rate_inverse_and_cross(monkeypatch, app):
+    _no_download(monkeypatch)
+    day = date(2024, 1, 1)
+    from src.models.user import db
+    with app.app_context():
+        db.session.add(ExchangeRate(base="USD", quote="SEK", date=day, rate=10.0))
+        db.session.add(ExchangeRate(base="USD", quote="EUR", date=day, rate=0.8))
+        db.session.commit()
+
+        assert fx.get_rate(day, "SEK", "USD") == 0.1
+        assert round(fx.get_rate(day, "EUR", "SEK"), 6) == 12.5
+        sources = {
+            (r.base, r.quote): r.source
+            for r in ExchangeRate.query.filter(ExchangeRate.source.isnot(None))
+        }
+    assert sources == {("SEK", "USD"): "derived:inverse", ("EUR", "SEK"): "derived:cross:USD"}
+
+
+def test_override_drops_derived_rates(monkeypatch, app, client):
+    _no_download(monkeypatch)
+    day = date(2024, 1, 1)
+    from src.models.user import db
+    with app.app_context():
+        db.session.add(ExchangeRate(base="USD", quote="SEK", date=day, rate=10.0))
+        db.session.commit()
+        assert fx.get_rate(day, "SEK", "USD") == 0.1
+
+    resp = client.post("/api/fx/override", json={
+        "date": "2024-01-01", "base": "USD", "quote": "SEK", "rate": 5.0,
+    })
+    assert resp.status_code == 200
+    with app.app_context():
+        assert fx.get_rate(day, "SEK", "USD") == 0.2
+
+
+def test_download_retries_only_outside_requests(monkeypatch, app):
+    calls = []
+
+    class R:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"rates": {"SEK": 10.0}}
+
+    def fake_get(url, params=None, retries=None, **kwargs):
+        calls.append(retries)
+        return R()
+
+    monkeypatch.setattr(fx.http_client, "get", fake_get)
+    with app.test_request_context("/api/portfolio/summary?base=SEK"):
+        assert fx._download_rates(date(2024, 1, 1), "USD") == {"SEK": 10.0}
+    with app.app_context():
+        fx._download_rates(date(2024, 1, 1), "USD")
+    assert calls == [0, None]
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from src.lib import fx_cache
+from src.lib.fx import upsert_rates
+from src.models.portfolio import CacheVersion, ExchangeRate
+from src.models.user import db
+
+
+def _rows(count, rate=1.0, source=None):
+    return [
+        {"base": "EUR", "quote": "USD", "date": date(2020, 1, 1) + timedelta(days=i),
+         "rate": rate, "source": source}
+        for i in range(count)
+    ]
+
+
+def _version():
+    return db.session.query(CacheVersion.version).filter_by(name="fx").scalar()
+
+
+def test_upsert_inserts_updates_and_skips(app):
+    with app.app_context():
+        assert upsert_rates(_rows(3)) == 3
+        db.session.commit()
+        assert _version() is None
+
+        rows = _rows(4)
+        rows[0]["rate"] = 2.0
+        assert upsert_rates(rows) == 2
+        db.session.commit()
+        assert _version() == 1
+
+        assert upsert_rates(_rows(1, rate=2.0, source="manual")) == 1
+        db.session.commit()
+        rec = ExchangeRate.query.filter_by(date=date(2020, 1, 1)).one()
+        assert (rec.rate, rec.source) == (2.0, "manual")
+        assert ExchangeRate.query.count() == 4
+        assert fx_cache.lookup("EUR", "USD", date(2020, 1, 1)) == 2.0
+
+
+def test_upsert_statement_count(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+        def count(conn, cursor, statement, *args):
+            if statement.startswith("INSERT"):
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            assert upsert_rates(_rows(1200)) == 1200
+            db.session.commit()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert ExchangeRate.query.count() == 1200
+    # Rows are sent as multi-row INSERT ... ON CONFLICT pages, not one by one.
+    assert 1 <= len(statements) <= 3
+
+
+def test_mixed_write_sends_rows_once(app):
+    statements = []
+    with app.app_context():
+        upsert_rates(_rows(3))
+        db.session.commit()
+        engine = db.engine
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement.split()[0])
+
+        rows = _rows(5)
+        rows[1]["rate"] = 3.0
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            assert upsert_rates(rows) == 3
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        db.session.commit()
+        assert _version() == 1
+    # One select of the stored ids, one INSERT ... ON CONFLICT DO UPDATE, and
+    # the version bump for the changed row.
+    assert statements[:2] == ["SELECT", "INSERT"]
+    assert statements.count("INSERT") == 1
@@ -0,0 +1,195 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.portfolio import Stock, Transaction
+from src.models.user import db
+from src.services import fx as services_fx
+from src.services.history import lttb, sample_days, to_points, value_history
+from src.services.holdings import fee_to_ccy, trade_value_base
+from src.services.price_history import CloseSeries
+
+
+def _portfolio(seed=7, count=300):
+    rng = random.Random(seed)
+    stocks = {i: Stock(id=i, symbol=f'S{i}', current_price=rng.uniform(5, 50)) for i in range(1, 6)}
+    transactions = []
+    for _ in range(count):
+        sid = rng.choice(list(stocks))
+        transactions.append(Transaction(
+            stock_id=sid,
+            transaction_type=rng.choice(['buy', 'buy', 'sell']),
+            quantity=rng.randint(1, 20),
+            price_per_share=rng.uniform(5, 50),
+            currency='USD',
+            fee_amount=rng.choice([0, 1.5]),
+            transaction_date=date(2023, 6, 1) + timedelta(days=rng.randint(0, 400)),
+        ))
+    transactions.sort(key=lambda t: t.transaction_date)
+    closes = {}
+    for sid in (1, 2, 3):
+        days = sorted(rng.sample(range(500), 200))
+        closes[f'S{sid}'] = CloseSeries(
+            [date(2023, 5, 1) + timedelta(days=d) for d in days],
+            [rng.uniform(5, 50) for _ in days],
+        )
+    return stocks, transactions, closes
+
+
+def _day_loop(transactions, stocks, start, end, closes):
+    """Replay the transactions one day at a time (the reference result)."""
+    history = []
+    holdings = {sid: 0 for sid in stocks}
+    contributions = 0.0
+    idx = 0
+    current = start
+    while current <= end:
+        while idx < len(transactions) and transactions[idx].transaction_date <= current:
+            t = transactions[idx]
+            value = t.quantity * t.price_per_share
+            fee = float(t.fee_amount or 0)
+            if t.transaction_type == 'buy':
+                holdings[t.stock_id] += t.quantity
+                contributions += value + fee
+            else:
+                holdings[t.stock_id] -= t.quantity
+                contributions -= value - fee
+            idx += 1
+        market_value = 0.0
+        for sid, qty in holdings.items():
+            series = closes.get(stocks[sid].symbol)
+            price = series.as_of(current) if series else stocks[sid].current_price
+            market_value += qty * price
+        history.append((current.isoformat(), market_value - contributions, market_value))
+        current += timedelta(days=1)
+    return history
+
+
+@pytest.mark.parametrize('start, end', [
+    (date(2023, 6, 1), date(2024, 8, 1)),
+    (date(2023, 9, 15), date(2024, 1, 31)),
+    (date(2024, 12, 1), date(2024, 12, 3)),
+])
+def test_value_history_matches_day_loop(app, start, end):
+    stocks, transactions, closes = _portfolio()
+    with app.app_context():
+        frame = value_history(transactions, stocks, start, end, 'USD', closes)
+    expected = _day_loop(transactions, stocks, start, end, closes)
+    assert len(frame) == len(expected)
+    for (day, only, total), point in zip(expected, to_points(frame)):
+        assert point['date'] == day
+        assert point['market_value_only'] == pytest.approx(only, abs=0.011)
+        assert point['with_contributions'] == pytest.approx(total, abs=0.011)
+
+
+def test_value_history_without_transactions_in_range(app):
+    stocks, _, _ = _portfolio()
+    with app.app_context():
+        frame = value_history([], stocks, date(2024, 1, 1), date(2024, 1, 3), 'USD', {})
+    assert to_points(frame) == [
+        {'date': f'2024-01-0{d}', 'market_value_only': 0.0, 'with_contributions': 0.0}
+        for d in (1, 2, 3)
+    ]
+
+
+def test_value_history_converts_once_per_currency_and_day(app, monkeypatch):
+    calls = []
+
+    def get_rate(dt, base, quote):
+        calls.append((base, dt))
+        return {'SEK': 0.1, 'EUR': 1.1}[base] * (1 + dt.day / 100)
+
+    monkeypatch.setattr(services_fx, 'get_rate', get_rate)
+    stocks = {1: Stock(id=1, symbol='A', current_price=10.0), 2: Stock(id=2, symbol='B', current_price=5.0)}
+    day = date(2024, 3, 4)
+    transactions = [
+        Transaction(stock_id=1, transaction_type='buy', quantity=10, price_per_share=100.0,
+                    currency='SEK', fee_amount=2.0, fee_currency='EUR', transaction_date=day),
+        Transaction(stock_id=2, transaction_type='buy', quantity=3, price_per_share=50.0,
+                    currency='SEK', fee_amount=5.0, transaction_date=day),
+        Transaction(stock_id=1, transaction_type='sell', quantity=4, price_per_share=120.0,
+                    currency='EUR', fee_amount=1.0, fee_currency='USD',
+                    transaction_date=day + timedelta(days=1)),
+        Transaction(stock_id=2, transaction_type='buy', quantity=1, price_per_share=7.0,
+                    currency='USD', fee_amount=0, fee_currency='SEK',
+                    transaction_date=day + timedelta(days=1)),
+    ]
+    with app.app_context():
+        frame = value_history(transactions, stocks, day, day + timedelta(days=1), 'USD', {})
+        # SEK and EUR on the 4th, EUR on the 5th; zero fees need no rate.
+        assert calls == [('SEK', day), ('EUR', day), ('EUR', day + timedelta(days=1))]
+        invested = 0.0
+        for t in transactions:
+            trade, fee = trade_value_base(t), fee_to_ccy(t, 'USD', 'USD')
+            invested += trade + fee if t.transaction_type == 'buy' else -(trade - fee)
+    last = frame.iloc[-1]
+    assert last['with_contributions'] == pytest.approx(6 * 10.0 + 4 * 5.0)
+    assert last['market_value_only'] == pytest.approx(6 * 10.0 + 4 * 5.0 - invested)
+
+
+def test_sample_days_keeps_last_day_of_each_period():
+    def dates(granularity):
+        return [date.fromordinal(int(d)) for d in sample_days(date(2024, 1, 10), date(2024, 3, 5), granularity)]
+
+    assert len(dates('day')) == len(dates('hour')) == 56
+    assert dates('month') == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 5)]
+    weeks = dates('week')
+    assert weeks[0] == date(2024, 1, 14)
+    assert all(d.weekday() == 6 for d in weeks[:-1])
+    assert weeks[-1] == date(2024, 3, 5)
+
+
+def test_sampled_history_matches_daily_values(app):
+    stocks, transactions, closes = _portfolio()
+    start, end = date(2023, 6, 1), date(2024, 8, 1)
+    days = sample_days(start, end, 'month')
+    with app.app_context():
+        daily = value_history(transactions, stocks, start, end, 'USD', closes)
+        monthly = value_history(transactions, stocks, start, end, 'USD', closes, days)
+    assert len(monthly) == 15
+    pd.testing.assert_frame_equal(monthly, daily.loc[monthly.index])
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    y = np.sin(np.linspace(0, 20, 2000))
+    y[1234] = 10.0
+    y[321] = -10.0
+    frame = pd.DataFrame(
+        {'with_contributions': y, 'market_value_only': y},
+        index=pd.date_range('2000-01-01', periods=2000, name='date'),
+    )
+    sampled = lttb(frame, 100)
+    assert len(sampled) == 100
+    assert sampled.index[0] == frame.index[0]
+    assert sampled.index[-1] == frame.index[-1]
+    assert sampled.index.is_monotonic_increasing
+    assert sampled['with_contributions'].max() == 10.0
+    assert sampled['with_contributions'].min() == -10.0
+    assert len(lttb(frame, 2)) == 2
+    assert lttb(frame, 5000) is frame
+
+
+def test_history_route_downsamples(client, app):
+    with app.app_context():
+        stock = Stock(symbol='AAPL', current_price=10.0)
+        db.session.add(stock)
+        db.session.add(Transaction(
+            stock=stock, transaction_type='buy', quantity=1, price_per_share=5.0,
+            currency='USD', transaction_date=date.today() - timedelta(days=3000),
+        ))
+        db.session.commit()
+
+    data = client.get('/api/portfolio/history?range=5Y').get_json()
+    assert data['granularity'] == 'month'
+    assert 60 <= len(data['history']) <= 62
+    assert data['history'][-1]['date'] == date.today().isoformat()
+    assert data['history'][-1]['with_contributions'] == 10.0
+
+    data = client.get('/api/portfolio/history?range=MAX&points=50').get_json()
+    assert len(data['history']) == 50
+
+    resp = client.get('/api/portfolio/history?range=1Y&points=1')
+    assert resp.status_code == 400
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from src.models.user import db
+from src.models.portfolio import PriceCache, Stock, Transaction, Position
+from src.services import quote_refresh
+from src.services.positions import rebuild_positions
+from src.services.quote_refresh import QuoteResult
+
+
+def _seed(app, count):
+    with app.app_context():
+        for i in range(count):
+            stock = Stock(symbol=f"S{i}", current_price=20.0)
+            db.session.add(stock)
+            db.session.add(Transaction(
+                stock=stock,
+                transaction_type="buy",
+                quantity=10,
+                price_per_share=10.0,
+                currency="USD",
+                fee_amount=1.0,
+                transaction_date=date(2024, 1, 1),
+            ))
+            db.session.add(Transaction(
+                stock=stock,
+                transaction_type="sell",
+                quantity=4,
+                price_per_share=15.0,
+                currency="USD",
+                transaction_date=date(2024, 2, 1),
+            ))
+        db.session.flush()
+        rebuild_positions("USD")
+        db.session.commit()
+
+
+@contextmanager
+def _count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _query_counts(app, client, stocks):
+    _seed(app, stocks)
+    counts = {}
+    for path in ("/api/portfolio/stocks", "/api/portfolio/summary"):
+        with _count_queries(app) as statements:
+            resp = client.get(path)
+        assert resp.status_code == 200
+        counts[path] = len(statements)
+    return counts
+
+
+def test_query_count_constant_in_stock_count(app, client):
+    small = _query_counts(app, client, 2)
+    with app.app_context():
+        Position.query.delete()
+        Transaction.query.delete()
+        Stock.query.delete()
+        db.session.commit()
+    large = _query_counts(app, client, 25)
+    assert small == large
+
+
+def test_holdings_figures(app, client):
+    _seed(app, 1)
+    stocks = client.get("/api/portfolio/stocks").get_json()
+    assert stocks[0]["quantity"] == 6
+    assert stocks[0]["avg_cost_basis"] == 10.1
+    assert stocks[0]["fees_paid"] == 1.0
+
+    summary = client.get("/api/portfolio/summary").get_json()
+    assert summary["total_cost_basis"] == 60.6
+    assert summary["total_value"] == 120.0
+    assert summary["net_gain_after_fees"] == 120.0 - (101.0 - 60.0)
+
+
+def _expired_stocks_queries(app, client, stocks):
+    _seed(app, stocks)
+    with app.app_context():
+        Stock.query.update({Stock.last_updated: datetime(2020, 1, 1)})
+        db.session.commit()
+    with _count_queries(app) as statements:
+        resp = client.get("/api/portfolio/stocks")
+    assert resp.status_code == 200
+    assert {s["current_price"] for s in resp.get_json()} == {25.0}
+    return len(statements)
+
+
+def test_expired_prices_keep_query_count_constant(app, client, monkeypatch):
+    monkeypatch.setattr(
+        quote_refresh, "fetch_quotes",
+        lambda symbols, *args, **kwargs: [QuoteResult(s, 25.0) for s in symbols],
+    )
+    small = _expired_stocks_queries(app, client, 3)
+    with app.app_context():
+        PriceCache.query.delete()
+        Position.query.delete()
+        Transaction.query.delete()
+        Stock.query.delete()
+        db.session.commit()
+    assert _expired_stocks_queries(app, client, 30) == small
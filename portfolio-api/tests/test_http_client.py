@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src import settings
+from src.lib import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_BACKOFF", 0)
+    http_client.reset()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.connections = set()
+    srv.statuses = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    http_client.reset()
+    srv.shutdown()
+    srv.server_close()
+
+
+def _url(srv):
+    host, port = srv.server_address
+    return f"http://{host}:{port}/query"
+
+
+def test_connections_are_reused(server):
+    for _ in range(3):
+        assert http_client.get(_url(server), params={"symbol": "AAPL"}).json() == {"ok": True}
+    assert len(server.connections) == 1
+    host = _url(server).split("/")[2]
+    assert http_client.session(host) is http_client.session(host)
+    assert http_client.stats()[host]["requests"] == 3
+
+
+def test_retries_transient_statuses(server):
+    server.statuses = [503, 502]
+    resp = http_client.get(_url(server))
+    assert resp.status_code == 200
+    (stats,) = http_client.stats().values()
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (3, 2, 2)
+
+
+def test_returns_last_response_when_retries_run_out(server):
+    server.statuses = [503, 503]
+    assert http_client.get(_url(server), retries=1).status_code == 503
+    server.statuses = [404]
+    assert http_client.get(_url(server)).status_code == 404
+    (stats,) = http_client.stats().values()
+    assert stats["retries"] == 1
+
+
+def test_connection_errors_raise_after_retries(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_BACKOFF", 0)
+    http_client.reset()
+    with pytest.raises(requests.ConnectionError):
+        http_client.get("http://127.0.0.1:9/unreachable", timeout=0.5)
+    stats = http_client.stats()["127.0.0.1:9"]
+    assert (stats["errors"], stats["retries"]) == (settings.HTTP_RETRIES + 1, settings.HTTP_RETRIES)
+    http_client.reset()
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_BACKOFF", 1.0)
+    monkeypatch.setattr(settings, "HTTP_BACKOFF_MAX", 3.0)
+    delays = {http_client.backoff(5) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(0 <= d <= 3.0 for d in delays)
+    assert http_client.backoff(0, retry_after="2") >= 2.0
+
+
+def test_http_stats_endpoint(client, server):
+    http_client.get(_url(server))
+    (stats,) = client.get("/api/prices/http").get_json().values()
+    assert stats["requests"] == 1 and "p95_ms" in stats
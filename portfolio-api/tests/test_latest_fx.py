@@ -0,0 +1,86 @@
+import time
+from datetime import date, timedelta
+
+from src.models.user import db
+from src.models.portfolio import ExchangeRate, Stock
+from src.services.latest_fx import latest_rates
+
+
+def _fail_network(*args, **kwargs):
+    raise AssertionError("display conversion must not call the network")
+
+
+def _setup(app, monkeypatch, as_of):
+    scheduled = []
+    monkeypatch.setattr('src.lib.http_client.get', _fail_network)
+    monkeypatch.setattr(latest_rates, '_schedule', scheduled.append)
+    with app.app_context():
+        db.session.add(Stock(symbol='AAPL', current_price=100.0))
+        db.session.add(ExchangeRate(base='USD', quote='SEK', date=as_of, rate=10.0))
+        db.session.commit()
+    return scheduled
+
+
+def test_base_conversion_uses_stored_rate(app, client, monkeypatch):
+    as_of = date.today() - timedelta(days=2)
+    scheduled = _setup(app, monkeypatch, as_of)
+
+    resp = client.get('/api/portfolio/stocks/AAPL?base=SEK')
+    data = resp.get_json()
+    assert data['current_price'] == 1000.0
+    assert data['fx_rate'] == 10.0
+    assert data['fx_rate_date'] == as_of.isoformat()
+    assert data['fx_rate_age_days'] == 2
+
+    resp = client.get('/api/portfolio/stocks?base=SEK')
+    assert resp.headers['X-Base-Currency'] == 'SEK'
+    assert resp.headers['X-Fx-Rate'] == '10.0'
+    assert resp.headers['X-Fx-Rate-Age-Days'] == '2'
+
+    summary = client.get('/api/portfolio/summary?base=SEK').get_json()
+    assert summary['base_currency'] == 'SEK'
+    assert summary['fx_rate_age_days'] == 2
+    # Fresh in-memory entry: no refresh queued.
+    assert scheduled == []
+
+
+def test_inverse_rate_and_missing_pair(app, client, monkeypatch):
+    scheduled = _setup(app, monkeypatch, date.today())
+    with app.app_context():
+        rate = latest_rates.get('SEK', 'USD')
+        assert rate.rate == 0.1
+        assert latest_rates.get('USD', 'NOK') is None
+    assert scheduled == [('USD', 'NOK')]
+
+    summary = client.get('/api/portfolio/summary?base=NOK').get_json()
+    assert summary['base_currency'] == 'USD'
+    assert summary['fx_rate'] is None
+
+    # Without a rate the list stays in USD and says so.
+    resp = client.get('/api/portfolio/stocks?base=NOK')
+    assert resp.headers['X-Base-Currency'] == 'USD'
+    assert 'X-Fx-Rate' not in resp.headers
+    assert client.get('/api/portfolio/stocks').headers['X-Base-Currency'] == 'USD'
+
+
+def test_stale_entry_refreshes_in_background(app, client, monkeypatch):
+    scheduled = _setup(app, monkeypatch, date.today() - timedelta(days=1))
+    with app.app_context():
+        latest_rates.get('USD', 'SEK')
+        entry = latest_rates._rates[('USD', 'SEK')]
+        latest_rates._rates[('USD', 'SEK')] = entry.__class__(
+            entry.rate, entry.as_of, time.time() - latest_rates.ttl - 1
+        )
+        assert latest_rates.get('USD', 'SEK').rate == 10.0
+    assert scheduled == [('USD', 'SEK')]
+
+    def fake_get_rate(dt, base, quote):
+        db.session.add(ExchangeRate(base=base, quote=quote, date=dt, rate=11.0))
+        db.session.commit()
+        return 11.0
+
+    monkeypatch.setattr('src.services.fx.get_rate', fake_get_rate)
+    with app.app_context():
+        refreshed = latest_rates.refresh('USD', 'SEK')
+    assert refreshed.rate == 11.0
+    assert refreshed.age_days == 0
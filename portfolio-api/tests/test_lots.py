@@ -0,0 +1,86 @@
+import pytest
+
+
+def _trade(client, side, qty, price, day, **extra):
+    tx = {
+        'symbol': 'AAPL',
+        'transaction_type': side,
+        'quantity': qty,
+        'price_per_share': price,
+        'transaction_date': f'2024-01-{day:02d}',
+    }
+    tx.update(extra)
+    resp = client.post('/api/portfolio/transactions', json=tx)
+    assert resp.status_code == 201
+    return resp.get_json()['id']
+
+
+def _report(client):
+    stocks = client.get('/api/portfolio/stocks').get_json()
+    summary = client.get('/api/portfolio/summary').get_json()
+    assert stocks[0]['cost_basis'] == summary['total_cost_basis']
+    return stocks[0]['cost_basis'], summary['total_realized_gain']
+
+
+@pytest.mark.parametrize('method, basis, realized', [
+    ('fifo', 200.0, 200.0),
+    ('lifo', 100.0, 100.0),
+    ('average', 150.0, 150.0),
+])
+def test_cost_basis_methods(client, monkeypatch, method, basis, realized):
+    monkeypatch.setenv('COST_BASIS_METHOD', method)
+    _trade(client, 'buy', 10, 10.0, 1)
+    _trade(client, 'buy', 10, 20.0, 2)
+    _trade(client, 'sell', 10, 30.0, 3)
+    assert _report(client) == (basis, realized)
+
+
+def test_specific_lot_selection(client, monkeypatch):
+    monkeypatch.setenv('COST_BASIS_METHOD', 'specific')
+    _trade(client, 'buy', 10, 10.0, 1)
+    second = _trade(client, 'buy', 10, 20.0, 2)
+    _trade(client, 'sell', 5, 30.0, 3,
+           lot_selection=[{'transaction_id': second, 'quantity': 5}])
+    assert _report(client) == (200.0, 50.0)
+
+    lots = client.get('/api/portfolio/stocks/AAPL/lots').get_json()
+    assert lots['method'] == 'specific'
+    assert [(l['transaction_id'], l['remaining']) for l in lots['lots']] == [
+        (second - 1, 10.0),
+        (second, 5.0),
+    ]
+
+
+def test_invalid_method_returns_json_error(client, monkeypatch):
+    _trade(client, 'buy', 10, 10.0, 1)
+    monkeypatch.setenv('COST_BASIS_METHOD', 'hifo')
+    resp = client.get('/api/portfolio/stocks/AAPL/lots')
+    assert resp.status_code == 500
+    assert resp.get_json() == {'error': 'unsupported COST_BASIS_METHOD: hifo'}
+
+
+def test_backdated_buy_replays_ledger(client):
+    _trade(client, 'buy', 10, 20.0, 2)
+    _trade(client, 'sell', 10, 30.0, 3)
+    _trade(client, 'buy', 10, 10.0, 1)
+    assert _report(client) == (200.0, 200.0)
+
+
+def test_deleting_sell_reopens_lots(client):
+    _trade(client, 'buy', 10, 10.0, 1)
+    sell = _trade(client, 'sell', 4, 15.0, 2)
+    assert _report(client) == (60.0, 20.0)
+    client.delete(f'/api/portfolio/transactions/{sell}')
+    assert _report(client) == (100.0, 0.0)
+
+
+def test_moving_trade_to_lower_stock_id(client):
+    _trade(client, 'buy', 10, 10.0, 1, symbol='MSFT')
+    tx_id = _trade(client, 'buy', 5, 20.0, 2)
+
+    resp = client.put(f'/api/portfolio/transactions/{tx_id}', json={'symbol': 'MSFT'})
+    assert resp.status_code == 200
+
+    lots = client.get('/api/portfolio/stocks/MSFT/lots').get_json()['lots']
+    assert sorted(lot['remaining'] for lot in lots) == [5, 10]
+    assert client.get('/api/portfolio/stocks/AAPL/lots').get_json()['lots'] == []
@@ -1,5 +1,6 @@
 import json
 from pathlib import Path
+from src.lib import http_client
 from src.services import market_data
 from src.services.providers import stooq
 from src.lib import market_data as lib_market_data
@@ -24,8 +25,8 @@ def test_search_aapl_success(monkeypatch, client):
                 return fake_json
         return R()
 
-    monkeypatch.setattr(market_data.requests, "get", fake_get)
-    monkeypatch.setattr(lib_market_data, "get_company_name", lambda s: "Apple Inc.")
+    monkeypatch.setattr(http_client, "get", fake_get)
+    monkeypatch.setattr(lib_market_data, "fetch_metadata", lambda s: {"name": "Apple Inc."})
 
     resp = client.get("/api/portfolio/stocks/search/AAPL")
     assert resp.status_code == 200
@@ -35,15 +36,22 @@ def test_search_aapl_success(monkeypatch, client):
     assert data["company"] == "Apple Inc."
 
 def test_get_company_name(monkeypatch):
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+
     def fake_call_api(self, path, query=None):
         return {
-            "chart": {"result": [{"meta": {"longName": "Apple Inc"}}]}
+            "chart": {"result": [{"meta": {
+                "longName": "Apple Inc", "exchangeName": "NMS", "currency": "usd",
+            }}]}
         }
 
-    monkeypatch.setattr(market_data.ApiClient, "call_api", fake_call_api)
+    monkeypatch.setattr(lib_market_data.ApiClient, "call_api", fake_call_api)
 
-    name = market_data.get_company_name("AAPL")
+    name = lib_market_data.get_company_name("AAPL")
     assert name == "Apple Inc"
+    assert lib_market_data.fetch_metadata("aapl") == {
+        "name": "Apple Inc", "exchange": "NMS", "currency": "USD", "source": "data_api",
+    }
 
 
 def test_fetch_quote_fallback(monkeypatch):
@@ -59,16 +67,19 @@ def test_fetch_quote_fallback(monkeypatch):
         return R()
 
     sample = Path('portfolio-api/tests/stubs/stooq_cig.csv').read_text()
-    def fake_stooq_get(url, timeout=10):
+    def fake_stooq_get(url, **kwargs):
         class R:
             text = sample
             def raise_for_status(self):
                 pass
         return R()
 
-    import types
-    monkeypatch.setattr(market_data, 'requests', types.SimpleNamespace(get=fake_av_get))
-    monkeypatch.setattr(stooq, 'requests', types.SimpleNamespace(get=fake_stooq_get))
+    def fake_get(url, **kwargs):
+        if 'stooq.com' in url:
+            return fake_stooq_get(url, **kwargs)
+        return fake_av_get(url, **kwargs)
+
+    monkeypatch.setattr(http_client, 'get', fake_get)
 
     price = market_data.fetch_quote('CIG.WA')
     assert price == 4.50
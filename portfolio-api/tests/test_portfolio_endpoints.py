@@ -62,7 +62,7 @@ def test_transaction_custom_currency(client, app, monkeypatch):
 
         return R()
 
-    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr('src.lib.http_client.get', fake_get)
     monkeypatch.setenv('ALPHAVANTAGE_API_KEY', 'demo')
 
     data = {
@@ -152,7 +152,7 @@ def test_currency_conversion(client, monkeypatch, app):
 
         return R()
 
-    monkeypatch.setattr('src.lib.fx.requests.get', fake_fx_get)
+    monkeypatch.setattr('src.lib.http_client.get', fake_fx_get)
     monkeypatch.setenv('ALPHAVANTAGE_API_KEY', 'demo')
 
     summary = client.get('/api/portfolio/summary')
@@ -258,7 +258,7 @@ def test_prices_refresh_updates_cache(client, monkeypatch, app):
 
         return R()
 
-    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr('src.lib.http_client.get', fake_get)
 
     resp = client.post('/api/portfolio/prices/refresh', json={})
     assert resp.status_code == 200
@@ -271,7 +271,7 @@ def test_prices_refresh_updates_cache(client, monkeypatch, app):
         assert rec.currency.name == 'USD'
 
 
-def test_update_price_includes_company(client, monkeypatch):
+def test_update_price_includes_company(client, app, monkeypatch):
     tx = {
         'symbol': 'AAPL',
         'transaction_type': 'buy',
@@ -282,7 +282,8 @@ def test_update_price_includes_company(client, monkeypatch):
     client.post('/api/portfolio/transactions', json=tx)
 
     monkeypatch.setattr('src.routes.portfolio.fetch_quote', lambda s: 150.0)
-    monkeypatch.setattr('src.lib.market_data.get_company_name', lambda s: 'Apple Inc.')
+    monkeypatch.setattr('src.lib.market_data.fetch_metadata', lambda s: {'name': 'Apple Inc.'})
+    app.config['SYMBOL_ENRICHMENT'] = 'sync'
 
     resp = client.post('/api/prices/update?symbol=AAPL')
     assert resp.status_code == 200
@@ -290,7 +291,7 @@ def test_update_price_includes_company(client, monkeypatch):
     assert body['company'] == 'Apple Inc.'
 
 
-def test_update_price_alias(client, monkeypatch):
+def test_update_price_alias(client, app, monkeypatch):
     tx = {
         'symbol': 'GOOG',
         'transaction_type': 'buy',
@@ -301,7 +302,8 @@ def test_update_price_alias(client, monkeypatch):
     client.post('/api/portfolio/transactions', json=tx)
 
     monkeypatch.setattr('src.routes.portfolio.fetch_quote', lambda s: 250.0)
-    monkeypatch.setattr('src.lib.market_data.get_company_name', lambda s: 'Google LLC')
+    monkeypatch.setattr('src.lib.market_data.fetch_metadata', lambda s: {'name': 'Google LLC'})
+    app.config['SYMBOL_ENRICHMENT'] = 'sync'
 
     resp = client.post('/api/portfolio/prices/update?symbol=GOOG')
     assert resp.status_code == 200
@@ -427,7 +429,7 @@ def test_fx_fetch_success(client, monkeypatch, app):
                     }
                 }
         return R()
-    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr('src.lib.http_client.get', fake_get)
     tx = {
         'symbol': 'AAPL',
         'transaction_type': 'buy',
@@ -453,7 +455,7 @@ def test_fx_fetch_quota_exceeded(client, monkeypatch, app):
             def json(self_inner):
                 return {"Note": "limit"}
         return R()
-    monkeypatch.setattr('requests.get', fake_get)
+    monkeypatch.setattr('src.lib.http_client.get', fake_get)
     tx = {
         'symbol': 'AAPL',
         'transaction_type': 'buy',
@@ -0,0 +1,83 @@
+from datetime import date
+
+from src.models.user import db
+from src.models.portfolio import Position, Stock, ExchangeRate
+from src.services.positions import rebuild_positions
+
+
+def _post(client, **overrides):
+    tx = {
+        'symbol': 'AAPL',
+        'transaction_type': 'buy',
+        'quantity': 10,
+        'price_per_share': 10.0,
+        'transaction_date': '2024-01-01',
+        'fee_amount': 1.0,
+    }
+    tx.update(overrides)
+    resp = client.post('/api/portfolio/transactions', json=tx)
+    assert resp.status_code == 201
+    return resp.get_json()['id']
+
+
+def _position(symbol):
+    stock = Stock.query.filter_by(symbol=symbol).first()
+    return Position.query.filter_by(stock_id=stock.id).first()
+
+
+def test_position_tracks_writes(client, app):
+    _post(client)
+    sell_id = _post(client, transaction_type='sell', quantity=4, price_per_share=15.0,
+                    transaction_date='2024-02-01', fee_amount=None)
+    with app.app_context():
+        pos = _position('AAPL')
+        assert not pos.stale
+        assert (pos.quantity, pos.total_bought, pos.total_sold) == (6, 10, 4)
+        assert round(pos.cost_basis, 2) == 60.6
+        assert round(pos.fees, 2) == 1.0
+        assert round(pos.contributions, 2) == 41.0
+
+    resp = client.put(f'/api/portfolio/transactions/{sell_id}', json={'quantity': 5})
+    assert resp.status_code == 200
+    with app.app_context():
+        assert _position('AAPL').quantity == 5
+
+    resp = client.delete(f'/api/portfolio/transactions/{sell_id}')
+    assert resp.status_code == 200
+    with app.app_context():
+        pos = _position('AAPL')
+        assert pos.quantity == 10
+        assert round(pos.cost_basis, 2) == 101.0
+
+
+def test_rebuild_matches_incremental(client, app):
+    _post(client)
+    _post(client, quantity=5, price_per_share=12.0, transaction_date='2024-03-01')
+    _post(client, symbol='MSFT', quantity=3, price_per_share=50.0)
+    with app.app_context():
+        before = {
+            p.stock_id: (p.quantity, round(p.cost_basis, 6), round(p.fees, 6))
+            for p in Position.query.all()
+        }
+        assert rebuild_positions('USD') == 2
+        db.session.commit()
+        after = {
+            p.stock_id: (p.quantity, round(p.cost_basis, 6), round(p.fees, 6))
+            for p in Position.query.all()
+        }
+    assert before == after
+
+
+def test_missing_fx_marks_position_stale(client, app, monkeypatch):
+    monkeypatch.setattr('src.routes.portfolio.get_fx_rate', lambda *a, **k: 1.1)
+    _post(client, currency='EUR', fee_amount=None)
+    with app.app_context():
+        assert _position('AAPL').stale
+        db.session.add(ExchangeRate(base='EUR', quote='USD', date=date(2024, 1, 1), rate=1.1))
+        db.session.commit()
+
+    resp = client.get('/api/portfolio/stocks')
+    assert resp.status_code == 200
+    assert resp.get_json()[0]['cost_basis'] == 110.0
+    with app.app_context():
+        assert not _position('AAPL').stale
@@ -0,0 +1,103 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from src.models.portfolio import CurrencyEnum, PriceCache, Stock
+from src.models.user import db
+from src.services import price_cache
+
+
+def _add(symbol, price, fetched_at):
+    db.session.add(
+        PriceCache(symbol=symbol, price=price, currency=CurrencyEnum.USD, fetched_at=fetched_at)
+    )
+
+
+def _rows(symbol):
+    return PriceCache.query.filter_by(symbol=symbol).order_by(PriceCache.fetched_at).all()
+
+
+def test_compact_rolls_days_into_ohlc_bars(app):
+    with app.app_context():
+        for hour, price in [(9, 10.0), (11, 12.5), (13, 9.0), (16, 11.0)]:
+            _add('AAPL', price, datetime(2024, 1, 2, hour))
+        _add('AAPL', 20.0, datetime(2024, 1, 3, 10))
+        _add('AAPL', 30.0, datetime(2024, 1, 10, 10))
+        _add('MSFT', 50.0, datetime(2024, 1, 2, 10))
+        db.session.commit()
+
+        report = price_cache.compact(date(2024, 1, 5))
+        assert report.symbols == 2
+        assert report.rows_removed == 6
+        assert report.bars_written == 3
+
+        rows = _rows('AAPL')
+        assert [(r.price, r.open, r.high, r.low, r.samples) for r in rows] == [
+            (11.0, 10.0, 12.5, 9.0, 4),
+            (20.0, 20.0, 20.0, 20.0, 1),
+            (30.0, None, None, None, None),
+        ]
+        assert rows[0].fetched_at == datetime(2024, 1, 2, 16)
+        assert rows[0].currency == CurrencyEnum.USD
+        assert _rows('MSFT')[0].samples == 1
+
+
+def test_compact_leaves_callers_objects_attached(app):
+    with app.app_context():
+        stock = Stock(symbol='AAPL', current_price=10.0)
+        db.session.add(stock)
+        _add('AAPL', 10.0, datetime(2024, 1, 2, 9))
+        _add('AAPL', 11.0, datetime(2024, 1, 2, 10))
+        db.session.commit()
+        stock.current_price = 12.0
+
+        price_cache.compact_symbol('AAPL', datetime(2024, 1, 5))
+        assert stock in db.session
+        db.session.commit()
+        assert Stock.query.one().current_price == 12.0
+        assert [r.samples for r in _rows('AAPL')] == [2]
+
+
+def test_compact_merges_late_rows_into_existing_bar(app):
+    with app.app_context():
+        _add('AAPL', 10.0, datetime(2024, 1, 2, 9))
+        _add('AAPL', 14.0, datetime(2024, 1, 2, 12))
+        db.session.commit()
+        price_cache.compact(date(2024, 1, 5))
+
+        # A second run without new rows leaves the bar alone.
+        assert price_cache.compact(date(2024, 1, 5)).rows_removed == 0
+
+        _add('AAPL', 8.0, datetime(2024, 1, 2, 15))
+        db.session.commit()
+        report = price_cache.compact(date(2024, 1, 5))
+        assert report.rows_removed == 2
+        [bar] = _rows('AAPL')
+        assert (bar.open, bar.high, bar.low, bar.price, bar.samples) == (10.0, 14.0, 8.0, 8.0, 3)
+
+
+def test_purge_deletes_rows_before_retention_limit(app):
+    with app.app_context():
+        _add('AAPL', 10.0, datetime(2020, 1, 2, 9))
+        _add('AAPL', 11.0, datetime(2024, 1, 2, 9))
+        db.session.commit()
+        assert price_cache.purge(date(2023, 1, 1)) == 1
+        assert [r.price for r in _rows('AAPL')] == [11.0]
+
+
+def test_latest_uses_symbol_fetched_at_index(app):
+    with app.app_context():
+        _add('AAPL', 10.0, datetime(2024, 1, 2, 9))
+        _add('AAPL', 12.0, datetime(2024, 1, 3, 9))
+        _add('MSFT', 99.0, datetime(2024, 1, 4, 9))
+        db.session.commit()
+        assert price_cache.latest('AAPL').price == 12.0
+        assert price_cache.latest('NVDA') is None
+
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM price_cache WHERE symbol = 'AAPL' "
+            "ORDER BY fetched_at DESC LIMIT 1"
+        )).fetchall()
+        detail = ' '.join(str(row[-1]) for row in plan)
+        assert 'ix_price_cache_symbol_fetched_at' in detail
+        assert 'TEMP B-TREE' not in detail
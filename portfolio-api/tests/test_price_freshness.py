@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.portfolio import CurrencyEnum, PriceCache, Stock
+from src.models.user import db
+from src.services import market_data, price_freshness
+
+
+def _store(app, symbol, price, age):
+    fetched_at = datetime.utcnow() - timedelta(seconds=age)
+    with app.app_context():
+        db.session.add(Stock(symbol=symbol, current_price=price, last_updated=fetched_at))
+        db.session.add(
+            PriceCache(symbol=symbol, price=price, currency=CurrencyEnum.USD, fetched_at=fetched_at)
+        )
+        db.session.commit()
+
+
+def _buy(client, symbol):
+    client.post('/api/portfolio/transactions', json={
+        'symbol': symbol,
+        'transaction_type': 'buy',
+        'quantity': 1,
+        'price_per_share': 10.0,
+        'transaction_date': '2024-01-01',
+    })
+
+
+@pytest.fixture
+def quotes(monkeypatch):
+    """Record provider calls; every symbol quotes at 20.0."""
+    calls = []
+
+    def fake(symbol):
+        calls.append(symbol)
+        return 20.0
+
+    monkeypatch.setattr(market_data, 'fetch_quote', fake)
+    monkeypatch.setattr(market_data, 'prefetch_quotes', lambda symbols: None)
+    monkeypatch.setattr('src.routes.portfolio.fetch_quote', fake)
+    return calls
+
+
+def test_freshness_thresholds():
+    now = datetime(2024, 1, 1, 12)
+    assert price_freshness.freshness(now - timedelta(seconds=10), now) == price_freshness.FRESH
+    assert price_freshness.freshness(now - timedelta(hours=2), now) == price_freshness.STALE
+    assert price_freshness.freshness(now - timedelta(days=2), now) == price_freshness.EXPIRED
+    assert price_freshness.freshness(None, now) == price_freshness.EXPIRED
+
+
+def test_update_price_fresh_is_served_from_cache(client, app, quotes):
+    _store(app, 'AAPL', 10.0, age=60)
+    data = client.post('/api/prices/update?symbol=AAPL').get_json()
+    assert data['current_price'] == 10.0
+    assert data['stale'] is False
+    assert quotes == []
+
+
+def test_update_price_stale_is_served_and_revalidated(client, app, quotes):
+    app.config['PRICE_REVALIDATE'] = 'sync'
+    _store(app, 'AAPL', 10.0, age=3600)
+    data = client.post('/api/prices/update?symbol=AAPL').get_json()
+    assert data['current_price'] == 10.0
+    assert data['stale'] is True
+    assert quotes == ['AAPL']
+    with app.app_context():
+        assert Stock.query.filter_by(symbol='AAPL').one().current_price == 20.0
+        assert PriceCache.query.count() == 2
+
+
+def test_update_price_expired_blocks_on_fetch(client, app, quotes):
+    _store(app, 'AAPL', 10.0, age=2 * 86400)
+    data = client.post('/api/prices/update?symbol=AAPL').get_json()
+    assert data['current_price'] == 20.0
+    assert data['stale'] is False
+    assert quotes == ['AAPL']
+
+
+def test_stocks_flags_stale_and_refreshes_expired(client, app, quotes):
+    _store(app, 'FRESH', 10.0, age=60)
+    _store(app, 'STALE', 10.0, age=3600)
+    _store(app, 'OLD', 10.0, age=2 * 86400)
+    for symbol in ('FRESH', 'STALE', 'OLD', 'NEW'):
+        _buy(client, symbol)
+
+    items = {s['symbol']: s for s in client.get('/api/portfolio/stocks').get_json()}
+    assert items['FRESH']['stale'] is False
+    assert items['STALE'] == {**items['STALE'], 'stale': True, 'current_price': 10.0}
+    assert items['OLD'] == {**items['OLD'], 'stale': False, 'current_price': 20.0}
+    assert items['NEW']['current_price'] is None
+    assert quotes == ['OLD']
+
+
+def test_revalidation_queue_coalesces_symbols(app, quotes):
+    _store(app, 'AAPL', 10.0, age=3600)
+    queue = price_freshness.RevalidationQueue()
+    gate = threading.Event()
+    queue._executor.submit(gate.wait)
+    with app.app_context():
+        assert queue.submit(['AAPL'], 'USD') is True
+        assert queue.submit(['AAPL'], 'USD') is False
+    gate.set()
+    queue._executor.shutdown(wait=True)
+    assert quotes == ['AAPL']
+    with app.app_context():
+        assert Stock.query.filter_by(symbol='AAPL').one().current_price == 20.0
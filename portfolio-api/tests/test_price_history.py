@@ -0,0 +1,167 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from src.lib import http_client
+from src.models.portfolio import PriceHistory, Stock, Transaction
+from src.models.user import db
+from src.services import price_history
+from src.services.providers import stooq
+
+
+def _response(text):
+    class R:
+        def raise_for_status(self):
+            pass
+    r = R()
+    r.text = text
+    return r
+
+
+def _closes(symbol, closes):
+    for day, close in closes.items():
+        db.session.add(PriceHistory(symbol=symbol, date=day, close=close, source='stooq'))
+
+
+def _buy(symbol, day, quantity=1, price=100.0, current_price=None):
+    stock = Stock.query.filter_by(symbol=symbol).first()
+    if stock is None:
+        stock = Stock(symbol=symbol, current_price=current_price)
+        db.session.add(stock)
+    db.session.add(Transaction(
+        stock=stock, transaction_type='buy', quantity=quantity,
+        price_per_share=price, currency='USD', transaction_date=day,
+    ))
+
+
+def test_fetch_daily_parses_csv(monkeypatch):
+    urls = []
+
+    def fake_get(url, timeout=10, **kwargs):
+        urls.append(url)
+        if 'xxxx' in url:
+            return _response("No data")
+        return _response(
+            "Date,Open,High,Low,Close,Volume\n"
+            "2024-01-02,1,1,1,185.5,100\n"
+            "2024-01-03,1,1,1,184.0,100\n"
+        )
+
+    monkeypatch.setattr(http_client, 'get', fake_get)
+    assert stooq.fetch_daily('AAPL.US', date(2024, 1, 1), date(2024, 1, 5)) == {
+        date(2024, 1, 2): 185.5,
+        date(2024, 1, 3): 184.0,
+    }
+    assert 's=aapl&d1=20240101&d2=20240105&i=d' in urls[0]
+    assert stooq.fetch_daily('XXXX', date(2024, 1, 1), date(2024, 1, 5)) == {}
+
+
+def test_backfill_resumes_after_last_close(app, monkeypatch):
+    calls = []
+
+    def fake_daily(symbol, start, end):
+        calls.append((symbol, start, end))
+        return {start: 10.0, end: 11.0}
+
+    monkeypatch.setattr(stooq, 'fetch_daily', fake_daily)
+    with app.app_context():
+        _buy('AAPL', date(2024, 1, 2))
+        _buy('MSFT', date(2024, 1, 8))
+        _closes('MSFT', {date(2024, 1, 8): 300.0, date(2024, 1, 9): 301.0})
+        db.session.commit()
+
+        stored = price_history.backfill(end=date(2024, 1, 12))
+        assert stored == {'AAPL': 2, 'MSFT': 2}
+        assert calls == [
+            ('AAPL', date(2024, 1, 2), date(2024, 1, 12)),
+            ('MSFT', date(2024, 1, 10), date(2024, 1, 12)),
+        ]
+
+        # Quotes only fill days without a downloaded close.
+        price_history.record({'AAPL': 99.0, 'MSFT': 305.0}, date(2024, 1, 12))
+        price_history.record({'MSFT': 306.0}, date(2024, 1, 13))
+        db.session.commit()
+        closes = price_history.load_closes(['AAPL', 'MSFT'], date(2024, 1, 12), date(2024, 1, 13))
+        assert closes['AAPL'].as_of(date(2024, 1, 13)) == 11.0
+        assert closes['MSFT'].closes == [10.0, 11.0, 306.0]
+
+
+def test_load_closes_uses_one_query_and_as_of(app):
+    with app.app_context():
+        _closes('AAPL', {
+            date(2023, 12, 28): 90.0,
+            date(2024, 1, 5): 100.0,
+            date(2024, 1, 8): 102.0,
+        })
+        _closes('MSFT', {date(2024, 1, 9): 300.0})
+        db.session.commit()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'price_history' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            closes = price_history.load_closes(
+                ['AAPL', 'MSFT', 'NVDA'], date(2024, 1, 1), date(2024, 1, 31)
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        assert len(statements) == 1
+        assert set(closes) == {'AAPL', 'MSFT'}
+        aapl = closes['AAPL']
+        assert aapl.dates == [date(2023, 12, 28), date(2024, 1, 5), date(2024, 1, 8)]
+        assert aapl.as_of(date(2024, 1, 1)) == 90.0
+        assert aapl.as_of(date(2024, 1, 6)) == 100.0
+        assert aapl.as_of(date(2024, 1, 31)) == 102.0
+        assert closes['MSFT'].as_of(date(2024, 1, 2)) == 300.0
+
+
+def test_history_values_days_at_their_close(client, app):
+    with app.app_context():
+        _buy('AAPL', date(2024, 1, 5), quantity=2, price=100.0, current_price=500.0)
+        _buy('NEW', date(2024, 1, 5), quantity=1, price=10.0, current_price=12.0)
+        _closes('AAPL', {
+            date(2024, 1, 4): 99.0,
+            date(2024, 1, 5): 100.0,
+            date(2024, 1, 8): 110.0,
+        })
+        db.session.commit()
+
+    data = client.get('/api/portfolio/history?start=2024-01-05&end=2024-01-08').get_json()
+    values = [day['with_contributions'] for day in data['history']]
+    # Weekend days keep Friday's close; NEW has no history and uses its
+    # current price.
+    assert values == [212.0, 212.0, 212.0, 232.0]
+    assert data['history'][-1]['market_value_only'] == 22.0
+
+
+def test_nightly_runs_replace_recorded_quotes(app, monkeypatch):
+    calls = []
+    # Stooq publishes a day's close only after the nightly run of that day.
+    published = {date(2024, 1, 9): 100.0, date(2024, 1, 10): 101.0, date(2024, 1, 11): 102.0}
+
+    def fake_daily(symbol, start, end):
+        calls.append((start, end))
+        return {d: c for d, c in published.items() if start <= d < end}
+
+    monkeypatch.setattr(stooq, 'fetch_daily', fake_daily)
+    with app.app_context():
+        _buy('AAPL', date(2024, 1, 9))
+        db.session.commit()
+        for day, quote in [(date(2024, 1, 10), 150.0), (date(2024, 1, 11), 151.0)]:
+            price_history.backfill(end=day)
+            price_history.record({'AAPL': quote}, day)
+            db.session.commit()
+
+        assert calls == [
+            (date(2024, 1, 9), date(2024, 1, 10)),
+            (date(2024, 1, 10), date(2024, 1, 11)),
+        ]
+        rows = PriceHistory.query.order_by(PriceHistory.date).all()
+        assert [(r.date.day, r.close, r.source) for r in rows] == [
+            (9, 100.0, 'stooq'), (10, 101.0, 'stooq'), (11, 151.0, 'quote'),
+        ]
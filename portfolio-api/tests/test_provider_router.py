@@ -0,0 +1,172 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import settings
+from src.lib.single_flight import SingleFlight
+from src.services import market_data, provider_router
+from src.services.provider_router import CircuitBreaker, ProviderRouter
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Scripted providers: each name maps to a function of the symbol."""
+    monkeypatch.setenv("ALPHAVANTAGE_API_KEY", "demo")
+    monkeypatch.delenv("DATA_API_BASE_URL", raising=False)
+    market_data._CACHE.clear()
+    calls = []
+
+    def install(**behaviour):
+        for name, fn in behaviour.items():
+            def provider(symbol, name=name, fn=fn):
+                calls.append(name)
+                return fn(symbol)
+            monkeypatch.setitem(market_data._QUOTE_PROVIDERS, name, provider)
+
+    yield install, calls
+    market_data._CACHE.clear()
+
+
+def _down(symbol):
+    raise market_data.QuoteAPIError("timeout")
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failures=2, reset_after=30)
+    breaker.failure(now=100)
+    assert breaker.allow(now=100)
+    breaker.failure(now=100)
+    assert breaker.state == provider_router.OPEN
+    assert not breaker.available(now=129)
+    # One trial call after the reset period.
+    assert breaker.allow(now=131)
+    assert not breaker.allow(now=131)
+    breaker.failure(now=131)
+    assert breaker.state == provider_router.OPEN
+    assert breaker.allow(now=162)
+    breaker.success()
+    assert breaker.state == provider_router.CLOSED
+
+
+def test_failing_provider_moves_back_then_opens(providers):
+    install, calls = providers
+    install(alphavantage=_down, stooq=lambda s: None)
+    assert market_data.fetch_quote("S0") is None
+    assert calls == ["alphavantage", "stooq"]
+    # After an error Stooq is asked first; Alpha Vantage only on a miss.
+    for i in range(1, settings.PROVIDER_BREAKER_FAILURES + 2):
+        assert market_data.fetch_quote(f"S{i}") is None
+    assert calls[2:4] == ["stooq", "alphavantage"]
+    assert calls.count("alphavantage") == settings.PROVIDER_BREAKER_FAILURES
+    state = market_data.router.state()["providers"]["alphavantage"]
+    assert state["state"] == provider_router.OPEN
+    assert state["error_rate"] == 1.0
+
+
+def test_symbol_memory_skips_known_misses(providers):
+    install, calls = providers
+    install(alphavantage=lambda s: None, stooq=lambda s: 4.5)
+    assert market_data.fetch_quote("CIG.WA") == 4.5
+    market_data._CACHE.clear()
+    assert market_data.fetch_quote("CIG.WA") == 4.5
+    assert calls == ["alphavantage", "stooq", "stooq"]
+
+    state = market_data.router.state("CIG.WA")["symbol"]
+    assert state["known"] == "stooq"
+    assert state["misses"] == ["alphavantage"]
+    assert state["order"] == ["stooq", "yahoo"]
+
+
+def test_unknown_everywhere_is_cached_as_none(providers):
+    install, calls = providers
+    install(alphavantage=lambda s: None, stooq=lambda s: None)
+    assert market_data.fetch_quote("NOPE") is None
+    market_data._CACHE.clear()
+    assert market_data.fetch_quote("NOPE") is None
+    assert calls == ["alphavantage", "stooq"]
+
+
+def test_slow_provider_moves_back():
+    router = ProviderRouter(["alphavantage", "stooq"])
+    assert router.order("AAPL", ["alphavantage", "stooq"]) == ["alphavantage", "stooq"]
+    for _ in range(5):
+        router.record("alphavantage", "X", provider_router.HIT, 3.0)
+        router.record("stooq", "Y", provider_router.HIT, 0.2)
+    assert router.order("AAPL", ["alphavantage", "stooq"]) == ["stooq", "alphavantage"]
+    # A provider known to have the symbol still goes first.
+    router.remember("AAPL", "alphavantage")
+    assert router.order("AAPL", ["alphavantage", "stooq"]) == ["alphavantage", "stooq"]
+
+
+def test_all_providers_down_raises(providers):
+    install, _ = providers
+    install(alphavantage=_down, stooq=_down)
+    with pytest.raises(market_data.QuoteAPIError, match="timeout"):
+        market_data.fetch_quote("AAPL")
+    for name in ("alphavantage", "stooq"):
+        for _ in range(settings.PROVIDER_BREAKER_FAILURES):
+            market_data.router.breakers[name].failure()
+    with pytest.raises(market_data.QuoteAPIError, match="unavailable"):
+        market_data.fetch_quote("MSFT")
+
+
+def test_providers_endpoint(client, providers):
+    install, _ = providers
+    install(alphavantage=lambda s: 1.0)
+    market_data.fetch_quote("AAPL")
+    body = client.get("/api/prices/providers?symbol=aapl").get_json()
+    assert body["providers"]["alphavantage"]["calls"] == 1
+    assert body["providers"]["stooq"]["state"] == "closed"
+    assert body["symbol"]["known"] == "alphavantage"
+
+
+def test_shared_request_counts_once(monkeypatch):
+    flights = SingleFlight()
+    monkeypatch.setattr(market_data, "_flights", flights)
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    monkeypatch.delenv("DATA_API_BASE_URL", raising=False)
+    market_data._CACHE.clear()
+    callers = settings.PROVIDER_BREAKER_FAILURES
+
+    def down(symbol):
+        deadline = time.monotonic() + 5
+        while flights.coalesced < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        raise market_data.QuoteAPIError("timeout")
+
+    monkeypatch.setitem(market_data._QUOTE_PROVIDERS, "stooq", down)
+
+    def fetch(symbol):
+        with pytest.raises(market_data.QuoteAPIError):
+            market_data.fetch_quote(symbol)
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(fetch, ["AAPL"] * callers))
+
+    assert flights.coalesced == callers - 1
+    state = market_data.router.state()["providers"]["stooq"]
+    assert state["calls"] == 1
+    assert state["consecutive_failures"] == 1
+    assert state["state"] == provider_router.CLOSED
+
+
+def test_skipped_trial_keeps_breaker_half_open(providers):
+    install, calls = providers
+    breaker = market_data.router.breakers["alphavantage"]
+    for _ in range(settings.PROVIDER_BREAKER_FAILURES):
+        breaker.failure(now=100)
+    assert breaker.state == provider_router.OPEN
+    breaker.opened_at = time.monotonic() - settings.PROVIDER_BREAKER_RESET
+
+    def skipped(symbol):
+        raise market_data.ProviderSkipped("alphavantage budget exhausted")
+
+    install(alphavantage=skipped, stooq=lambda s: 4.5)
+    assert market_data.fetch_quote("X1") == 4.5
+    assert breaker.state == provider_router.HALF_OPEN
+    assert breaker.available()
+
+    install(alphavantage=lambda s: 5.0)
+    assert market_data.fetch_quote("X2") == 5.0
+    assert breaker.state == provider_router.CLOSED
@@ -0,0 +1,159 @@
+import fnmatch
+import socketserver
+import threading
+import time
+
+import pytest
+
+from src.lib import quote_cache
+from src.lib.quote_cache import MemoryQuoteCache, RespClient, SQLiteQuoteCache
+from src.services import market_data
+
+
+class _RespStandIn(socketserver.ThreadingTCPServer):
+    """Tiny in-process server implementing the RESP commands the cache uses."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _RespHandler)
+        self.data = {}
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _reply(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._reply(v) for v in value)
+        if value == "OK":
+            return b"+OK\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            cmd = args[0].upper()
+            now = time.time()
+            for key in [k for k, (_, exp) in data.items() if exp and exp <= now]:
+                del data[key]
+            if cmd in (b"SELECT", b"AUTH"):
+                reply = "OK"
+            elif cmd == b"GET":
+                reply = data.get(args[1], (None, None))[0]
+            elif cmd == b"SET":
+                expires = now + int(args[4]) / 1000 if len(args) > 4 else None
+                data[args[1]] = (args[2], expires)
+                reply = "OK"
+            elif cmd == b"DEL":
+                reply = sum(data.pop(k, None) is not None for k in args[1:])
+            elif cmd == b"SCAN":
+                pattern = args[3].decode()
+                reply = [b"0", [k for k in data if fnmatch.fnmatch(k.decode(), pattern)]]
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+                continue
+            self.wfile.write(self._reply(reply))
+
+
+@pytest.fixture
+def resp_server():
+    server = _RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryQuoteCache(ttl=60, maxsize=2)
+    if request.param == "sqlite":
+        return quote_cache.from_url(f"sqlite:///{tmp_path}/quotes.db", ttl=60, maxsize=2)
+    server = request.getfixturevalue("resp_server")
+    host, port = server.server_address
+    return quote_cache.from_url(f"redis://{host}:{port}/1", ttl=60, maxsize=2)
+
+
+def test_backends_share_interface(cache):
+    assert cache.get("AAPL") is None
+    cache.set("AAPL", 150.0)
+    cache.set("NONE", None)
+    assert cache.get("AAPL").price == 150.0
+    hit = cache.get("NONE")
+    assert hit is not None and hit.price is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+    cache.set("OLD", 1.0, fetched_at=time.time() - 61)
+    assert cache.get("OLD") is None
+
+    cache.clear()
+    assert cache.get("AAPL") is None
+    assert cache.stats()["hits"] == 0
+
+
+def test_memory_cache_is_lru():
+    cache = MemoryQuoteCache(ttl=60, maxsize=2)
+    cache.set("A", 1.0)
+    cache.set("B", 2.0)
+    cache.get("A")
+    cache.set("C", 3.0)
+    assert cache.stats()["size"] == 2
+    assert cache.get("B") is None
+    assert cache.get("A").price == 1.0
+
+
+def test_sqlite_cache_shared_between_processes(tmp_path):
+    path = str(tmp_path / "quotes.db")
+    worker_a = SQLiteQuoteCache(path, ttl=60, maxsize=2)
+    worker_b = SQLiteQuoteCache(path, ttl=60, maxsize=2)
+    worker_a.set("AAPL", 150.0, fetched_at=time.time() - 2)
+    worker_a.set("MSFT", 300.0, fetched_at=time.time() - 1)
+    worker_a.set("GOOG", 100.0)
+    assert worker_b.get("MSFT").price == 300.0
+    assert worker_b.get("AAPL") is None
+    assert worker_b.stats()["size"] == 2
+
+
+def test_fetch_quote_uses_shared_cache(monkeypatch, resp_server):
+    host, port = resp_server.server_address
+    shared = quote_cache.RedisQuoteCache(RespClient(host, port), ttl=60)
+    monkeypatch.setattr(market_data, "_CACHE", shared)
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    calls = []
+    monkeypatch.setattr(market_data.stooq, "fetch_quote", lambda s: calls.append(s) or 4.5)
+
+    assert market_data.fetch_quote("cig.wa") == 4.5
+    # A second worker with its own client sees the stored quote.
+    other = quote_cache.RedisQuoteCache(RespClient(host, port), ttl=60)
+    monkeypatch.setattr(market_data, "_CACHE", other)
+    assert market_data.fetch_quote("CIG.WA") == 4.5
+    assert calls == ["CIG.WA"]
+    assert other.stats()["hits"] == 1
+
+
+def test_backend_errors_fall_through_to_providers(monkeypatch):
+    # Nothing listens on port 1: every cache call fails to connect.
+    broken = quote_cache.RedisQuoteCache(RespClient("127.0.0.1", 1, timeout=0.5), ttl=60)
+    monkeypatch.setattr(market_data, "_CACHE", broken)
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    monkeypatch.setattr(market_data.stooq, "fetch_quote", lambda s: 4.5)
+
+    assert market_data.fetch_quote("CIG.WA") == 4.5
+    stats = broken.stats()
+    assert stats["misses"] == 1
+    assert stats["errors"] == 3  # read, write and the size lookup
+    assert stats["size"] is None and stats["maxsize"] is None
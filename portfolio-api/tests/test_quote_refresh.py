@@ -0,0 +1,108 @@
+import threading
+import time
+
+from src.lib import http_client
+from src.models.portfolio import PriceCache, Stock
+from src.models.user import db
+from src.services import market_data, quote_refresh
+from src.services.providers import stooq
+
+
+def _seed(app, symbols):
+    with app.app_context():
+        for symbol in symbols:
+            db.session.add(Stock(symbol=symbol))
+        db.session.commit()
+
+
+def test_refresh_runs_concurrently_and_reports(app, client, monkeypatch):
+    symbols = [f"S{i}" for i in range(8)] + ["BAD"]
+    _seed(app, symbols)
+    market_data._CACHE.clear()
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_stooq(symbol):
+        with lock:
+            active.append(symbol)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(symbol)
+        if symbol == "BAD":
+            raise ValueError("boom")
+        return 10.0
+
+    monkeypatch.setattr(stooq, "fetch_quote", slow_stooq)
+    # Batch prefetch unavailable: every symbol falls back to its own request.
+    monkeypatch.setattr(stooq, "fetch_quotes", lambda symbols: 1 / 0)
+
+    start = time.perf_counter()
+    resp = client.post("/api/portfolio/prices/refresh?report=1")
+    elapsed = time.perf_counter() - start
+
+    body = resp.get_json()
+    assert body["updated"] == 8
+    assert body["failed"] == ["BAD"]
+    bad = next(q for q in body["quotes"] if q["symbol"] == "BAD")
+    assert bad["error"] == "boom" and bad["latency_ms"] >= 50
+    # Stooq allows four concurrent requests: well under the serial 0.45 s.
+    assert max(peak) == 4
+    assert elapsed < 0.4
+    with app.app_context():
+        assert PriceCache.query.count() == 8
+        assert Stock.query.filter_by(symbol="S0").one().current_price == 10.0
+
+
+def test_fetch_quotes_keeps_order(monkeypatch):
+    monkeypatch.setattr(market_data, "fetch_quote", lambda s: None if s == "B" else 1.0)
+    results = quote_refresh.fetch_quotes(["A", "B", "C"])
+    assert [(r.symbol, r.price, r.error) for r in results] == [
+        ("A", 1.0, None), ("B", None, "no quote"), ("C", 1.0, None),
+    ]
+
+
+def test_unexpected_error_fails_only_its_symbol(app, monkeypatch):
+    _seed(app, ["A", "B"])
+
+    def fetch_quote(symbol):
+        if symbol == "B":
+            raise KeyError("Close")
+        return 2.0
+
+    monkeypatch.setattr(market_data, "fetch_quote", fetch_quote)
+    monkeypatch.setattr(market_data, "prefetch_quotes", lambda symbols: None)
+    with app.app_context():
+        report = quote_refresh.refresh_quotes("USD")
+        assert report.updated == ["A"]
+        assert [r.error for r in report.results if r.symbol == "B"] == ["KeyError: 'Close'"]
+        assert Stock.query.filter_by(symbol="A").one().current_price == 2.0
+
+
+def test_refresh_batches_stooq_requests(app, client, monkeypatch):
+    symbols = [f"T{i}" for i in range(120)]
+    _seed(app, symbols)
+    market_data._CACHE.clear()
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    urls = []
+
+    def fake_get(url, timeout=10, **kwargs):
+        urls.append(url)
+        requested = url.split("s=")[1].split("&")[0].split("+")
+
+        class R:
+            text = "Symbol,Date,Time,Open,High,Low,Close,Volume\n" + "".join(
+                f"{s.upper()},2024-06-17,17:00,1,1,1,2.5,10\n" for s in requested
+            )
+
+            def raise_for_status(self):
+                pass
+        return R()
+
+    monkeypatch.setattr(http_client, "get", fake_get)
+    body = client.post("/api/portfolio/prices/refresh").get_json()
+    assert body == {"updated": 120, "failed": []}
+    assert len(urls) == 3
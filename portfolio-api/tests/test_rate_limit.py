@@ -0,0 +1,19 @@
+from src.lib import rate_limit
+from src.lib.rate_limit import TokenBucket
+
+
+def test_bucket_limits_burst(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.5
+    now[0] += 0.5
+    assert bucket.try_acquire() == 0.0
+
+
+def test_bucket_registry_is_per_provider():
+    first = rate_limit.bucket("test-provider", 5)
+    assert rate_limit.bucket("test-provider", 1) is first
+    assert rate_limit.bucket("other-provider", 5) is not first
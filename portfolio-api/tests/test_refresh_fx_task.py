@@ -12,3 +12,47 @@ def test_refresh_fx_calls_service(monkeypatch):
     from src.tasks.refresh_fx import refresh_fx
     refresh_fx(date(2024, 1, 2))
     assert called == {'dt': date(2024, 1, 2), 'base': 'USD'}
+
+
+def test_backfill_range_resumes(app, monkeypatch):
+    from src.models.portfolio import ExchangeRate
+    from src.models.user import db
+    from src.lib import http_client
+    from src.services import fx_backfill
+    from src.tasks.refresh_fx import backfill_range, parse_pairs
+
+    calls = []
+
+    class Resp:
+        def __init__(self, payload):
+            self.payload = payload
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.payload
+
+    def fake_get(url, params=None, **kwargs):
+        calls.append((params['base'], params['start_date'], params['end_date']))
+        start = date.fromisoformat(params['start_date'])
+        end = date.fromisoformat(params['end_date'])
+        days = (date.fromordinal(d) for d in range(start.toordinal(), end.toordinal() + 1))
+        return Resp({'rates': {d.isoformat(): {params['symbols']: 1.5} for d in days}})
+
+    monkeypatch.setattr(http_client, 'get', fake_get)
+    pairs = parse_pairs(['EUR', 'SEK/EUR'], 'USD')
+    assert pairs == [('EUR', 'USD'), ('SEK', 'EUR')]
+    with app.app_context():
+        db.session.add(ExchangeRate(base='EUR', quote='USD', date=date(2023, 1, 2), rate=1.0))
+        db.session.commit()
+        written = backfill_range(date(2022, 1, 1), date(2023, 12, 31), pairs, workers=3, rate=1000, batch_size=100)
+        # 520 business days per pair, one already stored.
+        assert written == 520 * 2 - 1
+        assert ExchangeRate.query.filter_by(date=date(2023, 1, 2), base='EUR').one().rate == 1.0
+        # Two 365-day windows per pair.
+        assert len(calls) == 4
+
+        calls.clear()
+        assert backfill_range(date(2022, 1, 1), date(2023, 12, 31), pairs, rate=1000) == 0
+        assert calls == []
@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from src.lib import http_client
+from src.lib.single_flight import SingleFlight
+from src.services import fx, market_data
+
+N = 8
+
+
+def _wait_for(flights, coalesced):
+    """Block the leader until every other caller joined its flight."""
+    deadline = time.monotonic() + 5
+    while flights.coalesced < coalesced and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def flights(monkeypatch):
+    quotes, rates = SingleFlight(), SingleFlight()
+    monkeypatch.setattr(market_data, "_flights", quotes)
+    monkeypatch.setattr(fx, "_flights", rates)
+    return quotes, rates
+
+
+def test_concurrent_quotes_share_one_request(monkeypatch, flights):
+    quotes, _ = flights
+    monkeypatch.delenv("ALPHAVANTAGE_API_KEY", raising=False)
+    market_data._CACHE.clear()
+    calls = []
+
+    def slow_quote(symbol):
+        calls.append(symbol)
+        _wait_for(quotes, N - 1)
+        return 42.0
+
+    monkeypatch.setattr(market_data.stooq, "fetch_quote", slow_quote)
+    with ThreadPoolExecutor(max_workers=N) as pool:
+        prices = list(pool.map(market_data.fetch_quote, ["aapl"] * N))
+
+    assert prices == [42.0] * N
+    assert calls == ["AAPL"]
+    assert quotes.stats() == {"calls": 1, "coalesced": N - 1, "in_flight": 0}
+    market_data._CACHE.clear()
+
+
+def test_concurrent_fx_downloads_share_one_request(app, monkeypatch, flights):
+    _, rates = flights
+    calls = []
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"rates": {"sek": 10.5}}
+
+    def slow_get(url, params=None, timeout=None, retries=None):
+        calls.append((url, params["base"]))
+        _wait_for(rates, N - 1)
+        return Response()
+
+    monkeypatch.setattr(http_client, "get", slow_get)
+
+    def fetch(_):
+        with app.app_context():
+            return fx._fetch_rates(date(2024, 1, 2), "USD")
+
+    with ThreadPoolExecutor(max_workers=N) as pool:
+        results = list(pool.map(fetch, range(N)))
+
+    assert results == [{"SEK": 10.5}] * N
+    assert len(calls) == 1
+    assert rates.stats()["coalesced"] == N - 1
+
+
+def test_errors_reach_every_caller_and_keys_are_independent():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def boom():
+        started.set()
+        _wait_for(flights, 1)
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, "k", boom)
+        started.wait()
+        follower = pool.submit(flights.do, "k", lambda: "unused")
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="provider down"):
+                future.result()
+
+    assert flights.do("k", lambda: 1) == 1
+    assert flights.do("other", lambda: 2) == 2
+    assert flights.stats() == {"calls": 3, "coalesced": 1, "in_flight": 0}
+
+
+def test_stats_endpoints_report_coalescing(client, flights):
+    assert client.get("/api/prices/cache").get_json()["single_flight"]["coalesced"] == 0
+    assert client.get("/api/fx/cache").get_json()["single_flight"]["calls"] == 0
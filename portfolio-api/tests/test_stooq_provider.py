@@ -1,18 +1,45 @@
 from pathlib import Path
+from src.lib import http_client
 from src.services.providers import stooq
 
 
 def test_fetch_stooq(monkeypatch):
     sample = Path('portfolio-api/tests/stubs/stooq_cig.csv').read_text()
 
-    def fake_get(url, timeout=10):
+    def fake_get(url, timeout=10, **kwargs):
         class R:
             text = sample
             def raise_for_status(self):
                 pass
         return R()
 
-    monkeypatch.setattr(stooq.requests, 'get', fake_get)
+    monkeypatch.setattr(http_client, 'get', fake_get)
 
     price = stooq.fetch_quote('CIG.WA')
     assert price == 4.50
+
+
+def test_fetch_quotes_batches_symbols(monkeypatch):
+    urls = []
+
+    def fake_get(url, timeout=10, **kwargs):
+        urls.append(url)
+
+        class R:
+            text = (
+                "Symbol,Date,Time,Open,High,Low,Close,Volume\n"
+                "AAPL,2024-06-17,22:00,1,1,1,210.5,100\n"
+                "XXXX,N/D,N/D,N/D,N/D,N/D,N/D,N/D\n"
+            )
+
+            def raise_for_status(self):
+                pass
+        return R()
+
+    monkeypatch.setattr(http_client, 'get', fake_get)
+    monkeypatch.setattr(stooq, 'BATCH_SIZE', 2)
+
+    prices = stooq.fetch_quotes(['AAPL.US', 'XXXX', 'MSFT'])
+    assert prices == {'AAPL.US': 210.5, 'XXXX': None, 'MSFT': None}
+    assert len(urls) == 2
+    assert 's=aapl+xxxx&' in urls[0]
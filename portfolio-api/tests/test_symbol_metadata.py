@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import settings
+from src.models.portfolio import Stock, SymbolMetadata
+from src.models.user import db
+from src.services import symbol_metadata
+
+APPLE = {"name": "Apple Inc.", "exchange": "NASDAQ", "currency": "USD", "source": "alphavantage"}
+
+
+def _buy(client, symbol='AAPL'):
+    return client.post('/api/portfolio/transactions', json={
+        'symbol': symbol,
+        'transaction_type': 'buy',
+        'quantity': 1,
+        'price_per_share': 10.0,
+        'transaction_date': '2024-01-01',
+    })
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    results = {'AAPL': APPLE}
+
+    def fake(symbol):
+        calls.append(symbol)
+        return results.get(symbol)
+
+    monkeypatch.setattr('src.lib.market_data.fetch_metadata', fake)
+    return calls
+
+
+def test_write_path_only_queues_lookup(client, app, monkeypatch, lookups):
+    app.config['SYMBOL_ENRICHMENT'] = 'async'
+    queued = []
+    monkeypatch.setattr(symbol_metadata.queue, 'submit', queued.append)
+
+    assert _buy(client).status_code == 201
+    assert lookups == []
+    assert queued == [['AAPL']]
+
+
+def test_sync_enrichment_stores_metadata_and_names_stock(client, app, lookups):
+    app.config['SYMBOL_ENRICHMENT'] = 'sync'
+    _buy(client)
+    _buy(client)
+    assert lookups == ['AAPL']
+    with app.app_context():
+        row = SymbolMetadata.query.filter_by(symbol='AAPL').one()
+        assert (row.name, row.exchange, row.currency) == ('Apple Inc.', 'NASDAQ', 'USD')
+        assert Stock.query.filter_by(symbol='AAPL').one().company_name == 'Apple Inc.'
+
+
+def test_new_stock_uses_stored_name(client, app, lookups):
+    with app.app_context():
+        symbol_metadata.store('AAPL', APPLE)
+        db.session.commit()
+    _buy(client)
+    with app.app_context():
+        assert Stock.query.filter_by(symbol='AAPL').one().company_name == 'Apple Inc.'
+    assert lookups == []
+
+
+def test_negative_results_are_cached_with_ttl(app, lookups):
+    with app.app_context():
+        app.config['SYMBOL_ENRICHMENT'] = 'sync'
+        symbol_metadata.enrich(['NOPE'])
+        symbol_metadata.enrich(['NOPE'])
+        assert lookups == ['NOPE']
+        row = SymbolMetadata.query.filter_by(symbol='NOPE').one()
+        assert row.name is None
+
+        row.checked_at = datetime.utcnow() - timedelta(seconds=settings.SYMBOL_METADATA_NEGATIVE_TTL)
+        db.session.commit()
+        symbol_metadata.enrich(['NOPE'])
+        assert lookups == ['NOPE', 'NOPE']
+
+
+def test_failed_recheck_keeps_known_name(app, lookups):
+    with app.app_context():
+        symbol_metadata.store('MSFT', {"name": "Microsoft", "source": "yahoo"})
+        row = symbol_metadata.refresh('MSFT')
+        assert row.name == 'Microsoft'
+        assert lookups == ['MSFT']
+
+
+def test_queue_looks_symbols_up_in_background(client, app, lookups):
+    _buy(client)
+    queue = symbol_metadata.EnrichmentQueue()
+    with app.app_context():
+        assert queue.submit(['AAPL']) is True
+    queue._executor.shutdown(wait=True)
+    assert lookups == ['AAPL']
+    with app.app_context():
+        assert Stock.query.filter_by(symbol='AAPL').one().company_name == 'Apple Inc.'